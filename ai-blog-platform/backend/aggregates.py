@@ -0,0 +1,176 @@
+"""Incrementally maintained post aggregates.
+
+Tag clouds, author pages and the archive sidebar need counts over all
+posts. Counting on every request would mean reading every post. Instead,
+one counter per (kind, key) is kept up to date as posts are written:
+
+- ``tag``: posts per tag
+- ``author``: posts per author
+- ``month``: posts per creation month (``YYYY-MM``)
+
+Every write path calls ``add`` / ``remove`` / ``replace`` with the stored
+documents. Reads cost O(number of keys of that kind), whatever the number
+of posts.
+
+Counters live in a Mongo collection when one is given, updated with
+atomic ``$inc`` upserts so several processes can share them. Without one
+they live in process-local dicts (demo mode). ``rebuild`` recomputes
+everything from the posts. It runs automatically the first time (no
+``meta`` record yet), and by hand after a bulk change made outside the API:
+
+    python aggregates.py rebuild
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+
+from timestamps import isoformat, utcnow
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("tag", "author", "month")
+META_ID = "meta"
+
+
+def post_keys(document):
+    """The (kind, key) counters a post counts towards"""
+    keys = [("tag", tag) for tag in set(document.get("tags") or ())]
+    if document.get("author"):
+        keys.append(("author", document["author"]))
+    created_at = document.get("created_at")
+    if isinstance(created_at, datetime):
+        keys.append(("month", created_at.strftime("%Y-%m")))
+    return keys
+
+
+def count_posts(documents, sign=1):
+    deltas = Counter()
+    for document in documents:
+        for key in post_keys(document):
+            deltas[key] += sign
+    return deltas
+
+
+class PostAggregates:
+    def __init__(self, collection=None):
+        self.collection = collection  # AsyncCollection or None
+        self._counts = {kind: Counter() for kind in KINDS}  # demo mode only
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index(
+                [("kind", ASCENDING), ("count", DESCENDING)], name="kind_count"
+            )
+
+    async def add(self, documents):
+        await self._apply(count_posts(documents))
+
+    async def remove(self, documents):
+        await self._apply(count_posts(documents, sign=-1))
+
+    async def replace(self, old, new):
+        """Move a post's counts after an update changed its tags or author"""
+        deltas = count_posts([new])
+        deltas.subtract(count_posts([old]))
+        await self._apply(deltas)
+
+    async def _apply(self, deltas):
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        if self.collection is None:
+            for (kind, key), delta in deltas.items():
+                counts = self._counts[kind]
+                counts[key] += delta
+                if counts[key] <= 0:
+                    del counts[key]
+            return
+        # A failure here must not fail the write that triggered it; the
+        # counts drift until the next rebuild instead
+        try:
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"_id": f"{kind}:{key}"},
+                    {"$inc": {"count": delta}, "$setOnInsert": {"kind": kind, "key": key}},
+                    upsert=True
+                )
+                for (kind, key), delta in deltas.items()
+            ], ordered=False)
+            if any(delta < 0 for delta in deltas.values()):
+                await self.collection.delete_many({"kind": {"$in": list(KINDS)}, "count": {"$lte": 0}})
+        except Exception as e:
+            logger.error("❌ Aggregate update failed (run a rebuild to repair): %s", e)
+
+    async def counts(self, kind, limit=None):
+        """``[{"key", "count"}]`` for one kind.
+
+        Tags and authors come most-used first; months newest first.
+        """
+        by_month = kind == "month"
+        if self.collection is None:
+            items = self._counts[kind].items()
+            if by_month:
+                ordered = sorted(items, reverse=True)
+            else:
+                ordered = sorted(items, key=lambda item: (-item[1], item[0]))
+            return [{"key": key, "count": count} for key, count in ordered[:limit]]
+        sort = [("key", DESCENDING)] if by_month else [("count", DESCENDING), ("key", ASCENDING)]
+        docs = await self.collection.find_list(
+            {"kind": kind}, {"_id": 0, "key": 1, "count": 1}, sort=sort, limit=limit or 0
+        )
+        return [{"key": doc["key"], "count": doc["count"]} for doc in docs]
+
+    async def needs_rebuild(self):
+        if self.collection is None:
+            return False
+        return await self.collection.find_one({"_id": META_ID}) is None
+
+    async def rebuild(self, storage, batch_size=500):
+        """Recompute every counter from the stored posts.
+
+        Writes made while the rebuild scans can be missed or counted twice;
+        run it when writes are quiet.
+        """
+        totals = Counter()
+        posts = 0
+        async for batch in storage.iter_posts(batch_size=batch_size):
+            totals.update(count_posts(batch))
+            posts += len(batch)
+        rebuilt_at = utcnow()
+
+        if self.collection is None:
+            self._counts = {kind: Counter() for kind in KINDS}
+            for (kind, key), count in totals.items():
+                self._counts[kind][key] = count
+        else:
+            # Overwrite counters in place, then drop the ones that no longer
+            # exist, so readers never see an empty collection midway
+            ids = [f"{kind}:{key}" for kind, key in totals]
+            requests = [
+                ReplaceOne({"_id": _id}, {"kind": kind, "key": key, "count": count}, upsert=True)
+                for _id, ((kind, key), count) in zip(ids, totals.items())
+            ]
+            for i in range(0, len(requests), batch_size):
+                await self.collection.bulk_write(requests[i:i + batch_size], ordered=False)
+            await self.collection.delete_many({"_id": {"$nin": ids + [META_ID]}})
+            await self.collection.replace_one(
+                {"_id": META_ID}, {"kind": "meta", "posts": posts, "rebuilt_at": rebuilt_at}, upsert=True
+            )
+
+        logger.info("✅ Rebuilt aggregates from %d posts (%d counters)", posts, len(totals))
+        return {"posts": posts, "counters": len(totals), "rebuilt_at": isoformat(rebuilt_at)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain post aggregates")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    import main
+
+    print(asyncio.run(main.post_aggregates.rebuild(main.storage)))
@@ -0,0 +1,116 @@
+"""Concurrency benchmark: do cheap routes keep serving during generations?
+
+Runs the app in-process with a fake Gemini model whose generate_content
+sleeps (blocking, like the real client). It starts a burst of generation
+requests and probes /api/health while they are in flight. If the health
+probe latency stays in the millisecond range instead of the generation
+latency, blocking calls no longer stall the event loop.
+
+Usage: python bench_concurrency.py [--generations 8] [--latency 2.0] [--probes 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Force demo mode so the benchmark never touches Atlas or the real API
+os.environ["MONGODB_URI"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+
+import httpx
+
+import main
+
+
+class SlowFakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class SlowFakeModel:
+    """Stands in for genai.GenerativeModel with a blocking, slow call"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return SlowFakeResponse(f"## Generated\n\n{prompt[:40]}")
+
+
+async def timed_get(client, url):
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_benchmark(generations, latency, probes):
+    main.gemini_model = SlowFakeModel(latency)
+    main.gemini_configured = True
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        gen_start = time.perf_counter()
+        generation_tasks = [
+            asyncio.create_task(client.post("/api/generate-content", json={"prompt": f"topic {i}"}))
+            for i in range(generations)
+        ]
+
+        # Give the generations a moment to start, then probe cheap routes
+        await asyncio.sleep(0.05)
+        health_latencies = []
+        listing_latencies = []
+        for _ in range(probes):
+            health_latencies.append(await timed_get(client, "/api/health"))
+            listing_latencies.append(await timed_get(client, "/api/posts"))
+        probes_done = time.perf_counter() - gen_start
+
+        responses = await asyncio.gather(*generation_tasks)
+        gen_elapsed = time.perf_counter() - gen_start
+
+    failed = [r for r in responses if r.status_code != 200]
+    return {
+        "generations": generations,
+        "generation_latency": latency,
+        "generation_wall_time": gen_elapsed,
+        "generation_failures": len(failed),
+        "probes_finished_after": probes_done,
+        "health_p50_ms": statistics.median(health_latencies) * 1000,
+        "health_max_ms": max(health_latencies) * 1000,
+        "posts_p50_ms": statistics.median(listing_latencies) * 1000,
+        "posts_max_ms": max(listing_latencies) * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generations", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--probes", type=int, default=20)
+    args = parser.parse_args()
+
+    print("🧪 Concurrency Benchmark")
+    print("=" * 50)
+    print(f"Generations in flight: {args.generations} x {args.latency:.1f}s "
+          f"(GEMINI_MAX_CONCURRENCY={main.data_access.GEMINI_MAX_CONCURRENCY})")
+
+    result = asyncio.run(run_benchmark(args.generations, args.latency, args.probes))
+
+    print("-" * 50)
+    print(f"Generation wall time:   {result['generation_wall_time']:.2f}s "
+          f"({result['generation_failures']} failed)")
+    print(f"Probes finished after:  {result['probes_finished_after']:.2f}s")
+    print(f"/api/health  p50/max:   {result['health_p50_ms']:.1f}ms / {result['health_max_ms']:.1f}ms")
+    print(f"/api/posts   p50/max:   {result['posts_p50_ms']:.1f}ms / {result['posts_max_ms']:.1f}ms")
+
+    if result["health_max_ms"] < args.latency * 1000 / 2:
+        print("✅ Cheap routes kept serving while generations were in flight")
+    else:
+        print("❌ Cheap routes were blocked behind generations")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,369 @@
+"""Load benchmark: throughput and latency percentiles per endpoint
+
+Drives the app with a weighted mix of requests from a pool of concurrent
+workers and reports, per endpoint, throughput and p50/p95/p99 latency.
+Everything external is replaced, so runs are reproducible and offline:
+
+- storage: the in-memory engine (STORAGE_BACKEND=memory), seeded with
+  ``--seed-posts`` posts, stands in for MongoDB
+- Gemini: FakeModel, a blocking stand-in like the real client. Its latency
+  (``--gemini-latency`` plus up to ``--gemini-jitter``) and chunking are
+  tunable
+
+``--transport inproc`` sends requests through httpx's ASGI transport, so
+there is no network. ``--transport loopback`` serves the app with uvicorn
+on 127.0.0.1 and includes the HTTP stack.
+
+Results can be saved as a baseline and later runs compared against it.
+A p95 latency or throughput regression beyond ``--tolerance`` exits
+non-zero.
+
+Usage:
+    python bench_load.py [--requests 2000] [--concurrency 32]
+    python bench_load.py --save-baseline bench_baseline.json
+    python bench_load.py --compare bench_baseline.json [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Never touch Atlas or the real API, whatever .env says
+os.environ["MONGODB_URI"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+import main
+from fakes import loopback_server
+from timestamps import utcnow
+
+BASELINE_VERSION = 1
+
+# (name, weight): how often each kind of request appears in the mix
+DEFAULT_MIX = [
+    ("list_posts", 30),
+    ("list_posts_page2", 10),
+    ("get_post", 20),
+    ("get_post_by_slug", 10),
+    ("search", 10),
+    ("create_post", 5),
+    ("generate", 5),
+    ("generate_stream", 3),
+    ("health", 7),
+]
+
+TOPICS = [
+    "python", "fastapi", "mongodb", "caching", "async", "testing",
+    "deployment", "security", "design", "performance",
+]
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel.
+
+    Blocks for ``latency`` seconds (plus random jitter), like the real
+    client; with ``stream=True`` the time is spread over ``chunks`` chunks.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, chunks=8, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunks = chunks
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self):
+        return self.latency + self.random.uniform(0, self.jitter)
+
+    def _text(self, prompt):
+        topic = prompt.splitlines()[0][-60:]
+        return f"## {topic}\n\n" + "Generated paragraph about the topic. " * 40
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        delay = self._delay()
+        text = self._text(prompt)
+        if not stream:
+            time.sleep(delay)
+            return FakeChunk(text)
+
+        def chunks():
+            size = -(-len(text) // self.chunks)
+            for start in range(0, len(text), size):
+                time.sleep(delay / self.chunks)
+                yield FakeChunk(text[start:start + size])
+        return chunks()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def seed_posts(count, rng):
+    """Insert posts straight into the storage engine, bypassing HTTP"""
+    now = utcnow().replace(microsecond=0)
+    documents = []
+    for i in range(count):
+        topic_a, topic_b = rng.sample(TOPICS, 2)
+        post = main.BlogPostCreate(
+            title=f"Notes on {topic_a} and {topic_b} #{i}",
+            content=f"# {topic_a.title()}\n\n" + f"Working with {topic_a} and {topic_b} in production. " * 60,
+            author="Bench",
+            slug=f"seed-{i}",
+            tags=[topic_a, topic_b],
+        )
+        created_at = now - timedelta(minutes=count - i)
+        documents.append(main.build_post_document(post, created_at, created_at))
+    inserted, errors = await main.storage.insert_many(documents)
+    assert not errors, errors[:3]
+    return [(str(doc["_id"]), doc["slug"]) for doc in documents]
+
+
+class Scenario:
+    """Builds the next request for each kind in the mix"""
+
+    def __init__(self, posts, rng, prompts):
+        self.posts = posts
+        self.rng = rng
+        self.prompts = prompts
+        self.created = 0
+        self.second_page_cursor = None
+
+    async def prepare(self, client):
+        first = (await client.get("/api/posts")).json()
+        self.second_page_cursor = first["next_cursor"]
+
+    def request(self, kind):
+        """Return (method, url, kwargs)"""
+        rng = self.rng
+        if kind == "list_posts":
+            return "GET", "/api/posts", {}
+        if kind == "list_posts_page2":
+            params = {"cursor": self.second_page_cursor} if self.second_page_cursor else {}
+            return "GET", "/api/posts", {"params": params}
+        if kind == "get_post":
+            return "GET", f"/api/posts/{rng.choice(self.posts)[0]}", {}
+        if kind == "get_post_by_slug":
+            return "GET", f"/api/posts/by-slug/{rng.choice(self.posts)[1]}", {}
+        if kind == "search":
+            return "GET", "/api/posts/search", {"params": {"q": " ".join(rng.sample(TOPICS, 2))}}
+        if kind == "create_post":
+            self.created += 1
+            topic = rng.choice(TOPICS)
+            return "POST", "/api/posts", {"json": {
+                "title": f"Fresh post about {topic}",
+                "content": f"Writing about {topic}. " * 80,
+                "author": "Bench",
+                "slug": f"bench-{self.created}-{rng.getrandbits(32):08x}",
+                "tags": [topic],
+            }}
+        if kind == "generate":
+            return "POST", "/api/generate-content", {"json": {"prompt": f"topic {rng.randrange(self.prompts)}"}}
+        if kind == "generate_stream":
+            return "POST", "/api/generate-content/stream", {"json": {"prompt": f"topic {rng.randrange(self.prompts)}"}}
+        if kind == "health":
+            return "GET", "/api/health", {}
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+async def run_load(client, scenario, mix, total, concurrency, rng):
+    kinds = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    # Decide the whole request sequence up front so runs are reproducible
+    plan = iter(rng.choices(kinds, weights=weights, k=total))
+    latencies = {kind: [] for kind in kinds}
+    errors = {kind: 0 for kind in kinds}
+
+    async def worker():
+        for kind in plan:
+            method, url, kwargs = scenario.request(kind)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                ok = response.status_code < 400 and b"event: error" not in response.content
+            except httpx.HTTPError:
+                ok = False
+            latencies[kind].append(time.perf_counter() - start)
+            if not ok:
+                errors[kind] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarize(latencies, errors, elapsed):
+    endpoints = {}
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        values = sorted(values)
+        endpoints[kind] = {
+            "requests": len(values),
+            "errors": errors[kind],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "total_requests": total,
+        "total_errors": sum(errors.values()),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+async def run_benchmark(args):
+    rng = random.Random(args.seed)
+    main.gemini_model = FakeModel(args.gemini_latency, args.gemini_jitter, args.gemini_chunks, args.seed)
+    main.gemini_configured = True
+
+    posts = await seed_posts(args.seed_posts, rng)
+    scenario = Scenario(posts, rng, args.prompts)
+    mix = [(name, weight) for name, weight in DEFAULT_MIX if name not in args.skip]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.transport == "inproc":
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await scenario.prepare(client)
+            return await run_load(client, scenario, mix, args.requests, args.concurrency, rng)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        await scenario.prepare(client)
+        return await run_load(client, scenario, mix, args.requests, args.concurrency, rng)
+
+
+def compare(result, baseline, tolerance):
+    """Return a list of regression messages (empty if none)"""
+    regressions = []
+    for kind, current in result["endpoints"].items():
+        previous = baseline["endpoints"].get(kind)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{kind}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{kind}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{kind}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(result, baseline=None):
+    print("-" * 78)
+    print(f"{'endpoint':<18}{'reqs':>6}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Δp95':>9}")
+    for kind, stats in result["endpoints"].items():
+        delta = ""
+        previous = (baseline or {}).get("endpoints", {}).get(kind)
+        if previous and previous["p95_ms"]:
+            delta = f"{(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{kind:<18}{stats['requests']:>6}{stats['errors']:>5}{stats['throughput_rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{delta:>9}")
+    print("-" * 78)
+    print(f"Total: {result['total_requests']} requests, {result['total_errors']} errors "
+          f"in {result['elapsed_s']:.2f}s ({result['throughput_rps']:.1f} req/s)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--transport", choices=["inproc", "loopback"], default="inproc")
+    parser.add_argument("--seed-posts", type=int, default=1000)
+    parser.add_argument("--prompts", type=int, default=50, help="distinct generation prompts (cache hit rate)")
+    parser.add_argument("--gemini-latency", type=float, default=0.2)
+    parser.add_argument("--gemini-jitter", type=float, default=0.05)
+    parser.add_argument("--gemini-chunks", type=int, default=8)
+    parser.add_argument("--skip", nargs="*", default=[], help="request kinds to leave out of the mix")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-request logging")
+    args = parser.parse_args()
+
+    print("🧪 Load Benchmark")
+    print("=" * 78)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, transport {args.transport}, "
+          f"{args.seed_posts} seeded posts, fake Gemini {args.gemini_latency:.2f}s")
+
+    # The app logs every request; keep that out of the report
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.transport == "loopback":
+        with loopback_server(main.app) as base_url:
+            args.base_url = base_url
+            latencies, errors, elapsed = asyncio.run(run_benchmark(args))
+    else:
+        latencies, errors, elapsed = asyncio.run(run_benchmark(args))
+
+    result = summarize(latencies, errors, elapsed)
+    result["config"] = {
+        key: getattr(args, key) for key in (
+            "requests", "concurrency", "transport", "seed_posts", "prompts",
+            "gemini_latency", "gemini_jitter", "gemini_chunks", "skip", "seed",
+        )
+    }
+    result["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_encoder": "orjson" if main.serialization.orjson else "json",
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    result["version"] = BASELINE_VERSION
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("⚠️  Baseline was recorded with different settings; numbers are not comparable")
+
+    print_report(result, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline saved to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regressions beyond {args.tolerance:.0%}:")
+            for message in regressions:
+                print(f"   {message}")
+            print("=" * 78)
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,102 @@
+"""Long-form benchmark: one sequential call vs outline + parallel sections
+
+Serves the app on 127.0.0.1 against a fake Gemini model whose latency grows
+with the length of what it writes (``--words-per-second``), like real
+token-by-token generation. It generates the same post both ways:
+
+- ``single``: one /api/generate-content call asking for the whole post
+- ``longform``: /api/generate-content/longform, the outline and then the
+  sections concurrently, streamed as Server-Sent Events
+
+It reports the wall-clock time, the time to the first section, the words
+produced, and checks the stitched post's heading structure.
+
+Usage: python bench_longform.py [--sections 6] [--section-words 350] [--words-per-second 150]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# Never touch Atlas or the real API, whatever .env says
+os.environ["MONGODB_URI"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+import main
+from fakes import FakeGeminiModel, loopback_server
+from longform import split_post
+
+
+async def run_single(client):
+    start = time.perf_counter()
+    response = await client.post("/api/generate-content", json={"prompt": "long form", "bypass_cache": True})
+    response.raise_for_status()
+    return time.perf_counter() - start, len(response.json()["content"].split())
+
+
+async def run_longform(client, sections, section_words):
+    start = time.perf_counter()
+    first_section = None
+    order = []
+    done = None
+    body = {"prompt": "long form", "sections": sections, "section_words": section_words, "bypass_cache": True}
+    async with client.stream("POST", "/api/generate-content/longform", json=body) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+                if event == "section":
+                    first_section = first_section or time.perf_counter() - start
+                    order.append(data["index"])
+                elif event == "done":
+                    done = data
+                elif event == "error":
+                    raise RuntimeError(data["detail"])
+    return time.perf_counter() - start, first_section, order, done
+
+
+async def run(args, model, base_url):
+    # Over a real socket: the in-process transport would buffer the stream
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        single_seconds, single_words = await run_single(client)
+        seconds, first_section, order, done = await run_longform(client, args.sections, args.section_words)
+
+    title, sections = split_post(done["content"])
+    headings_ok = (
+        title == done["title"]
+        and len(sections) == args.sections
+        and all(text and "## " not in text.replace("### ", "") for _, text in sections)
+    )
+    print(f"single call : {single_seconds:6.2f}s  {single_words} words")
+    print(f"long-form   : {seconds:6.2f}s  {done['words']} words, first section after {first_section:.2f}s")
+    print(f"speedup     : {single_seconds / seconds:.1f}x   model calls: {model.calls}")
+    print(f"sections    : completion order {order}")
+    print(f"structure   : {'ok' if headings_ok else 'BROKEN'}")
+    return 0 if headings_ok else 1
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Compare sequential and outline + parallel section generation")
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--section-words", type=int, default=350)
+    parser.add_argument("--words-per-second", type=float, default=150)
+    parser.add_argument("--concurrency", type=int, default=main.LONGFORM_CONCURRENCY)
+    args = parser.parse_args()
+
+    model = FakeGeminiModel(args.words_per_second, post_words=args.sections * args.section_words)
+    main.gemini_model = model
+    main.gemini_configured = True
+    main.longform_generator.concurrency = args.concurrency
+    with loopback_server(main.app) as base_url:
+        raise SystemExit(asyncio.run(run(args, model, base_url)))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+"""Micro-benchmark: serialize_doc + FastAPI's JSON path vs serialization.py
+
+Builds N post documents shaped like the listing projection (ObjectId _id,
+datetimes, SEO metadata) and encodes them both ways:
+
+- current: serialize_doc() on every document, then jsonable_encoder and
+  json.dumps, which is what FastAPI does with a returned dict
+- streamed: serialization.stream_post_page() fed in cursor-sized batches
+
+Reports best-of-N wall time and peak traced memory for each.
+
+Usage: python bench_serialization.py [--posts 20000] [--batch 500] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+
+# Force demo mode so importing main never touches Atlas
+os.environ["MONGODB_URI"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+import serialization
+from main import serialize_doc
+from timestamps import utcnow
+
+
+def make_docs(count):
+    now = utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Benchmark post number {i}",
+            "author": "Bench",
+            "slug": f"benchmark-post-{i}",
+            "tags": ["bench", "python", "fastapi"],
+            "seo_title": f"Benchmark post number {i}",
+            "seo_description": "A post generated for the serialization benchmark " * 2,
+            "seo": {
+                "word_count": 850,
+                "reading_time": 5,
+                "seo_score": 75,
+                "keyword_density": {"python": 2.1, "fastapi": 1.4, "bench": 0.9},
+            },
+            "excerpt": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def encode_current(docs):
+    payload = {"posts": [serialize_doc(doc) for doc in docs], "next_cursor": None}
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_streamed(docs, batch_size):
+    async def batches():
+        for start in range(0, len(docs), batch_size):
+            yield docs[start:start + batch_size]
+
+    async def collect():
+        size = 0
+        async for chunk in serialization.stream_post_page(batches(), len(docs), lambda last: None):
+            # A real response writes each chunk to the socket and drops it
+            size += len(chunk)
+        return size
+
+    return asyncio.run(collect())
+
+
+async def _collect_chunks(docs):
+    async def batches():
+        yield docs
+    return [chunk async for chunk in serialization.stream_post_page(batches(), len(docs), lambda last: None)]
+
+
+def measure(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.posts)
+
+    # Both paths must produce the same document
+    assert json.loads(encode_current(docs[:50])) == json.loads(
+        b"".join(asyncio.run(_collect_chunks(docs[:50])))
+    ), "encoders disagree"
+
+    print("🧪 Serialization Benchmark")
+    print("=" * 50)
+    print(f"Posts: {args.posts}  batch: {args.batch}  encoder: {'orjson' if serialization.orjson else 'json'}")
+
+    current_time, current_peak = measure(lambda: encode_current(docs), args.repeat)
+    streamed_time, streamed_peak = measure(lambda: encode_streamed(docs, args.batch), args.repeat)
+
+    print("-" * 50)
+    print(f"serialize_doc + jsonable_encoder: {current_time * 1000:8.1f}ms  peak {current_peak / 1e6:7.1f}MB")
+    print(f"serialization.stream_post_page:   {streamed_time * 1000:8.1f}ms  peak {streamed_peak / 1e6:7.1f}MB")
+    print(f"Speed-up: {current_time / streamed_time:.1f}x  memory: {current_peak / max(streamed_peak, 1):.1f}x less")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main_cli()
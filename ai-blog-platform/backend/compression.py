@@ -0,0 +1,115 @@
+"""Gzip response compression.
+
+Listings and exports are large, repetitive JSON and compress several
+times over. Starlette's ``GZipMiddleware`` has no content-type allowlist
+and buffers streamed responses, which would hold back Server-Sent Events,
+so this is a small pure ASGI replacement:
+
+- only content types in ``content_types`` are compressed, so images and
+  ``text/event-stream`` pass through untouched;
+- complete responses smaller than ``minimum_size`` are sent as they are;
+- streamed responses (listings, NDJSON batches and exports) are
+  compressed chunk by chunk with a sync flush after each one, so every
+  chunk still reaches the client as soon as it is produced.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+DEFAULT_CONTENT_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "application/javascript",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "text/xml",
+})
+
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def accepts_gzip(accept_encoding):
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            quality = params.strip().lower()
+            return quality.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, compresslevel=6, content_types=DEFAULT_CONTENT_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.content_types = frozenset(content_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether
+                # the response is complete or streamed
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start["headers"])
+                eligible = self._eligible(start["status"], headers)
+                if eligible:
+                    headers.add_vary_header("Accept-Encoding")
+                if not eligible or (not more_body and len(body) < self.minimum_size):
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, GZIP_WBITS)
+                headers["Content-Encoding"] = "gzip"
+                # The bytes differ from the identity encoding, so a strong
+                # ETag would be wrong; weak comparison still matches it
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    del headers["Content-Length"]
+                    body = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                else:
+                    body = compressor.compress(body) + compressor.flush()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if compressor is None:
+                await send(message)
+                return
+            if more_body:
+                body = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            else:
+                body = compressor.compress(body) + compressor.flush()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _eligible(self, status, headers):
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return content_type in self.content_types
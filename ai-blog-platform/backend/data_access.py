@@ -0,0 +1,269 @@
+"""Non-blocking access to the blocking backends (pymongo and Gemini).
+
+pymongo and google-generativeai are synchronous libraries. Calling them
+directly inside an ``async def`` route blocks the whole event loop, so every
+call goes through a worker thread here instead. Each backend has its own
+capacity limiter, so a burst of slow generations cannot use up the threads
+that database queries need (and the other way round).
+
+Limits are configured through the environment:
+
+- ``MONGO_MAX_CONCURRENCY``  (default 20)
+- ``GEMINI_MAX_CONCURRENCY`` (default 4)
+- ``GEMINI_LONGFORM_MAX_CONCURRENCY`` (default 6): long-form generation's
+  calls, kept apart so every section of a default six-section post can be
+  written at once without waiting behind (or starving) other generation
+
+Every MongoDB operation and Gemini call is timed and counted in
+``metrics``. Times include waiting for a worker thread, which is where
+contention shows up under load.
+"""
+import asyncio
+import itertools
+import os
+import time
+import weakref
+from functools import partial
+
+import anyio
+from anyio import to_thread
+
+import metrics
+
+MONGO_MAX_CONCURRENCY = int(os.getenv("MONGO_MAX_CONCURRENCY", "20"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_LONGFORM_MAX_CONCURRENCY = int(os.getenv("GEMINI_LONGFORM_MAX_CONCURRENCY", "6"))
+
+BACKEND_LIMITS = {
+    "mongo": MONGO_MAX_CONCURRENCY,
+    "gemini": GEMINI_MAX_CONCURRENCY,
+    "gemini_longform": GEMINI_LONGFORM_MAX_CONCURRENCY,
+}
+
+# Limiters are created lazily per event loop: anyio needs a running loop to
+# build one, and test clients may start several loops in one process
+_limiters = weakref.WeakKeyDictionary()
+
+_STOP = object()
+
+
+def get_limiter(backend):
+    loop = asyncio.get_running_loop()
+    loop_limiters = _limiters.setdefault(loop, {})
+    if backend not in loop_limiters:
+        loop_limiters[backend] = anyio.CapacityLimiter(BACKEND_LIMITS[backend])
+    return loop_limiters[backend]
+
+
+async def run_blocking(backend, func, *args, **kwargs):
+    """Run a blocking call in a worker thread under the backend's limit"""
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=get_limiter(backend))
+
+
+async def run_mongo(func, *args, **kwargs):
+    return await run_blocking("mongo", func, *args, **kwargs)
+
+
+async def run_gemini(func, *args, **kwargs):
+    return await run_blocking("gemini", func, *args, **kwargs)
+
+
+async def run_mongo_op(operation, func, *args, **kwargs):
+    """``run_mongo`` recording the operation's latency and outcome"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await run_mongo(func, *args, **kwargs)
+        outcome = "ok"
+        return result
+    finally:
+        metrics.MONGO_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - start)
+        metrics.MONGO_OPERATIONS.labels(operation, outcome).inc()
+
+
+async def iterate_blocking(backend, iterable):
+    """Consume a blocking iterator (e.g. a streaming response) off the loop"""
+    iterator = iter(iterable)
+    while True:
+        item = await run_blocking(backend, next, iterator, _STOP)
+        if item is _STOP:
+            break
+        yield item
+
+
+class AsyncCollection:
+    """Awaitable facade over a pymongo collection.
+
+    Only the operations the routes actually use are exposed; cursors are
+    materialised inside the worker thread so no lazy network I/O leaks back
+    onto the event loop.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return await run_mongo_op("find_one", self.collection.find_one, *args, **kwargs)
+
+    async def insert_one(self, document):
+        return await run_mongo_op("insert_one", self.collection.insert_one, document)
+
+    async def insert_many(self, documents, ordered=True):
+        return await run_mongo_op("insert_many", self.collection.insert_many, documents, ordered=ordered)
+
+    async def replace_one(self, filter, replacement, **kwargs):
+        return await run_mongo_op("replace_one", self.collection.replace_one, filter, replacement, **kwargs)
+
+    async def update_one(self, filter, update, **kwargs):
+        return await run_mongo_op("update_one", self.collection.update_one, filter, update, **kwargs)
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        return await run_mongo_op(
+            "find_one_and_update", self.collection.find_one_and_update, filter, update, **kwargs
+        )
+
+    async def delete_one(self, filter):
+        return await run_mongo_op("delete_one", self.collection.delete_one, filter)
+
+    async def delete_many(self, filter):
+        return await run_mongo_op("delete_many", self.collection.delete_many, filter)
+
+    async def bulk_write(self, requests, ordered=True):
+        return await run_mongo_op("bulk_write", self.collection.bulk_write, requests, ordered=ordered)
+
+    async def estimated_document_count(self):
+        return await run_mongo_op("count", self.collection.estimated_document_count)
+
+    async def create_index(self, keys, **kwargs):
+        return await run_mongo_op("create_index", self.collection.create_index, keys, **kwargs)
+
+    async def index_information(self):
+        return await run_mongo_op("index_information", self.collection.index_information)
+
+    async def drop_index(self, name):
+        return await run_mongo_op("drop_index", self.collection.drop_index, name)
+
+    async def find_list(self, query=None, projection=None, sort=None, skip=0, limit=0):
+        def _find():
+            cursor = self.collection.find(query or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await run_mongo_op("find", _find)
+
+    async def iter_batches(self, query=None, projection=None, sort=None, batch_size=500, limit=0):
+        """Stream a large result set in batches without holding it all.
+
+        Each batch is fetched in a worker thread; only one batch is in
+        memory at a time.
+        """
+        cursor = self.collection.find(query or {}, projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        try:
+            while True:
+                batch = await run_mongo_op("find_batch", lambda: list(itertools.islice(cursor, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+
+
+async def prefetch(batches):
+    """Fetch the first batch of an async batch iterator right away.
+
+    Once a streaming response has started, its status code can no longer
+    change. Fetching the first batch before returning the response means
+    query errors still become a proper error response.
+    """
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def resumed():
+        try:
+            if first is not None:
+                yield first
+                async for batch in batches:
+                    yield batch
+        finally:
+            await batches.aclose()
+
+    return resumed()
+
+
+# Rough characters-per-token ratio, used when the API reports no usage
+CHARS_PER_TOKEN = 4
+
+
+def _chunk_text(chunk):
+    # Chunks blocked by safety filters raise on .text instead of being empty
+    try:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+
+def _record_tokens(response, prompt, completion_chars):
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) if usage is not None else 0
+    completion_tokens = getattr(usage, "candidates_token_count", 0) if usage is not None else 0
+    metrics.GEMINI_TOKENS.labels("prompt").inc(prompt_tokens or len(prompt) // CHARS_PER_TOKEN)
+    metrics.GEMINI_TOKENS.labels("completion").inc(completion_tokens or completion_chars // CHARS_PER_TOKEN)
+
+
+class _GeminiCall:
+    """Times one Gemini call and records its outcome"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.outcome = "error"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        metrics.GEMINI_IN_FLIGHT.inc()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics.GEMINI_IN_FLIGHT.dec()
+        if exc_type is GeneratorExit or exc_type is asyncio.CancelledError:
+            self.outcome = "cancelled"
+        metrics.GEMINI_REQUEST_DURATION.labels(self.mode).observe(time.perf_counter() - self.start)
+        metrics.GEMINI_REQUESTS.labels(self.mode, self.outcome).inc()
+        return False
+
+
+async def generate_content(model, prompt, backend="gemini", **kwargs):
+    """Non-blocking ``model.generate_content``, under ``backend``'s limit"""
+    with _GeminiCall("generate") as call:
+        response = await run_blocking(backend, model.generate_content, prompt, **kwargs)
+        _record_tokens(response, prompt, len(_chunk_text(response)))
+        call.outcome = "ok"
+        return response
+
+
+async def stream_content(model, prompt, **kwargs):
+    """Yield streaming chunks from ``model.generate_content(stream=True)``.
+
+    Opening the stream and pulling each chunk both block on the network, so
+    both happen in worker threads under the Gemini limit.
+    """
+    with _GeminiCall("stream") as call:
+        response = await run_gemini(model.generate_content, prompt, stream=True, **kwargs)
+        completion_chars = 0
+        last = response
+        async for chunk in iterate_blocking("gemini", response):
+            completion_chars += len(_chunk_text(chunk))
+            last = chunk
+            yield chunk
+        # The final chunk carries the usage totals for the whole response
+        _record_tokens(last, prompt, completion_chars)
+        call.outcome = "ok"
@@ -0,0 +1,295 @@
+"""Drafts with revisions, delta autosave and coalesced snapshots.
+
+The editor autosaves every few seconds. Sending the whole body each time
+would cost bandwidth and a database write proportional to the post, for
+an edit of a few characters. Instead:
+
+- a draft carries a ``revision`` that every change increments;
+- ``patch`` takes a list of small operations against a known revision.
+  A ``splice`` replaces a range of a text field, and a ``set`` replaces a
+  short field outright. If the revision has moved on, the patch is
+  rejected (``RevisionConflict``) and the client rebases;
+- patches are applied to the live copy held in this process and only
+  mark it dirty. ``flush`` writes each dirty draft once, however many
+  autosaves it took, and runs every ``snapshot_interval`` seconds.
+
+So the request size scales with the edit, and database writes scale with
+time rather than keystrokes.
+
+Splice offsets count UTF-16 code units, as JavaScript string indices do,
+so the editor can send the positions it already has.
+
+Drafts are persisted to a Mongo collection when one is given. Without
+one they exist only in process memory (demo mode). A draft lives in the
+process that last loaded it, so with several worker processes (and no
+sticky routing) the store runs ``write_through``: every read goes to the
+collection and every patch is one conditional update on the revision, so
+any worker can serve any autosave. Requests stay delta-sized. Only the
+write coalescing is given up.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+from timestamps import isoformat, utcnow
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ("title", "content", "seo_title", "seo_description", "author", "slug")
+LIST_FIELDS = ("tags",)
+FIELDS = TEXT_FIELDS + LIST_FIELDS
+
+MAX_CONTENT_LENGTH = 500_000  # UTF-16 code units
+MAX_FIELD_LENGTH = 1000
+
+PATCHES = metrics.REGISTRY.counter(
+    "draft_patches", "Draft patch requests by outcome", ("outcome",)
+)
+PATCH_BYTES = metrics.REGISTRY.counter(
+    "draft_patch_text_bytes", "Text carried by draft patch operations"
+)
+SNAPSHOTS = metrics.REGISTRY.counter(
+    "draft_snapshots", "Draft snapshots written to storage"
+)
+
+
+class DraftNotFound(Exception):
+    pass
+
+
+class RevisionConflict(Exception):
+    def __init__(self, current):
+        super().__init__(f"Draft is at revision {current}")
+        self.current = current
+
+
+class InvalidPatch(Exception):
+    pass
+
+
+def splice_utf16(text, start, delete, insert):
+    """Replace ``delete`` UTF-16 code units at ``start`` with ``insert``"""
+    units = text.encode("utf-16-le")
+    begin, end = start * 2, (start + delete) * 2
+    if start < 0 or delete < 0 or end > len(units):
+        raise InvalidPatch(f"Splice {start}+{delete} is outside the text ({len(units) // 2} units)")
+    try:
+        return (units[:begin] + insert.encode("utf-16-le") + units[end:]).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise InvalidPatch("Splice splits a surrogate pair")
+
+
+def utf16_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def apply_ops(draft, ops):
+    """Apply patch operations to a copy of the draft's fields"""
+    fields = {name: draft.get(name) for name in FIELDS}
+    for op in ops:
+        name = op.get("field")
+        if name not in FIELDS:
+            raise InvalidPatch(f"Unknown field: {name}")
+        kind = op.get("op")
+        if kind == "splice":
+            if name not in TEXT_FIELDS:
+                raise InvalidPatch(f"Cannot splice {name}")
+            insert = op.get("insert", "")
+            if not isinstance(insert, str):
+                raise InvalidPatch("Splice insert must be a string")
+            fields[name] = splice_utf16(fields[name] or "", int(op.get("start", 0)), int(op.get("delete", 0)), insert)
+        elif kind == "set":
+            value = op.get("value")
+            if name in LIST_FIELDS:
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    raise InvalidPatch(f"{name} must be a list of strings")
+            elif value is not None and not isinstance(value, str):
+                raise InvalidPatch(f"{name} must be a string")
+            fields[name] = value
+        else:
+            raise InvalidPatch(f"Unknown op: {kind}")
+    for name in TEXT_FIELDS:
+        limit = MAX_CONTENT_LENGTH if name == "content" else MAX_FIELD_LENGTH
+        if fields[name] and utf16_length(fields[name]) > limit:
+            raise InvalidPatch(f"{name} is longer than {limit} characters")
+    return fields
+
+
+def draft_view(draft):
+    view = {key: value for key, value in draft.items() if key != "_id"}
+    view["id"] = draft["_id"]
+    for key in ("created_at", "updated_at"):
+        if isinstance(view.get(key), datetime):
+            view[key] = isoformat(view[key])
+    return view
+
+
+class DraftStore:
+    def __init__(self, collection=None, snapshot_interval=10.0, idle_seconds=1800, max_live=10000,
+                 write_through=False):
+        self.collection = collection  # AsyncCollection or None
+        # Without a collection there is nothing to write through to
+        self.write_through = write_through and collection is not None
+        self.snapshot_interval = snapshot_interval
+        self.idle_seconds = idle_seconds
+        self.max_live = max_live
+        self._live = {}  # draft id -> draft
+        self._touched = {}  # draft id -> monotonic time of last use
+        self._dirty = set()
+        self._loading = {}  # draft id -> asyncio.Future, so concurrent loads share one read
+        # Recently deleted draft ids, so a write or load already in flight
+        # when the delete ran can't bring the draft back
+        self._deleted = OrderedDict()
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("updated_at", name="updated_at")
+
+    async def create(self, fields):
+        now = utcnow()
+        draft = {"_id": uuid.uuid4().hex, "revision": 1, "created_at": now, "updated_at": now}
+        draft.update(apply_ops({}, [{"op": "set", "field": name, "value": fields.get(name)} for name in FIELDS]))
+        if self.collection is not None:
+            await self.collection.insert_one(dict(draft))
+        if not self.write_through:
+            self._remember(draft)
+        return draft
+
+    async def get(self, draft_id):
+        if self.write_through:
+            draft = await self.collection.find_one({"_id": draft_id})
+            if draft is None:
+                raise DraftNotFound(draft_id)
+            return draft
+        draft = self._live.get(draft_id)
+        if draft is None:
+            draft = await self._load(draft_id)
+        self._touched[draft_id] = time.monotonic()
+        return draft
+
+    async def patch(self, draft_id, base_revision, ops):
+        draft = await self.get(draft_id)
+        # No awaits from here on: the check and the update are atomic
+        # (write-through relies on the conditional update instead)
+        if draft["revision"] != base_revision:
+            PATCHES.labels("conflict").inc()
+            raise RevisionConflict(draft["revision"])
+        try:
+            fields = apply_ops(draft, ops)
+        except InvalidPatch:
+            PATCHES.labels("invalid").inc()
+            raise
+        fields["revision"] = base_revision + 1
+        fields["updated_at"] = utcnow()
+        if self.write_through:
+            result = await self.collection.update_one(
+                {"_id": draft_id, "revision": base_revision}, {"$set": fields}
+            )
+            if result.matched_count == 0:
+                # Another worker applied a patch in between
+                PATCHES.labels("conflict").inc()
+                current = await self.collection.find_one({"_id": draft_id}, {"revision": 1})
+                if current is None:
+                    raise DraftNotFound(draft_id)
+                raise RevisionConflict(current["revision"])
+            SNAPSHOTS.inc()
+        else:
+            self._dirty.add(draft_id)
+        draft.update(fields)
+        PATCHES.labels("applied").inc()
+        PATCH_BYTES.inc(sum(len(op.get("insert") or "") for op in ops))
+        return draft
+
+    async def delete(self, draft_id):
+        if self.write_through:
+            result = await self.collection.delete_one({"_id": draft_id})
+            if result.deleted_count == 0:
+                raise DraftNotFound(draft_id)
+            return
+        await self.get(draft_id)
+        self._live.pop(draft_id, None)
+        self._touched.pop(draft_id, None)
+        self._dirty.discard(draft_id)
+        self._deleted[draft_id] = True
+        while len(self._deleted) > self.max_live:
+            self._deleted.popitem(last=False)
+        if self.collection is not None:
+            await self.collection.delete_one({"_id": draft_id})
+
+    async def flush(self):
+        """Write one snapshot of every draft changed since the last flush"""
+        if self.collection is None:
+            self._dirty.clear()
+            self._evict_idle()
+            return 0
+        written = 0
+        for draft_id in list(self._dirty):
+            draft = self._live.get(draft_id)
+            self._dirty.discard(draft_id)
+            if draft is None or draft_id in self._deleted:
+                continue
+            snapshot = dict(draft)
+            try:
+                # create() inserted the draft, so never upsert: a delete
+                # that lands while this write is in flight stays deleted.
+                # The revision filter keeps an older snapshot from
+                # overwriting a newer one (e.g. the shutdown flush)
+                await self.collection.replace_one(
+                    {"_id": draft_id, "revision": {"$lte": snapshot["revision"]}}, snapshot
+                )
+                written += 1
+                SNAPSHOTS.inc()
+            except Exception as e:
+                if draft_id not in self._deleted:
+                    # Keep it dirty so the next flush retries
+                    self._dirty.add(draft_id)
+                logger.warning("❌ Draft snapshot failed for %s: %s", draft_id, e)
+        self._evict_idle()
+        return written
+
+    async def run(self):
+        """Flush periodically; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.flush()
+
+    def _remember(self, draft):
+        self._live[draft["_id"]] = draft
+        self._touched[draft["_id"]] = time.monotonic()
+
+    def _evict_idle(self):
+        """Drop clean drafts nobody has used for a while (persisted ones
+        are reloaded on demand)"""
+        if self.collection is None:
+            return
+        cutoff = time.monotonic() - self.idle_seconds
+        for draft_id, touched in list(self._touched.items()):
+            if draft_id not in self._dirty and (touched < cutoff or len(self._live) > self.max_live):
+                self._live.pop(draft_id, None)
+                del self._touched[draft_id]
+
+    async def _load(self, draft_id):
+        if self.collection is None:
+            raise DraftNotFound(draft_id)
+        pending = self._loading.get(draft_id)
+        if pending is not None:
+            return await pending
+        future = self._loading[draft_id] = asyncio.get_running_loop().create_future()
+        try:
+            draft = await self.collection.find_one({"_id": draft_id})
+            if draft is None or draft_id in self._deleted:
+                raise DraftNotFound(draft_id)
+            # A concurrent create or load may have won the race
+            draft = self._live.setdefault(draft_id, draft)
+            future.set_result(draft)
+            return draft
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._loading[draft_id]
@@ -0,0 +1,123 @@
+"""Fakes and fixtures shared by the tests and benchmarks.
+
+``FakeGeminiModel`` stands in for ``genai.GenerativeModel``. It answers the
+prompts the app sends by their kind:
+
+- a long-form outline (``Use exactly N sections``): a title and N headings,
+  or ``outline`` verbatim when given;
+- a long-form section (``Write only section N``): ``Section N`` and its
+  words, with an echoed and a nested ``##`` heading, as models write them;
+- anything else: a whole post of ``post_words`` words.
+
+Like the real client it blocks while it "writes", for as long as the text
+would take at ``words_per_second`` (no time at all when None), and with
+``stream=True`` it yields the text in chunks of ``chunk_words`` words.
+
+``loopback_server`` serves an app with uvicorn on a real socket, for the
+behaviour the in-process transports hide (client disconnects, buffering).
+"""
+import contextlib
+import re
+import socket
+import threading
+import time
+
+import uvicorn
+
+_SECTIONS = re.compile(r"Use exactly (\d+) sections")
+_SECTION = re.compile(r"Write only section (\d+)")
+_WORDS = re.compile(r"About (\d+) words")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    def __init__(self, words_per_second=None, post_words=300, chunk_words=20,
+                 outline=None, fail_sections=(), section_seconds=None):
+        self.words_per_second = words_per_second
+        self.post_words = post_words
+        self.chunk_words = chunk_words
+        self.outline = outline
+        self.fail_sections = set(fail_sections)  # section numbers (from 1) that always fail
+        self.section_seconds = section_seconds or {}  # section number -> latency, overriding the rate
+        self.calls = 0
+        self.chunks_sent = 0
+        self._lock = threading.Lock()  # calls arrive on several worker threads
+
+    # The app's startup warm-up loads the SDK; there is nothing to load
+    loaded = True
+
+    def load(self):
+        pass
+
+    def _answer(self, prompt):
+        """``(text, seconds to write it)`` for a prompt"""
+        sections = _SECTIONS.search(prompt)
+        section = _SECTION.search(prompt)
+        if sections:
+            count = int(sections.group(1))
+            text = self.outline
+            if text is None:
+                text = "TITLE: A Long Post\n" + "\n".join(f"{n}. Part {n} of the topic" for n in range(1, count + 1))
+        elif section:
+            number = int(section.group(1))
+            if number in self.fail_sections:
+                raise RuntimeError(f"Section {number} failed")
+            half = int(_WORDS.search(prompt).group(1)) // 2
+            text = (f"## Echoed heading\n\nSection {number} " + "word " * half
+                    + "\n\n## Nested\n\n" + "word " * half).strip()
+            if number in self.section_seconds:
+                return text, self.section_seconds[number]
+        else:
+            text = "# A Long Post\n\n" + " ".join(["word"] * self.post_words)
+        return text, self._seconds(text)
+
+    def _seconds(self, text):
+        if not self.words_per_second:
+            return 0.0
+        return len(text.split()) / self.words_per_second
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text, seconds = self._answer(prompt)
+        if not stream:
+            time.sleep(seconds)
+            return FakeResponse(text)
+
+        def chunks():
+            words = text.split(" ")
+            for start in range(0, len(words), self.chunk_words):
+                chunk = " ".join(words[start:start + self.chunk_words])
+                if start + self.chunk_words < len(words):
+                    chunk += " "
+                time.sleep(self._seconds(chunk))
+                with self._lock:
+                    self.chunks_sent += 1
+                yield FakeResponse(chunk)
+        return chunks()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def loopback_server(app):
+    """Serve ``app`` with uvicorn on 127.0.0.1 in a background thread"""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
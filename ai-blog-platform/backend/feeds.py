@@ -0,0 +1,249 @@
+"""Sitemap and RSS feed, kept current incrementally.
+
+Crawlers and feed readers fetch these often and in bursts. Building them
+per request would scan every post. Instead ``FeedIndex`` keeps the few
+fields they need for each post (slug, titles, description, timestamps) in
+memory, and renders each XML document once and caches it:
+
+- posts are placed in sitemap shards in the order they arrive, so a new
+  post only changes the last shard. Sitemaps are capped at 50,000 URLs,
+  so ``/sitemap.xml`` is one ``urlset`` up to ``shard_size`` posts and a
+  ``sitemapindex`` of ``/sitemap-<n>.xml`` shards beyond that;
+- ``/feed.xml`` (RSS 2.0) has the ``feed_size`` newest posts by creation
+  date, tracked as posts are added;
+- every document has a version that ``add`` bumps when one of its posts
+  changes, so a cached rendering is reused until then. Its ETag is a hash
+  of the body, so every process serving the same posts gives the same one.
+
+The index is filled from a projected cursor (``storage.iter_posts``) at
+startup. Local writes are added directly, and ``refresh`` picks up posts
+written since the last refresh (by other processes too), by their
+``indexed_at`` write stamp: imported posts keep older timestamps.
+"""
+import asyncio
+import bisect
+import hashlib
+import re
+from datetime import datetime
+from email.utils import format_datetime
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from post_cache import Validators
+from storage import REFRESH_OVERLAP
+from timestamps import as_utc
+
+SITEMAP_SHARD_SIZE = 50_000  # the sitemap protocol's limit
+FEED_SIZE = 50
+FIELDS = ("slug", "title", "seo_title", "seo_description", "excerpt", "author", "created_at", "updated_at",
+          "indexed_at")
+
+SITEMAP_MEDIA_TYPE = "application/xml"
+FEED_MEDIA_TYPE = "application/rss+xml"
+
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _text(value):
+    return escape(_INVALID_XML.sub("", value or ""))
+
+
+def _w3c_date(value):
+    return as_utc(value).replace(microsecond=0).isoformat()
+
+
+def _entry(document):
+    created_at = document.get("created_at")
+    return (
+        document["slug"],
+        document.get("seo_title") or document.get("title") or "",
+        document.get("seo_description") or document.get("excerpt") or "",
+        document.get("author") or "",
+        created_at,
+        document.get("updated_at") or created_at,
+    )
+
+
+class FeedIndex:
+    def __init__(self, site_url, post_path="/posts/{slug}", title="Blog", description="",
+                 shard_size=SITEMAP_SHARD_SIZE, feed_size=FEED_SIZE, documents_url=None):
+        self.site_url = site_url.rstrip("/")
+        # Where the XML documents themselves are served (the shard links
+        # in a sitemap index, the feed's self link); the site by default
+        self.documents_url = (documents_url or site_url).rstrip("/")
+        self.post_path = post_path
+        self.title = title
+        self.description = description
+        self.shard_size = shard_size
+        self.feed_size = feed_size
+        self._entries = {}  # post id (str) -> entry tuple (see _entry)
+        self._order = []  # post ids in arrival order; shard n is a slice of it
+        self._position = {}  # post id -> index in _order
+        self._shard_modified = []  # shard -> newest updated_at in it
+        self._latest = []  # (created_at, post id) of the newest posts, oldest first
+        self._versions = {}  # document name -> version
+        self._rendered = {}  # document name -> (version, body, Validators)
+        # post id -> (entry, its <url> line); only touched by render threads,
+        # so re-rendering a shard only formats the posts that changed
+        self._url_lines = {}
+        self._watermark = None  # newest indexed_at seen by refresh
+        self.loaded = False  # until the first refresh, the documents would be empty
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def shards(self):
+        return max(1, -(-len(self._order) // self.shard_size))
+
+    def post_url(self, slug):
+        return self.site_url + self.post_path.format(slug=quote(slug, safe=""))
+
+    def _changed(self, name):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    def add(self, document):
+        """Add or update one post (any document with the ``FIELDS``)"""
+        post_id = str(document["_id"])
+        entry = _entry(document)
+        old = self._entries.get(post_id)
+        if old == entry:
+            return
+        self._entries[post_id] = entry
+        if old is None:
+            self._position[post_id] = len(self._order)
+            self._order.append(post_id)
+        shard = self._position[post_id] // self.shard_size
+        if shard == len(self._shard_modified):
+            self._shard_modified.append(None)
+        if isinstance(entry[5], datetime) and (self._shard_modified[shard] is None or entry[5] > self._shard_modified[shard]):
+            self._shard_modified[shard] = entry[5]
+        self._changed(f"sitemap-{shard}")
+        # The index lists every shard with its last modification
+        self._changed("sitemap-index")
+        self._update_latest(post_id, old[4] if old else None, entry[4])
+
+    def _update_latest(self, post_id, old_created_at, created_at):
+        listed = old_created_at is not None and self._latest and (old_created_at, post_id) >= self._latest[0]
+        if listed:
+            self._latest.remove((old_created_at, post_id))
+        elif created_at is None or (len(self._latest) >= self.feed_size and (created_at, post_id) < self._latest[0]):
+            return
+        if created_at is not None:
+            bisect.insort(self._latest, (created_at, post_id))
+            if len(self._latest) > self.feed_size:
+                del self._latest[0]
+        self._changed("feed")
+
+    async def refresh(self, storage, batch_size=1000):
+        """Index posts written since the last refresh (all of them the
+        first time); returns how many were read"""
+        read = 0
+        since = self._watermark - REFRESH_OVERLAP if self._watermark else None
+        async for batch in storage.iter_posts(batch_size=batch_size, indexed_since=since, fields=FIELDS):
+            for document in batch:
+                # Re-reading an unchanged post is a no-op
+                self.add(document)
+                indexed_at = document.get("indexed_at")
+                if indexed_at and (self._watermark is None or indexed_at > self._watermark):
+                    self._watermark = indexed_at
+            read += len(batch)
+        self.loaded = True
+        return read
+
+    async def document(self, name):
+        """``(body, validators)`` for ``sitemap``, ``sitemap-<n>`` or
+        ``feed``, or None if there is no such document"""
+        if name == "sitemap":
+            name = "sitemap-index" if self.shards > 1 else "sitemap-0"
+        elif name.startswith("sitemap-") and name != "sitemap-index":
+            shard = name.removeprefix("sitemap-")
+            if not shard.isdigit() or int(shard) >= self.shards:
+                return None
+            name = f"sitemap-{int(shard)}"
+        elif name != "feed":
+            return None
+
+        version = self._versions.get(name, 0)
+        cached = self._rendered.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        # Take the entries on the event loop; format them in a thread
+        if name == "feed":
+            entries = [self._entries[post_id] for _, post_id in reversed(self._latest)]
+            render = lambda: self._render_feed(entries)
+        elif name == "sitemap-index":
+            shards = list(self._shard_modified)
+            render = lambda: self._render_index(shards)
+        else:
+            entries = self._shard_entries(int(name.removeprefix("sitemap-")))
+            render = lambda: self._render_urlset(entries)
+        body, modified_at = await asyncio.to_thread(render)
+        validators = Validators(f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', modified_at)
+        # A write during the render bumped the version; the next request
+        # renders again
+        self._rendered[name] = (version, body, validators)
+        return body, validators
+
+    def _shard_entries(self, shard):
+        ids = self._order[shard * self.shard_size:(shard + 1) * self.shard_size]
+        return [(post_id, self._entries[post_id]) for post_id in ids]
+
+    def _render_urlset(self, entries):
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+        for post_id, entry in entries:
+            cached = self._url_lines.get(post_id)
+            if cached is None or cached[0] is not entry:
+                slug, updated_at = entry[0], entry[5]
+                line = f"<url><loc>{_text(self.post_url(slug))}</loc>"
+                if updated_at:
+                    line += f"<lastmod>{_w3c_date(updated_at)}</lastmod>"
+                cached = self._url_lines[post_id] = (entry, line + "</url>\n")
+            parts.append(cached[1])
+        parts.append("</urlset>\n")
+        return "".join(parts).encode(), _newest([entry for _, entry in entries])
+
+    def _render_index(self, shards):
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+        newest = None
+        for shard, modified_at in enumerate(shards):
+            parts.append(f"<sitemap><loc>{_text(self.documents_url)}/sitemap-{shard}.xml</loc>")
+            if modified_at:
+                parts.append(f"<lastmod>{_w3c_date(modified_at)}</lastmod>")
+                newest = max(newest, modified_at) if newest else modified_at
+            parts.append("</sitemap>\n")
+        parts.append("</sitemapindex>\n")
+        return "".join(parts).encode(), newest
+
+    def _render_feed(self, entries):
+        newest = _newest(entries)
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">\n<channel>\n',
+            f"<title>{_text(self.title)}</title>\n",
+            f"<link>{_text(self.site_url)}/</link>\n",
+            f"<description>{_text(self.description)}</description>\n",
+            f'<atom:link href="{_text(self.documents_url)}/feed.xml" rel="self" type="{FEED_MEDIA_TYPE}"/>\n',
+        ]
+        if newest:
+            parts.append(f"<lastBuildDate>{format_datetime(as_utc(newest), usegmt=True)}</lastBuildDate>\n")
+        for slug, title, description, author, created_at, _ in entries:
+            url = _text(self.post_url(slug))
+            parts.append(f"<item><title>{_text(title)}</title><link>{url}</link>")
+            parts.append(f'<guid isPermaLink="true">{url}</guid>')
+            if description:
+                parts.append(f"<description>{_text(description)}</description>")
+            if author:
+                parts.append(f"<dc:creator>{_text(author)}</dc:creator>")
+            parts.append(f"<pubDate>{format_datetime(as_utc(created_at), usegmt=True)}</pubDate></item>\n")
+        parts.append("</channel>\n</rss>\n")
+        return "".join(parts).encode(), newest
+
+
+def _newest(entries):
+    dates = [entry[5] for entry in entries if isinstance(entry[5], datetime)]
+    return max(dates) if dates else None
@@ -0,0 +1,42 @@
+"""Lazily constructed Gemini model.
+
+Importing ``google.generativeai`` pulls in grpc and protobuf and takes
+seconds. Doing it when ``main`` is imported stalls every cold start and
+``--reload`` restart, even though no request needs Gemini yet.
+``LazyGeminiModel`` has the ``generate_content`` interface of
+``genai.GenerativeModel`` and only imports and configures the SDK on first
+use. That first use happens in a worker thread (see ``data_access``), so
+the event loop never waits for the import. ``load`` can be called ahead of
+time to warm it in the background.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LazyGeminiModel:
+    def __init__(self, api_key, model_name):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        """Import and configure the SDK (blocking; call from a thread)"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    logger.info("✅ Gemini API configured with %s", self.model_name)
+        return self._model
+
+    def generate_content(self, prompt, **kwargs):
+        return self.load().generate_content(prompt, **kwargs)
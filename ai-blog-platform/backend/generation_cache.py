@@ -0,0 +1,245 @@
+"""Cache for AI generation results, with single-flight coalescing.
+
+Editors often send the same prompt again (double-clicks, retries after a
+timeout, the canned suggestions in the AI assistant). Each repeat would
+otherwise cost a full Gemini round-trip. Results are cached in two tiers:
+
+- an in-process LRU with a TTL, which serves most hits;
+- an optional ``SharedCache`` (see ``shared_cache``) when several worker
+  processes run on one host, so one worker's result serves the others;
+- an optional Mongo collection with a TTL index, which survives restarts
+  and is shared by every process that uses the same database.
+
+Concurrent requests for the same key share one upstream call. It runs as
+its own task that every caller awaits, so a caller that disconnects
+doesn't fail the others; the call is only cancelled once no caller is
+left waiting.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+SHARED_NAMESPACE = "generation"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts match"""
+    return _WHITESPACE.sub(" ", prompt).strip().lower()
+
+
+def cache_key(prompt, config=None):
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "config": config or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Flight:
+    """One in-flight generation and how many callers await it"""
+
+    __slots__ = ("key", "task", "waiters")
+
+    def __init__(self, key, task):
+        self.key = key
+        self.task = task
+        self.waiters = 0
+
+
+class GenerationCache:
+    def __init__(self, max_entries=256, ttl_seconds=3600, collection=None, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection  # AsyncCollection or None
+        self.shared = shared  # SharedCache or None
+        self._entries = OrderedDict()  # key -> (expires_at, content)
+        self._inflight = {}  # key -> _Flight
+        self.hits = 0
+        self.shared_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index(
+                "created_at", expireAfterSeconds=self.ttl_seconds, name="created_at_ttl"
+            )
+
+    def _get_local(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return content
+
+    def _put_local(self, key, content):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, key):
+        if self.shared is None:
+            return None
+        return await self.shared.get(SHARED_NAMESPACE, key)
+
+    async def _put_shared(self, key, content):
+        if self.shared is not None:
+            await self.shared.set(SHARED_NAMESPACE, key, content, ttl=self.ttl_seconds)
+
+    async def _get_persistent(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = await self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning("❌ Generation cache lookup failed: %s", e)
+            return None
+        if not doc:
+            return None
+        # Mongo's TTL monitor only runs once a minute, so check age here too
+        if doc["created_at"] < utcnow() - timedelta(seconds=self.ttl_seconds):
+            return None
+        return doc["content"]
+
+    async def _put_persistent(self, key, content):
+        if self.collection is None:
+            return
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"_id": key, "content": content, "created_at": utcnow()},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning("❌ Generation cache write failed: %s", e)
+
+    async def lookup(self, key):
+        """Return cached content for key from either tier, or None"""
+        content = self._get_local(key)
+        if content is not None:
+            self.hits += 1
+            return content
+        content = await self._get_shared(key)
+        if content is not None:
+            self.shared_hits += 1
+            self._put_local(key, content)
+            return content
+        content = await self._get_persistent(key)
+        if content is not None:
+            self.persistent_hits += 1
+            self._put_local(key, content)
+            await self._put_shared(key, content)
+            return content
+        return None
+
+    async def store(self, key, content):
+        self._put_local(key, content)
+        await self._put_shared(key, content)
+        await self._put_persistent(key, content)
+
+    async def get_or_generate(self, key, producer, bypass=False):
+        """Return ``(content, status)`` for key.
+
+        ``producer`` is an async callable that generates the content on a
+        miss. ``status`` is one of ``hit``, ``miss``, ``coalesced`` or
+        ``bypass``. Bypassing skips the lookup but still refreshes the
+        cache with the new result.
+        """
+        if bypass:
+            self.bypassed += 1
+            content = await producer()
+            await self.store(key, content)
+            return content, "bypass"
+
+        if key not in self._inflight:
+            content = await self.lookup(key)
+            if content is not None:
+                return content, "hit"
+
+        # Re-checked after the lookup await: another caller may have started
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return await self._wait(flight), "coalesced"
+
+        self.misses += 1
+        flight = self._inflight[key] = _Flight(key, asyncio.create_task(self._generate(key, producer)))
+        return await self._wait(flight), "miss"
+
+    async def _generate(self, key, producer):
+        """The shared call behind one in-flight key, run as its own task so
+        a caller that goes away doesn't take it down for the others"""
+        try:
+            content = await producer()
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._forget(key, asyncio.current_task())
+        # New callers hit the local tier from here on
+        self._put_local(key, content)
+        await self._put_shared(key, content)
+        await self._put_persistent(key, content)
+        return content
+
+    async def _wait(self, flight):
+        flight.waiters += 1
+        try:
+            # shield: one caller being cancelled must not cancel the call
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.done() and not flight.task.cancelled():
+                # Mark the outcome as retrieved
+                flight.task.exception()
+            elif flight.waiters == 1:
+                # The last caller left: stop generating for nobody, and let
+                # the next caller start afresh rather than join a cancelled call
+                self._forget(flight.key, flight.task)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key, task):
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.persistent_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.collection is not None,
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,428 @@
+"""Asynchronous generation jobs.
+
+``POST /api/generate-content`` holds a connection open for the whole
+Gemini call, and a burst of them goes straight to the upstream quota. The
+scheduler here decouples the two:
+
+- submitting a job returns its id immediately;
+- a fixed pool of workers runs jobs, so at most ``workers`` generations
+  are in flight;
+- a token bucket caps the rate of upstream calls (``rate_per_minute``
+  with a ``burst`` allowance);
+- queued jobs run in priority order (high, normal, low), FIFO within a
+  priority;
+- a full queue rejects new jobs instead of letting them time out later.
+
+Jobs are stored in a Mongo collection when one is given (with a TTL
+index), so queued and interrupted jobs are picked up again after a
+restart. Without one they live in a process-local dict (demo mode).
+
+Several processes can share the collection (``serve.py`` workers). A job
+is claimed atomically, QUEUED to RUNNING, before it runs, so a job that
+two processes have queued still runs once. The claim takes a lease
+(``worker_id``, ``lease_until``) that is renewed while the job runs. Only
+running jobs whose lease has expired (their process died) are requeued,
+on start and then every ``lease_seconds``.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+import metrics
+from timestamps import isoformat, utcnow
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+JOB_TTL_SECONDS = 24 * 3600
+JOB_LEASE_SECONDS = 60
+MAX_LOCAL_JOBS = 10000
+STATS_WINDOW = 1000
+
+JOBS = metrics.REGISTRY.counter(
+    "generation_jobs", "Generation jobs by final outcome", ("outcome",)
+)
+QUEUE_DEPTH = metrics.REGISTRY.gauge(
+    "generation_queue_depth", "Generation jobs waiting for a worker", ("priority",)
+)
+JOB_WAIT = metrics.REGISTRY.histogram(
+    "generation_job_wait_seconds", "Time generation jobs spent queued", ("priority",)
+)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second, with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def refund(self):
+        """Give back a token acquired for a call that was never made"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 3)
+
+
+def job_view(job):
+    """API representation of a job record"""
+    view = {key: value for key, value in job.items() if key != "_id"}
+    view["id"] = job["_id"]
+    for key in ("created_at", "started_at", "finished_at"):
+        if isinstance(view.get(key), datetime):
+            view[key] = isoformat(view[key])
+    return view
+
+
+class GenerationScheduler:
+    def __init__(self, run_job, collection=None, workers=4, rate_per_minute=60, burst=10,
+                 max_queue=1000, max_attempts=2, retry_delay=2.0, ttl_seconds=JOB_TTL_SECONDS,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.run_job = run_job  # async (job) -> (content, cache_status)
+        self.collection = collection  # AsyncCollection or None
+        self.workers = workers
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = None  # set by start(), in the process that runs the jobs
+
+        self._heap = []  # (priority rank, sequence, job id)
+        self._sequence = itertools.count()
+        self._available = None  # asyncio.Semaphore counting queued jobs
+        self._tasks = []
+        self._jobs = {}  # job id -> record; finished jobs are pruned past MAX_LOCAL_JOBS
+        self._changed = {}  # job id -> asyncio.Event set on the next change
+        self._running = 0
+        self._wait_times = deque(maxlen=STATS_WINDOW)
+        self._run_times = deque(maxlen=STATS_WINDOW)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def started(self):
+        return bool(self._tasks)
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index(
+                "created_at", expireAfterSeconds=self.ttl_seconds, name="created_at_ttl"
+            )
+            await self.collection.create_index([("status", 1), ("created_at", 1)], name="status_created_at")
+
+    async def start(self):
+        """Start the workers and pick up jobs other processes left behind"""
+        if self.started:
+            return
+        # Forked workers import the app once; each needs its own id
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.collection is not None:
+            # Queued jobs may also sit in a live process's queue; the claim
+            # decides which process runs them
+            queued = await self.collection.find_list({"status": QUEUED}, sort=[("created_at", 1)])
+            for job in queued:
+                self._remember(job)
+                self._enqueue(job)
+            requeued = await self._requeue_expired()
+            if queued or requeued:
+                logger.info("♻️  Picked up %d queued and %d interrupted generation jobs", len(queued), requeued)
+            self._tasks.append(asyncio.create_task(self._reap()))
+
+    async def _requeue_expired(self):
+        """Requeue running jobs whose lease ran out; returns how many"""
+        expired = await self.collection.find_list(
+            {"status": RUNNING, "$or": [{"lease_until": {"$lt": utcnow()}}, {"lease_until": None}]},
+            sort=[("created_at", 1)]
+        )
+        requeued = 0
+        for job in expired:
+            # Conditional on the lease read above: a renewal or another
+            # process's requeue in between wins
+            result = await self.collection.update_one(
+                {"_id": job["_id"], "status": RUNNING, "lease_until": job.get("lease_until")},
+                {"$set": {"status": QUEUED, "worker_id": None, "lease_until": None}}
+            )
+            if result.modified_count:
+                job.update(status=QUEUED, worker_id=None, lease_until=None)
+                self._remember(job)
+                self._enqueue(job)
+                requeued += 1
+        return requeued
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                requeued = await self._requeue_expired()
+                if requeued:
+                    logger.warning("♻️  Requeued %d generation jobs with expired leases", requeued)
+            except Exception as e:
+                logger.warning("⚠️  Generation job lease check failed: %s", e)
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay persisted for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def queue_depth(self):
+        return len(self._heap)
+
+    async def submit(self, prompt, priority="normal", bypass_cache=False):
+        if not self.started:
+            await self.start()
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull("Generation queue is full")
+        job = {
+            "_id": uuid.uuid4().hex,
+            "prompt": prompt,
+            "priority": priority,
+            "bypass_cache": bypass_cache,
+            "status": QUEUED,
+            "attempts": 0,
+            "content": None,
+            "error": None,
+            "cache": None,
+            "created_at": utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        if self.collection is not None:
+            await self.collection.insert_one(job)
+        self._remember(job)
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None and self.collection is not None:
+            job = await self.collection.find_one({"_id": job_id})
+        return job
+
+    def position(self, job_id):
+        """1-based position among queued jobs, or None if not queued here"""
+        for entry in self._heap:
+            if entry[2] == job_id:
+                return sum(1 for other in self._heap if other < entry) + 1
+        return None
+
+    async def wait_for_change(self, job_id, timeout):
+        """Wait until the job changes state, or timeout; True if it changed.
+
+        Call ``changed_event`` before reading the job to avoid missing a
+        change that happens in between.
+        """
+        event = self.changed_event(job_id)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def changed_event(self, job_id):
+        return self._changed.setdefault(job_id, asyncio.Event())
+
+    def stats(self):
+        depth = {name: 0 for name in PRIORITIES}
+        ranks = {rank: name for name, rank in PRIORITIES.items()}
+        for rank, _, _ in self._heap:
+            depth[ranks[rank]] += 1
+        waits = list(self._wait_times)
+        runs = list(self._run_times)
+        return {
+            "queued": len(self._heap),
+            "queued_by_priority": depth,
+            "running": self._running,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "rate_per_minute": self.bucket.rate * 60,
+            "burst": self.bucket.capacity,
+            "tokens_available": round(self.bucket.available(), 2),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else None,
+                "p50": _percentile(waits, 50),
+                "p95": _percentile(waits, 95),
+                "max": round(max(waits), 3) if waits else None,
+            },
+            "run_seconds": {
+                "avg": round(sum(runs) / len(runs), 3) if runs else None,
+                "p95": _percentile(runs, 95),
+            },
+            "persistent": self.collection is not None,
+        }
+
+    def _remember(self, job):
+        self._jobs[job["_id"]] = job
+        if len(self._jobs) > MAX_LOCAL_JOBS:
+            # Drop the oldest finished jobs; queued and running ones stay
+            for job_id in [k for k, v in self._jobs.items() if v["status"] in FINISHED][:len(self._jobs) // 10]:
+                del self._jobs[job_id]
+
+    def _enqueue(self, job):
+        rank = PRIORITIES[job["priority"]]
+        heapq.heappush(self._heap, (rank, next(self._sequence), job["_id"]))
+        QUEUE_DEPTH.labels(job["priority"]).inc()
+        self._available.release()
+
+    async def _update(self, job, **changes):
+        query = {"_id": job["_id"]}
+        if job.get("worker_id"):
+            # Only while this process still holds the lease
+            query["worker_id"] = job["worker_id"]
+        job.update(changes)
+        if self.collection is not None:
+            await self.collection.update_one(query, {"$set": changes})
+        self._notify(job["_id"])
+
+    def _notify(self, job_id):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _lease(self):
+        return utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def _claim(self, job, started):
+        """Mark a queued job RUNNING under this process's lease; False if
+        another process claimed it (or it finished) first"""
+        changes = {"status": RUNNING, "started_at": started, "worker_id": self.worker_id}
+        if self.collection is None:
+            job.update(changes, attempts=job["attempts"] + 1)
+        else:
+            claimed = await self.collection.find_one_and_update(
+                {"_id": job["_id"], "status": QUEUED},
+                {"$set": dict(changes, lease_until=self._lease()), "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if claimed is None:
+                return False
+            job.update(claimed)
+        self._notify(job["_id"])
+        return True
+
+    async def _renew(self, job):
+        """Extend the lease while the job runs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": job["_id"], "worker_id": self.worker_id}, {"$set": {"lease_until": self._lease()}}
+                )
+            except Exception as e:
+                logger.warning("⚠️  Could not renew the lease on generation job %s: %s", job["_id"], e)
+
+    async def _worker(self, number):
+        while True:
+            await self._available.acquire()
+            # Take the rate-limit token before choosing a job, so the choice
+            # is made as late as possible and sees the highest priority
+            await self.bucket.acquire()
+            rank, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Claimed by another process after a duplicate was queued here
+                self.bucket.refund()
+                QUEUE_DEPTH.labels(next(name for name, r in PRIORITIES.items() if r == rank)).dec()
+                continue
+            QUEUE_DEPTH.labels(job["priority"]).dec()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("❌ Generation worker %d failed on job %s", number, job_id)
+
+    async def _run(self, job):
+        started = utcnow()
+        if not await self._claim(job, started):
+            # Another process runs (or ran) it; read it from the collection
+            # from now on. No upstream call was made for the token
+            self._jobs.pop(job["_id"], None)
+            self.bucket.refund()
+            return
+        wait = (started - job["created_at"]).total_seconds()
+        self._wait_times.append(wait)
+        JOB_WAIT.labels(job["priority"]).observe(wait)
+        self._running += 1
+        start = time.perf_counter()
+        renewal = asyncio.create_task(self._renew(job)) if self.collection is not None else None
+        try:
+            content, cache_status = await self.run_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if job["attempts"] < self.max_attempts:
+                logger.warning("⚠️  Generation job %s failed (attempt %d), retrying: %s", job["_id"], job["attempts"], e)
+                await self._update(job, status=QUEUED, error=str(e), worker_id=None, lease_until=None)
+                asyncio.get_running_loop().call_later(self.retry_delay, self._enqueue, job)
+                return
+            self.failed += 1
+            JOBS.labels(FAILED).inc()
+            logger.error("❌ Generation job %s failed: %s", job["_id"], e)
+            await self._update(job, status=FAILED, error=str(e), finished_at=utcnow())
+        else:
+            self.completed += 1
+            JOBS.labels(DONE).inc()
+            await self._update(
+                job, status=DONE, content=content, cache=cache_status, error=None, finished_at=utcnow()
+            )
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+            self._running -= 1
+            self._run_times.append(time.perf_counter() - start)
@@ -0,0 +1,82 @@
+"""Cached health state for liveness and readiness probes.
+
+Probes arrive every few seconds from load balancers and orchestrators.
+Running a database query for each one adds load exactly when the
+database is struggling, and a slow query makes the probe itself time
+out. ``HealthMonitor`` runs the checks on its own schedule instead, and
+probes read the last result.
+
+A check is an async callable that returns normally when healthy and
+raises otherwise. Readiness requires every ``required`` check to pass and
+startup to have finished.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    def __init__(self, interval=10.0, timeout=5.0):
+        self.interval = interval
+        self.timeout = timeout
+        self._checks = {}  # name -> (check, required)
+        self.results = {}  # name -> last result
+        self.started = False  # set once startup work has finished
+        self.startup_error = None
+
+    def add_check(self, name, check, required=True):
+        self._checks[name] = (check, required)
+
+    @property
+    def ready(self):
+        if not self.started:
+            return False
+        return all(
+            self.results.get(name, {}).get("healthy", False)
+            for name, (_, required) in self._checks.items() if required
+        )
+
+    def healthy(self, name):
+        return self.results.get(name, {}).get("healthy", False)
+
+    async def _run_check(self, name, check):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), self.timeout)
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e) or type(e).__name__
+        previous = self.results.get(name, {}).get("healthy")
+        self.results[name] = {
+            "healthy": healthy,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "checked_at": datetime.now().isoformat(),
+            "error": error,
+        }
+        if healthy != previous:
+            if healthy:
+                logger.info("✅ Health check %s passing", name)
+            else:
+                logger.warning("❌ Health check %s failing: %s", name, error)
+        return healthy
+
+    async def refresh(self):
+        """Run every check once, concurrently"""
+        await asyncio.gather(*(self._run_check(name, check) for name, (check, _) in self._checks.items()))
+
+    async def run(self):
+        """Refresh forever; meant to run as a background task"""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def snapshot(self):
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "startup_error": self.startup_error,
+            "checks": self.results,
+        }
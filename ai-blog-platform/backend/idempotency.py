@@ -0,0 +1,96 @@
+"""Idempotency keys for write endpoints.
+
+Clients may send an ``Idempotency-Key`` header with a write. The first
+request with a given key reserves it. The response is then stored under
+the key, and retries with the same key and body replay that response
+instead of writing again. This covers retries after an axios timeout,
+when the first attempt actually succeeded.
+
+Records live in a Mongo collection with a TTL index when one is given,
+and in a process-local dict otherwise (demo mode).
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from timestamps import utcnow
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+
+
+class IdempotencyConflict(Exception):
+    """The key is in use by a different request or one still in flight"""
+
+
+def request_fingerprint(body):
+    return hashlib.sha256(body.encode() if isinstance(body, str) else body).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, collection=None, ttl_seconds=IDEMPOTENCY_TTL_SECONDS):
+        self.collection = collection  # AsyncCollection or None
+        self.ttl_seconds = ttl_seconds
+        self._records = {}  # key -> (expires_at, record), demo mode only
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index(
+                "created_at", expireAfterSeconds=self.ttl_seconds, name="created_at_ttl"
+            )
+
+    async def reserve(self, key, fingerprint):
+        """Claim key for a new request.
+
+        Returns the stored response if this exact request already
+        completed, or None if the caller now owns the key and should
+        proceed. Raises IdempotencyConflict if the key belongs to a
+        different request body or to a request that is still running.
+        """
+        record = {"_id": key, "fingerprint": fingerprint, "response": None, "created_at": utcnow()}
+        existing = await self._insert(record)
+        if existing is None:
+            return None
+        if existing["fingerprint"] != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+        if existing.get("response") is None:
+            raise IdempotencyConflict("A request with this Idempotency-Key is still in progress")
+        return existing["response"]
+
+    async def complete(self, key, response):
+        if self.collection is not None:
+            await self.collection.update_one({"_id": key}, {"$set": {"response": response}})
+        elif key in self._records:
+            self._records[key][1]["response"] = response
+
+    async def release(self, key):
+        """Forget a reservation whose request failed, so it can be retried"""
+        if self.collection is not None:
+            await self.collection.delete_one({"_id": key})
+        else:
+            self._records.pop(key, None)
+
+    async def _insert(self, record):
+        """Insert record unless the key exists; return the existing record"""
+        key = record["_id"]
+        if self.collection is not None:
+            try:
+                await self.collection.insert_one(record)
+                return None
+            except DuplicateKeyError:
+                existing = await self.collection.find_one({"_id": key})
+                # Mongo's TTL monitor runs once a minute; treat stale records as gone
+                if existing and existing["created_at"] < utcnow() - timedelta(seconds=self.ttl_seconds):
+                    await self.collection.replace_one({"_id": key}, record)
+                    return None
+                return existing
+
+        now = time.monotonic()
+        if len(self._records) > 10000:
+            self._records = {k: v for k, v in self._records.items() if v[0] > now}
+        entry = self._records.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        self._records[key] = (now + self.ttl_seconds, record)
+        return None
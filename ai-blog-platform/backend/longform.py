@@ -0,0 +1,229 @@
+"""Long-form posts: an outline first, then its sections in parallel.
+
+One call for a whole post is slow, because output tokens come out one
+after another, and models tend to stop well short of a long target.
+Instead:
+
+1. one call writes an outline, a title and ``sections`` headings;
+2. each section is written by its own call, with at most ``concurrency``
+   running at once. Every section prompt carries the whole outline, so
+   sections don't repeat each other;
+3. the sections are stitched in outline order under consistent headings:
+   ``# title``, then ``## heading`` per section. Any heading the model put
+   inside a section is demoted to ``###``.
+
+With enough concurrency, a post of any length takes about as long as the
+outline plus one section. ``LongFormGenerator.stream`` yields events as
+they happen, so clients can show each section as soon as it completes.
+
+The model call is passed in (``generate``: an async function from prompt
+to text), so tests and benchmarks can run it against a fake model.
+"""
+import asyncio
+import logging
+import re
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MIN_SECTIONS = 3
+MAX_SECTIONS = 12
+DEFAULT_SECTIONS = 6
+DEFAULT_SECTION_WORDS = 350
+MAX_SECTION_WORDS = 1000
+
+CALLS = metrics.REGISTRY.counter(
+    "longform_generation_calls", "Model calls made by long-form generation", ("stage", "outcome")
+)
+
+_LIST_ITEM = re.compile(r"^(?:#{1,6}\s+|[-*+]\s+|\d+[.)]\s+|(?:section\s+\d+\s*[:.-]\s*))", re.IGNORECASE)
+_TITLE = re.compile(r"^[*_\s]*title[*_\s]*:[*_\s]*(.*)$", re.IGNORECASE)
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+class OutlineError(Exception):
+    pass
+
+
+def _clean_heading(text):
+    text = text.strip().strip("*_`\"'").strip()
+    return text.rstrip(":").strip()
+
+
+def _markdown_lines(text):
+    """``(line, in_code_block)`` for each line of markdown text"""
+    in_code = False
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            in_code = not in_code
+            yield line, True
+        else:
+            yield line, in_code
+
+
+def build_outline_prompt(topic, sections):
+    return f"""Plan a long-form blog post about: {topic}
+
+Return only the outline, in exactly this format:
+TITLE: <the post title>
+1. <heading of section 1>
+2. <heading of section 2>
+...
+
+Use exactly {sections} sections. The first introduces the topic and the last
+concludes the post. Headings are short (under 10 words) and do not overlap."""
+
+
+def parse_outline(text, max_sections=MAX_SECTIONS):
+    """``(title, headings)`` from an outline; the title may be None"""
+    title = None
+    headings = []
+    seen = set()
+    for line in text.splitlines():
+        # Indented lines are sub-points of a section, not sections
+        if not line.strip() or line[:2].isspace():
+            continue
+        stripped = line.strip()
+        match = _TITLE.match(stripped)
+        if match:
+            title = title or _clean_heading(match.group(1)) or None
+            continue
+        if title is None and stripped.startswith("# "):
+            title = _clean_heading(stripped[2:])
+            continue
+        match = _LIST_ITEM.match(stripped)
+        if not match:
+            continue
+        heading = _clean_heading(stripped[match.end():])
+        if heading and heading.lower() not in seen:
+            seen.add(heading.lower())
+            headings.append(heading)
+    if len(headings) < 2:
+        raise OutlineError(f"Outline has {len(headings)} usable sections")
+    return title, headings[:max_sections]
+
+
+def build_section_prompt(topic, title, headings, index, words):
+    outline = "\n".join(f"{number}. {heading}" for number, heading in enumerate(headings, 1))
+    if index == 0:
+        role = "This is the opening section: hook the reader and introduce what the post covers."
+    elif index == len(headings) - 1:
+        role = "This is the final section: bring the post to a conclusion."
+    else:
+        role = "Do not write an introduction or a conclusion for the whole post."
+    return f"""You are writing one section of a blog post about: {topic}
+
+Post title: {title}
+Outline:
+{outline}
+
+Write only section {index + 1}: "{headings[index]}".
+- About {words} words of markdown, with practical examples where they help.
+- Do not repeat the section heading. Use ### for any sub-headings.
+- Stay on this section; the others cover the rest of the outline.
+{role}"""
+
+
+def normalize_section(text, heading):
+    """Drop an echoed heading at the top and demote headings inside the
+    section below the section level"""
+    lines = []
+    for line, in_code in _markdown_lines(text.strip()):
+        match = None if in_code else _HEADING.match(line)
+        if match and not lines:
+            # The model repeated the section heading (or invented its own)
+            continue
+        if match and len(match.group(1)) <= 2:
+            line = f"### {match.group(2)}"
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def stitch(title, sections):
+    """The whole post from its title and ``(heading, text)`` sections"""
+    body = "\n\n".join(f"## {heading}\n\n{text}" for heading, text in sections)
+    return f"# {title}\n\n{body}\n"
+
+
+def split_post(content):
+    """Inverse of ``stitch``: ``(title, [(heading, text)])``"""
+    title = None
+    sections = []
+    for line, in_code in _markdown_lines(content):
+        match = None if in_code else _HEADING.match(line)
+        if match and len(match.group(1)) == 1 and title is None and not sections:
+            title = match.group(2).strip()
+        elif match and len(match.group(1)) == 2:
+            sections.append((match.group(2).strip(), []))
+        elif sections:
+            sections[-1][1].append(line)
+    return title, [(heading, "\n".join(lines).strip()) for heading, lines in sections]
+
+
+def word_count(text):
+    return len(text.split())
+
+
+class LongFormGenerator:
+    def __init__(self, generate, concurrency=4, retries=1):
+        self.generate = generate  # async (prompt) -> text
+        self.concurrency = concurrency
+        self.retries = retries
+
+    async def _call(self, stage, prompt):
+        for attempt in range(self.retries + 1):
+            try:
+                text = await self.generate(prompt)
+                if not text or not text.strip():
+                    raise Exception("Empty response from AI")
+                CALLS.labels(stage, "ok").inc()
+                return text
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                CALLS.labels(stage, "error").inc()
+                if attempt == self.retries:
+                    raise
+                logger.warning("⚠️  Long-form %s call failed, retrying: %s", stage, e)
+
+    async def outline(self, topic, sections=DEFAULT_SECTIONS):
+        # A malformed outline is retried like a failed call
+        for attempt in range(self.retries + 1):
+            text = await self._call("outline", build_outline_prompt(topic, sections))
+            try:
+                title, headings = parse_outline(text, max_sections=sections)
+                return title or topic.strip().capitalize(), headings
+            except OutlineError:
+                if attempt == self.retries:
+                    raise
+
+    async def stream(self, topic, sections=DEFAULT_SECTIONS, section_words=DEFAULT_SECTION_WORDS):
+        """Yield ``(event, data)``: one ``outline``, a ``section`` per
+        section in completion order, then ``done`` with the stitched post"""
+        title, headings = await self.outline(topic, sections)
+        yield "outline", {"title": title, "sections": headings}
+
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def write(index):
+            async with limit:
+                prompt = build_section_prompt(topic, title, headings, index, section_words)
+                text = await self._call("section", prompt)
+            return index, normalize_section(text, headings[index])
+
+        tasks = [asyncio.create_task(write(index)) for index in range(len(headings))]
+        texts = [None] * len(headings)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, text = await next_done
+                texts[index] = text
+                yield "section", {"index": index, "heading": headings[index], "text": text}
+        finally:
+            # A failed section (or a client that went away) stops the rest
+            for task in tasks:
+                task.cancel()
+
+        content = stitch(title, list(zip(headings, texts)))
+        yield "done", {"title": title, "content": content, "sections": len(headings), "words": word_count(content)}
@@ -1,22 +1,69 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Optional, List, Literal, Union
 from datetime import datetime
 import uvicorn
 from bson import ObjectId
 import json
-import traceback
+import asyncio
+import base64
+from contextlib import asynccontextmanager
+import logging
+import time
+import data_access
+from aggregates import PostAggregates
+from feeds import FeedIndex, SITEMAP_MEDIA_TYPE, FEED_MEDIA_TYPE
+from drafts import DraftStore, DraftNotFound, RevisionConflict, InvalidPatch, draft_view
+import metrics
+from generation_cache import GenerationCache, cache_key
+import longform
+from generation_jobs import GenerationScheduler, QueueFull, FINISHED, DONE, job_view
+import render
+import seo
+import similarity
+import serialization
+import search
+from storage import PostStorage, MongoPostStorage, MemoryPostStorage, DuplicateSlugError
+from post_cache import PostCache, collection_validators
+from shared_cache import SharedCache
+from timestamps import isoformat, naive_utc, utcnow
+from compression import CompressionMiddleware
+from idempotency import IdempotencyStore, IdempotencyConflict, request_fingerprint
+from logging_config import configure_logging
+from gemini_client import LazyGeminiModel
+from health import HealthMonitor
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AI Blog Platform", version="1.0.0")
+configure_logging()
+logger = logging.getLogger("blog")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start serving immediately; connect and warm up in the background.
+
+    Nothing here waits on the network, so a slow or unreachable Atlas no
+    longer delays startup or ``--reload`` restarts. Readiness
+    (``/api/health/ready``) turns green once the background work is done.
+    """
+    startup = asyncio.create_task(background_startup())
+    yield
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    await generation_scheduler.stop()
+    # Don't lose autosaves made since the last snapshot
+    await draft_store.flush()
+    if client is not None:
+        client.close()
+
+app = FastAPI(title="AI Blog Platform", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -27,57 +74,283 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-print("🔧 Starting AI Blog Platform Backend...")
+# Gzip for JSON/NDJSON/text above a size threshold (never SSE)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=COMPRESSION_LEVEL)
+
+# Per-route latency, status and in-flight metrics, served at /metrics.
+# Added last so it is outermost and times compression too
+app.add_middleware(metrics.MetricsMiddleware)
+
+logger.info("🔧 Starting AI Blog Platform Backend...")
 
 # MongoDB Atlas setup with better error handling
 MONGODB_URI = os.getenv("MONGODB_URI")
-print(f"📦 MongoDB URI: {MONGODB_URI}" if MONGODB_URI else "❌ MongoDB URI not set")
+if MONGODB_URI:
+    # Never log the credentials part of the URI
+    logger.info("📦 MongoDB host: %s", MONGODB_URI.rsplit("@", 1)[-1])
+else:
+    logger.warning("❌ MongoDB URI not set")
+
+# "memory" forces the in-memory engine even when a URI is set (benchmarks, CI)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "auto").lower()
 
 client = None
 db = None
-posts_collection = None
-mongodb_connected = False
+mongodb_configured = False
 
-if MONGODB_URI and "your_mongodb_uri" not in MONGODB_URI:
-    try:
-        print("🔄 Connecting to MongoDB Atlas...")
-        client = MongoClient(
-            MONGODB_URI,
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=15000,
-            socketTimeoutMS=15000,
-            retryWrites=True
-        )
-        # Test connection
-        client.admin.command('ping')
-        db = client["blog-platform"]
-        posts_collection = db["posts"]
-        mongodb_connected = True
-        print("✅ MongoDB Atlas connected successfully!")
-        
-    except Exception as e:
-        print(f"❌ MongoDB Atlas connection failed: {str(e)}")
-        print("⚠️  Running in demo mode")
+if STORAGE_BACKEND == "memory":
+    logger.warning("⚠️  STORAGE_BACKEND=memory. Using in-memory storage")
+elif MONGODB_URI and "your_mongodb_uri" not in MONGODB_URI:
+    # connect=False: no network I/O here. The first operation (the startup
+    # ping in background_startup) opens the connection
+    client = MongoClient(
+        MONGODB_URI,
+        connect=False,
+        serverSelectionTimeoutMS=10000,
+        connectTimeoutMS=15000,
+        socketTimeoutMS=15000,
+        retryWrites=True
+    )
+    db = client["blog-platform"]
+    mongodb_configured = True
 else:
-    print("⚠️  MongoDB URI not configured. Running in demo mode")
+    logger.warning("⚠️  MongoDB URI not configured. Running in demo mode")
+
+# Routes reach posts only through this engine (see get_storage)
+storage = MongoPostStorage(db) if mongodb_configured else MemoryPostStorage()
+logger.info("🗄️  Storage engine: %s", storage.name)
 
 # Gemini API setup
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-print(f"🔑 Gemini Key: {GEMINI_API_KEY[:10]}..." if GEMINI_API_KEY and "your_actual" not in GEMINI_API_KEY else "❌ Gemini API Key not set")
+if GEMINI_API_KEY and "your_actual" not in GEMINI_API_KEY:
+    logger.info("🔑 Gemini Key: %s...", GEMINI_API_KEY[:4])
+else:
+    logger.warning("❌ Gemini API Key not set")
 
-gemini_model = None
-gemini_configured = False
+GEMINI_MODEL_NAME = "models/gemini-pro-latest"
+# Extra generation parameters sent to Gemini (e.g. temperature); they are
+# part of the generation cache key so changing them never serves stale output
+GENERATION_CONFIG = {}
 
-if GEMINI_API_KEY and "your_actual" not in GEMINI_API_KEY:
+gemini_configured = bool(GEMINI_API_KEY and "your_actual" not in GEMINI_API_KEY)
+# The SDK is imported on first use (or by the background warm-up), not here
+gemini_model = LazyGeminiModel(GEMINI_API_KEY, GEMINI_MODEL_NAME) if gemini_configured else None
+if not gemini_configured:
+    logger.warning("⚠️  Gemini API key not configured")
+
+# Worker processes serving this app (set by serve.py). With more than one,
+# caches go through the cache server serve.py started next to the workers
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+shared_cache = SharedCache.from_env()
+if shared_cache is not None:
+    logger.info("🔗 Shared cache: %s", shared_cache.address)
+
+# Generation result cache (in-process LRU + optional shared and Mongo tiers)
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "256"))
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "3600"))
+GENERATION_CACHE_PERSIST = os.getenv("GENERATION_CACHE_PERSIST", "true").lower() == "true"
+
+generation_cache = GenerationCache(
+    max_entries=GENERATION_CACHE_SIZE,
+    ttl_seconds=GENERATION_CACHE_TTL,
+    collection=storage.collection("generation_cache") if GENERATION_CACHE_PERSIST else None,
+    shared=shared_cache
+)
+
+# Generation job queue: bounded workers plus a token-bucket rate limit in
+# front of the Gemini quota
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", str(data_access.GEMINI_MAX_CONCURRENCY)))
+GENERATION_RATE_PER_MINUTE = float(os.getenv("GENERATION_RATE_PER_MINUTE", "60"))
+GENERATION_BURST = int(os.getenv("GENERATION_BURST", "10"))
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "1000"))
+JOB_EVENTS_KEEPALIVE = 15
+
+# Batch generation fans out concurrently; GEMINI_MAX_CONCURRENCY still caps
+# how many upstream calls run at once across the whole process
+MAX_BATCH_PROMPTS = 50
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+MAX_BATCH_CONCURRENCY = 32
+
+# Long-form posts: outline, then sections written concurrently. Their
+# upstream calls have their own limit (GEMINI_LONGFORM_MAX_CONCURRENCY),
+# which by default lets every section of a default-sized post run at once
+LONGFORM_CONCURRENCY = int(os.getenv("LONGFORM_CONCURRENCY", str(data_access.GEMINI_LONGFORM_MAX_CONCURRENCY)))
+
+# Listing / pagination settings
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+LIST_BATCH_SIZE = 50
+
+MAX_SEO_BATCH_SIZE = 500
+
+# Search results are ranked, so they page by offset; cap how deep it goes
+MAX_SEARCH_OFFSET = 1000
+
+# Bulk import / export
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS_REPORTED = 1000
+
+# Single-post reads are served through a read-through cache (in-process, or
+# the shared one when there are several workers)
+POST_CACHE_SIZE = int(os.getenv("POST_CACHE_SIZE", "1024"))
+post_cache = PostCache(max_entries=POST_CACHE_SIZE, shared=shared_cache)
+
+# Tag / author / month counters, updated on every post write
+post_aggregates = PostAggregates(collection=storage.collection("post_aggregates"))
+MAX_FACETS = 500
+
+# MinHash index behind related posts and near-duplicate warnings. Local
+# writes are added directly; other processes' writes arrive by refresh
+similarity_index = similarity.SimilarityIndex()
+SIMILARITY_REFRESH_SECONDS = float(os.getenv("SIMILARITY_REFRESH_SECONDS", "60"))
+MAX_RELATED = 20
+
+# Sitemap and RSS feed, rendered from an in-memory index and cached until a
+# post in them changes. Post links point at the public site (SITE_URL), at
+# the frontend's post page (frontend/src/app/posts/[slug]); POST_URL_PATH
+# must name a route the site serves, or every published link is a 404.
+# The XML documents are served by this backend, so links to them (sitemap
+# shards, the feed's self link) use FEEDS_URL: the public URL of this
+# backend, or SITE_URL if the site proxies /sitemap*.xml and /feed.xml here
+SITE_URL = os.getenv("SITE_URL", "http://localhost:3000")
+FEEDS_URL = os.getenv("FEEDS_URL", "http://localhost:8000")
+SITE_TITLE = os.getenv("SITE_TITLE", "AI Blog Platform")
+SITE_DESCRIPTION = os.getenv("SITE_DESCRIPTION", "")
+POST_URL_PATH = os.getenv("POST_URL_PATH", "/posts/{slug}")
+FEED_REFRESH_SECONDS = float(os.getenv("FEED_REFRESH_SECONDS", "60"))
+feed_index = FeedIndex(
+    SITE_URL, post_path=POST_URL_PATH, title=SITE_TITLE, description=SITE_DESCRIPTION, documents_url=FEEDS_URL
+)
+
+# Draft autosave: patches hit the live copy, snapshots are written at most
+# once per DRAFT_SNAPSHOT_SECONDS per draft. Several workers can't share a
+# live copy, so there every patch is written through (unless the proxy
+# routes each draft to one worker: DRAFTS_WRITE_THROUGH=false)
+DRAFT_SNAPSHOT_SECONDS = float(os.getenv("DRAFT_SNAPSHOT_SECONDS", "10"))
+DRAFTS_WRITE_THROUGH = os.getenv("DRAFTS_WRITE_THROUGH", str(WEB_CONCURRENCY > 1)).lower() == "true"
+MAX_DRAFT_OPS = 100
+draft_store = DraftStore(
+    collection=storage.collection("drafts"),
+    snapshot_interval=DRAFT_SNAPSHOT_SECONDS,
+    write_through=DRAFTS_WRITE_THROUGH
+)
+
+# Idempotency-Key records for POST /api/posts
+idempotency_store = IdempotencyStore(collection=storage.collection("idempotency_keys"))
+
+def get_storage() -> PostStorage:
+    """Dependency giving routes the active storage engine"""
+    return storage
+
+# Health checks run on their own schedule; probes read the cached result
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+STARTUP_RETRY_MAX_SECONDS = 30
+
+health_monitor = HealthMonitor(interval=HEALTH_REFRESH_SECONDS, timeout=HEALTH_CHECK_TIMEOUT)
+health_monitor.add_check("database", storage.ping)
+
+async def check_ai_service():
+    if not gemini_model.loaded:
+        raise RuntimeError("Gemini SDK not loaded yet")
+
+if gemini_configured:
+    # Generation is optional: its state is reported but doesn't gate readiness
+    health_monitor.add_check("ai_service", check_ai_service, required=False)
+
+async def warm_gemini():
+    """Import the Gemini SDK off the event loop before the first request needs it"""
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel('models/gemini-pro-latest')
-        gemini_configured = True
-        print("✅ Gemini API configured successfully with gemini-pro-latest!")
+        await run_in_threadpool(gemini_model.load)
     except Exception as e:
-        print(f"❌ Gemini API configuration failed: {str(e)}")
-else:
-    print("⚠️  Gemini API key not configured")
+        logger.error("❌ Gemini API configuration failed: %s", e)
+
+async def background_startup():
+    """Connect to storage, build indexes and start workers, then keep the
+    cached health state fresh. Runs as a task so startup never blocks."""
+    warmup = asyncio.create_task(warm_gemini()) if gemini_configured else None
+    
+    # Retry with backoff until the database answers
+    delay = 1
+    logger.info("🔄 Connecting to %s storage...", storage.name)
+    while True:
+        await health_monitor.refresh()
+        if health_monitor.healthy("database"):
+            break
+        logger.warning("⚠️  Storage not reachable, retrying in %ds", delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+    logger.info("✅ %s storage connected", storage.name)
+    
+    try:
+        await create_indexes()
+        if await post_aggregates.needs_rebuild():
+            await post_aggregates.rebuild(storage)
+        indexed = await similarity_index.refresh(storage)
+        logger.info("✅ Similarity index built from %d posts", indexed)
+        await feed_index.refresh(storage)
+        logger.info("✅ Sitemap and feed index built (%d posts)", len(feed_index))
+        if gemini_configured:
+            await generation_scheduler.start()
+    except Exception as e:
+        health_monitor.startup_error = str(e)
+        logger.exception("❌ Startup failed: %s", e)
+    else:
+        health_monitor.started = True
+    
+    await asyncio.gather(health_monitor.run(), refresh_similarity_index(), refresh_feed_index(), draft_store.run())
+
+async def refresh_similarity_index():
+    """Pick up posts written by other processes sharing the database"""
+    if storage.name == "memory":
+        return
+    while True:
+        await asyncio.sleep(SIMILARITY_REFRESH_SECONDS)
+        try:
+            await similarity_index.refresh(storage)
+        except Exception as e:
+            logger.warning("⚠️  Similarity index refresh failed: %s", e)
+
+async def refresh_feed_index():
+    """Pick up posts written by other processes sharing the database"""
+    if storage.name == "memory":
+        return
+    while True:
+        await asyncio.sleep(FEED_REFRESH_SECONDS)
+        try:
+            await feed_index.refresh(storage)
+        except Exception as e:
+            logger.warning("⚠️  Feed index refresh failed: %s", e)
+
+async def find_near_duplicates(content, title=None):
+    """Stored posts that the content nearly duplicates"""
+    sig = await run_in_threadpool(similarity.signature, title, content)
+    return similarity_index.near_duplicates(sig)
+
+async def create_indexes():
+    """Create the indexes the queries rely on.
+
+    Each index is attempted on its own so one failure (e.g. duplicate slugs
+    in old data blocking the unique index) doesn't skip the rest.
+    """
+    failed = await storage.ensure_indexes()
+    for name, build in [
+        ("generation_cache", generation_cache.ensure_indexes),
+        ("idempotency_keys", idempotency_store.ensure_indexes),
+        ("generation_jobs", generation_scheduler.ensure_indexes),
+        ("post_aggregates", post_aggregates.ensure_indexes),
+        ("drafts", draft_store.ensure_indexes),
+    ]:
+        try:
+            await build()
+        except Exception as e:
+            failed.append(name)
+            logger.error("❌ Failed to create MongoDB index %s: %s", name, e)
+    if not failed:
+        logger.info("✅ Indexes ensured (%s storage)", storage.name)
 
 # Pydantic models
 class BlogPostCreate(BaseModel):
@@ -89,8 +362,62 @@ class BlogPostCreate(BaseModel):
     slug: str
     tags: List[str] = []
 
+class BlogPostImport(BlogPostCreate):
+    # Exported posts keep their original timestamps when re-imported
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    # Stored timestamps are naive UTC; an offset ("...Z") is converted, so
+    # imported posts order and compare with the rest
+    _stored_timestamps = field_validator("created_at", "updated_at")(naive_utc)
+
+class SEODraft(BaseModel):
+    title: str = ""
+    content: str = ""
+    seo_title: Optional[str] = None
+    seo_description: Optional[str] = None
+
+class SEOAnalysisRequest(BaseModel):
+    drafts: List[SEODraft] = Field(..., max_length=MAX_SEO_BATCH_SIZE)
+
 class ContentGenerationRequest(BaseModel):
     prompt: str
+    bypass_cache: bool = False
+
+class GenerationJobRequest(ContentGenerationRequest):
+    priority: Literal["high", "normal", "low"] = "normal"
+
+class DraftCreate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    author: Optional[str] = None
+    slug: Optional[str] = None
+    tags: List[str] = []
+    seo_title: Optional[str] = None
+    seo_description: Optional[str] = None
+
+class DraftOperation(BaseModel):
+    op: Literal["splice", "set"]
+    field: str
+    # splice: replace `delete` UTF-16 code units at `start` with `insert`
+    start: int = Field(0, ge=0)
+    delete: int = Field(0, ge=0)
+    insert: str = ""
+    # set: the field's new value
+    value: Optional[Union[str, List[str]]] = None
+
+class DraftPatch(BaseModel):
+    base_revision: int
+    ops: List[DraftOperation] = Field(..., max_length=MAX_DRAFT_OPS)
+
+class BatchGenerationRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_PROMPTS)
+    bypass_cache: bool = False
+    concurrency: Optional[int] = Field(None, ge=1, le=MAX_BATCH_CONCURRENCY)
+
+class LongFormGenerationRequest(ContentGenerationRequest):
+    sections: int = Field(longform.DEFAULT_SECTIONS, ge=longform.MIN_SECTIONS, le=longform.MAX_SECTIONS)
+    section_words: int = Field(longform.DEFAULT_SECTION_WORDS, ge=100, le=longform.MAX_SECTION_WORDS)
 
 # Helper function to convert MongoDB documents to JSON
 def serialize_doc(doc):
@@ -99,76 +426,132 @@ def serialize_doc(doc):
     
     try:
         doc_dict = dict(doc)
+        for field in serialization.INTERNAL_FIELDS:
+            doc_dict.pop(field, None)
         # Convert ObjectId to string
         if "_id" in doc_dict:
             doc_dict["id"] = str(doc_dict["_id"])
             del doc_dict["_id"]
         
-        # Convert datetime objects to ISO format strings
+        # Convert datetime objects to ISO format strings, marked as UTC
         for key, value in doc_dict.items():
             if isinstance(value, datetime):
-                doc_dict[key] = value.isoformat()
+                doc_dict[key] = isoformat(value)
         
         return doc_dict
     except Exception as e:
-        print(f"❌ Error serializing document: {e}")
+        logger.error("❌ Error serializing document: %s", e)
         return {"error": "Failed to serialize document"}
 
+# Keyset pagination cursors: an opaque token encoding the (created_at, id)
+# of the last post on the previous page
+def encode_cursor(created_at, post_id):
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps({"c": created_at, "i": str(post_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return naive_utc(datetime.fromisoformat(payload["c"])), payload["i"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def database_status():
+    if storage.name == "memory":
+        return "demo_mode"
+    return "connected" if health_monitor.healthy("database") else "disconnected"
+
 @app.get("/")
 async def root():
     return {
         "message": "AI Blog Platform API is running!",
         "status": "healthy",
-        "database": "connected" if mongodb_connected else "demo_mode",
+        "database": database_status(),
         "ai_service": "configured" if gemini_configured else "not_configured"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+async def serve_feed_document(name, media_type, request):
+    """Cached sitemap/feed XML with conditional GET"""
+    try:
+        if not feed_index.loaded:
+            # Serving an empty sitemap would tell crawlers every post is gone
+            raise HTTPException(status_code=503, detail="Feed index is loading", headers={"Retry-After": "10"})
+        document = await feed_index.document(name)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Sitemap not found")
+        body, validators = document
+        headers = validators.headers()
+        if validators.not_modified(
+            request.headers.get("if-none-match"),
+            request.headers.get("if-modified-since")
+        ):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Error building %s: %s", name, e)
+        raise HTTPException(status_code=500, detail=f"Failed to build {name}: {str(e)}")
+
+@app.get("/sitemap.xml", include_in_schema=False)
+async def sitemap(request: Request):
+    """Sitemap of every post; a sitemap index once there are over 50,000"""
+    return await serve_feed_document("sitemap", SITEMAP_MEDIA_TYPE, request)
+
+@app.get("/sitemap-{shard:int}.xml", include_in_schema=False)
+async def sitemap_shard(shard: int, request: Request):
+    return await serve_feed_document(f"sitemap-{shard}", SITEMAP_MEDIA_TYPE, request)
+
+@app.get("/feed.xml", include_in_schema=False)
+async def rss_feed(request: Request):
+    """RSS 2.0 feed of the newest posts"""
+    return await serve_feed_document("feed", FEED_MEDIA_TYPE, request)
+
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health summary from the cached checks (no database query per call)"""
     try:
-        db_status = "connected" if mongodb_connected else "demo_mode"
-        ai_status = "configured" if gemini_configured else "not_configured"
-        
-        # Test database connection if connected
-        db_healthy = False
-        if mongodb_connected:
-            try:
-                # Simple query to test database
-                posts_collection.find_one()
-                db_healthy = True
-            except Exception as e:
-                print(f"❌ Database health check failed: {e}")
-                db_healthy = False
-        
         return {
             "status": "healthy",
-            "database": db_status,
-            "database_healthy": db_healthy,
-            "ai_service": ai_status,
+            "ready": health_monitor.ready,
+            "database": database_status(),
+            "database_healthy": health_monitor.healthy("database"),
+            "storage": storage.name,
+            "ai_service": "configured" if gemini_configured else "not_configured",
             "backend": "running",
+            "checks": health_monitor.results,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
-        print(f"❌ Health check error: {e}")
+        logger.error("❌ Health check error: %s", e)
         return {
             "status": "error",
             "error": str(e),
             "backend": "running_with_errors"
         }
 
-@app.post("/api/generate-content")
-async def generate_content(request: ContentGenerationRequest):
-    if not gemini_configured:
-        raise HTTPException(
-            status_code=503, 
-            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
-        )
-    
-    try:
-        print(f"🤖 Generating content for: {request.prompt}")
-        
-        prompt = f"""Write a comprehensive blog post about: {request.prompt}
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness: the process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Readiness: startup finished and required checks passed on their last run"""
+    snapshot = health_monitor.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+def build_generation_prompt(topic):
+    return f"""Write a comprehensive blog post about: {topic}
 
 Please structure it as a proper blog post with:
 - An engaging introduction
@@ -179,128 +562,858 @@ Please structure it as a proper blog post with:
 
 Make it engaging, well-structured, and valuable for readers."""
 
-        response = gemini_model.generate_content(prompt)
-        
-        if response.text:
-            print("✅ Content generated successfully!")
-            return {"content": response.text}
-        else:
+def sse_event(event, data):
+    """Format a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def chunk_text(chunk):
+    # Chunks blocked by safety filters raise on .text instead of being empty
+    try:
+        return chunk.text
+    except Exception:
+        return ""
+
+def generation_cache_key(topic):
+    return cache_key(topic, {"model": GEMINI_MODEL_NAME, **GENERATION_CONFIG})
+
+def generation_kwargs():
+    return {"generation_config": GENERATION_CONFIG} if GENERATION_CONFIG else {}
+
+async def generate_cached(topic, bypass_cache=False, rate_limited=False):
+    """Generate a post about topic through the generation cache.
+
+    With ``rate_limited``, an upstream call (not a cache hit) first takes a
+    token from the job scheduler's bucket, so direct fan-out shares the
+    same quota guard as queued jobs. Returns ``(content, cache status)``.
+    """
+    prompt = build_generation_prompt(topic)
+
+    async def produce():
+        if rate_limited:
+            await generation_scheduler.bucket.acquire()
+        ai_response = await data_access.generate_content(gemini_model, prompt, **generation_kwargs())
+        if not ai_response.text:
             raise Exception("Empty response from AI")
+        return ai_response.text
+
+    return await generation_cache.get_or_generate(generation_cache_key(topic), produce, bypass=bypass_cache)
+
+generation_scheduler = GenerationScheduler(
+    run_job=lambda job: generate_cached(job["prompt"], job["bypass_cache"]),
+    collection=storage.collection("generation_jobs"),
+    workers=GENERATION_WORKERS,
+    rate_per_minute=GENERATION_RATE_PER_MINUTE,
+    burst=GENERATION_BURST,
+    max_queue=GENERATION_MAX_QUEUE
+)
+
+@app.post("/api/generate-content")
+async def generate_content(request: ContentGenerationRequest, response: Response):
+    if not gemini_configured:
+        raise HTTPException(
+            status_code=503, 
+            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
+        )
+    
+    try:
+        logger.debug("🤖 Generating content for: %s", request.prompt)
+        content, cache_status = await generate_cached(request.prompt, request.bypass_cache)
+        response.headers["X-Cache"] = cache_status.upper()
+        logger.info("✅ Content generated (cache: %s)", cache_status, extra={"cache": cache_status})
+        return {"content": content, "near_duplicates": await find_near_duplicates(content)}
             
     except Exception as e:
-        print(f"❌ AI Generation error: {e}")
+        logger.error("❌ AI Generation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/posts")
-async def create_post(post: BlogPostCreate):
+@app.post("/api/generate-content/stream")
+async def generate_content_stream(request: ContentGenerationRequest):
+    """Stream generated content as Server-Sent Events.
+
+    Emits ``chunk`` events with ``{"text": ...}`` as Gemini produces output,
+    then a single ``done`` event, or an ``error`` event if generation fails.
+    A cached result is sent as a single chunk.
+    """
+    if not gemini_configured:
+        raise HTTPException(
+            status_code=503, 
+            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
+        )
+    
+    logger.debug("🤖 Streaming content for: %s", request.prompt)
+    prompt = build_generation_prompt(request.prompt)
+    key = generation_cache_key(request.prompt)
+
+    async def event_stream():
+        try:
+            if not request.bypass_cache:
+                cached = await generation_cache.lookup(key)
+                if cached is not None:
+                    logger.info("✅ Streamed content from cache", extra={"cache": "hit"})
+                    yield sse_event("chunk", {"text": cached})
+                    yield sse_event("done", {
+                        "chunks": 1, "cached": True, "near_duplicates": await find_near_duplicates(cached)
+                    })
+                    return
+            
+            parts = []
+            async for chunk in data_access.stream_content(gemini_model, prompt, **generation_kwargs()):
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield sse_event("chunk", {"text": text})
+            
+            if not parts:
+                raise Exception("Empty response from AI")
+            
+            await generation_cache.store(key, "".join(parts))
+            logger.info("✅ Streamed content in %d chunks", len(parts), extra={"cache": "miss", "chunks": len(parts)})
+            yield sse_event("done", {
+                "chunks": len(parts), "cached": False, "near_duplicates": await find_near_duplicates("".join(parts))
+            })
+        except Exception as e:
+            logger.error("❌ AI Streaming error: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def generate_text(prompt):
+    """One rate-limited model call, for the long-form generator"""
+    await generation_scheduler.bucket.acquire()
+    response = await data_access.generate_content(
+        gemini_model, prompt, backend="gemini_longform", **generation_kwargs()
+    )
+    return chunk_text(response)
+
+longform_generator = longform.LongFormGenerator(generate_text, concurrency=LONGFORM_CONCURRENCY)
+
+@app.post("/api/generate-content/longform")
+async def generate_longform_stream(request: LongFormGenerationRequest):
+    """Generate a long post as an outline plus concurrently written
+    sections, streamed as Server-Sent Events.
+
+    Emits one ``outline`` event (``{"title", "sections"}``), a ``section``
+    event (``{"index", "heading", "text"}``) as each section completes, in
+    completion order, then ``done`` with the stitched ``content``, or
+    ``error``. A cached post is replayed as the same events.
+    """
+    if not gemini_configured:
+        raise HTTPException(
+            status_code=503, 
+            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
+        )
+    
+    logger.debug("🤖 Long-form generation for: %s", request.prompt)
+    key = cache_key(request.prompt, {
+        "model": GEMINI_MODEL_NAME, **GENERATION_CONFIG, "mode": "longform",
+        "sections": request.sections, "section_words": request.section_words
+    })
+
+    async def event_stream():
+        try:
+            cached = None if request.bypass_cache else await generation_cache.lookup(key)
+            if cached is not None:
+                title, sections = longform.split_post(cached)
+                yield sse_event("outline", {"title": title, "sections": [heading for heading, _ in sections]})
+                for index, (heading, text) in enumerate(sections):
+                    yield sse_event("section", {"index": index, "heading": heading, "text": text})
+                done = {"title": title, "content": cached, "sections": len(sections),
+                        "words": longform.word_count(cached), "cached": True}
+            else:
+                started = time.perf_counter()
+                async for event, data in longform_generator.stream(
+                    request.prompt, request.sections, request.section_words
+                ):
+                    if event == "done":
+                        done = dict(data, cached=False)
+                    else:
+                        yield sse_event(event, data)
+                await generation_cache.store(key, done["content"])
+                logger.info("✅ Long-form post generated: %d sections, %d words in %.1fs",
+                            done["sections"], done["words"], time.perf_counter() - started,
+                            extra={"cache": "miss", "sections": done["sections"]})
+            done["near_duplicates"] = await find_near_duplicates(done["content"], done["title"])
+            yield sse_event("done", done)
+        except Exception as e:
+            logger.error("❌ Long-form generation error: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/generate-content/cache/stats")
+async def generation_cache_stats():
+    """Hit/miss counters for the generation cache"""
+    return generation_cache.stats()
+
+@app.post("/api/generate-content/batch")
+async def generate_content_batch(request: BatchGenerationRequest):
+    """Generate many drafts at once, streaming NDJSON results as they finish.
+
+    Prompts run concurrently (up to ``concurrency``), so the batch takes
+    about as long as its slowest item. Each line is one item, in completion
+    order: ``{"index", "prompt", "status": "ok", "content", "cache"}`` or
+    ``{"index", "prompt", "status": "error", "error"}``. A final
+    ``{"done": true, ...}`` line summarises the batch.
+    """
+    if not gemini_configured:
+        raise HTTPException(
+            status_code=503, 
+            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
+        )
+    
+    logger.debug("🤖 Generating batch of %d prompts", len(request.prompts))
+    limit = asyncio.Semaphore(request.concurrency or BATCH_GENERATION_CONCURRENCY)
+    stopping = False
+
+    async def generate_item(index, topic):
+        async with limit:
+            try:
+                content, cache_status = await generate_cached(topic, request.bypass_cache, rate_limited=True)
+                return {
+                    "index": index, "prompt": topic, "status": "ok", "content": content, "cache": cache_status,
+                    "near_duplicates": await find_near_duplicates(content)
+                }
+            except asyncio.CancelledError:
+                if stopping:
+                    raise
+                # Cancelled underneath this item, not by the batch: one
+                # item's failure, not the end of the stream
+                logger.warning("❌ Batch item %d was cancelled", index)
+                return {"index": index, "prompt": topic, "status": "error", "error": "Generation was cancelled"}
+            except Exception as e:
+                logger.warning("❌ Batch item %d failed: %s", index, e)
+                return {"index": index, "prompt": topic, "status": "error", "error": str(e)}
+
+    async def ndjson_results():
+        nonlocal stopping
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(generate_item(i, topic)) for i, topic in enumerate(request.prompts)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["status"] == "ok"
+                yield serialization.dumps(result) + b"\n"
+        finally:
+            # Client went away: don't keep generating for nobody
+            stopping = True
+            for task in tasks:
+                task.cancel()
+        summary = {
+            "done": True,
+            "total": len(tasks),
+            "succeeded": succeeded,
+            "failed": len(tasks) - succeeded,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000)
+        }
+        logger.info("✅ Batch generated: %d ok, %d failed", succeeded, len(tasks) - succeeded, extra=summary)
+        yield serialization.dumps(summary) + b"\n"
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+@app.post("/api/generate-content/jobs", status_code=202)
+async def submit_generation_job(request: GenerationJobRequest, response: Response):
+    """Queue a generation and return its job id right away.
+
+    Poll ``GET /api/generate-content/jobs/{id}`` or subscribe to
+    ``/api/generate-content/jobs/{id}/events`` for the result.
+    """
+    if not gemini_configured:
+        raise HTTPException(
+            status_code=503, 
+            detail="AI service not configured. Please add GEMINI_API_KEY to .env file"
+        )
+    
     try:
-        print(f"📝 Creating new post: {post.title}")
-        
-        if not mongodb_connected:
-            # Demo mode response
-            demo_post = {
-                "id": f"demo_{int(datetime.now().timestamp())}",
-                "title": post.title,
-                "content": post.content,
-                "author": post.author,
-                "slug": post.slug,
-                "tags": post.tags,
-                "seo_title": post.seo_title,
-                "seo_description": post.seo_description,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
+        job = await generation_scheduler.submit(request.prompt, request.priority, request.bypass_cache)
+    except QueueFull as e:
+        # Roughly how long until a slot frees up at the configured rate
+        retry_after = max(1, int(60 / GENERATION_RATE_PER_MINUTE))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(retry_after)})
+    except Exception as e:
+        logger.error("❌ Error queueing generation job: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to queue generation: {str(e)}")
+    
+    logger.debug("🤖 Queued generation job %s for: %s", job["_id"], request.prompt)
+    response.headers["Location"] = f"/api/generate-content/jobs/{job['_id']}"
+    return {**job_view(job), "position": generation_scheduler.position(job["_id"])}
+
+@app.get("/api/generate-content/jobs/stats")
+async def generation_job_stats():
+    """Queue depth, worker usage and wait-time statistics"""
+    return generation_scheduler.stats()
+
+@app.get("/api/generate-content/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    job = await generation_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job_view(job), "position": generation_scheduler.position(job_id)}
+
+@app.get("/api/generate-content/jobs/{job_id}/events")
+async def generation_job_events(job_id: str):
+    """Follow a job as Server-Sent Events.
+
+    Emits a ``status`` event on every state change, then ``done`` with the
+    content or ``error`` with the failure detail.
+    """
+    if await generation_scheduler.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last_status = None
+        while True:
+            # Register for the next change before reading the current state
+            generation_scheduler.changed_event(job_id)
+            job = await generation_scheduler.get(job_id)
+            if job["status"] in FINISHED:
+                if job["status"] == DONE:
+                    yield sse_event("done", {"content": job["content"], "cache": job["cache"]})
+                else:
+                    yield sse_event("error", {"detail": job["error"]})
+                return
+            status = {
+                "status": job["status"],
+                "position": generation_scheduler.position(job_id),
+                "attempts": job["attempts"]
             }
-            print("✅ Demo post created (MongoDB not connected)")
-            return demo_post
-        
-        # Check if slug already exists
-        existing_post = posts_collection.find_one({"slug": post.slug})
-        if existing_post:
-            raise HTTPException(status_code=400, detail="Slug already exists")
-        
-        post_data = {
-            "title": post.title,
-            "content": post.content,
-            "author": post.author,
-            "slug": post.slug,
-            "tags": post.tags,
-            "seo_title": post.seo_title,
-            "seo_description": post.seo_description,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        }
+            if status != last_status:
+                yield sse_event("status", status)
+                last_status = status
+            if not await generation_scheduler.wait_for_change(job_id, JOB_EVENTS_KEEPALIVE):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def build_post_document(post, created_at=None, updated_at=None):
+    """Build the stored document for a validated post"""
+    now = utcnow()
+    post_data = {
+        "title": post.title,
+        "content": post.content,
+        "author": post.author,
+        "slug": post.slug,
+        "tags": post.tags,
+        "seo_title": post.seo_title,
+        "seo_description": post.seo_description,
+        "created_at": created_at or now,
+        "updated_at": updated_at or created_at or now
+    }
+    # Score and render once at write time so listings and readers never
+    # re-analyse or re-parse the markdown
+    post_data["seo"] = seo.analyze_post(post_data)
+    post_data.update(render.render_cache.render(post.content))
+    post_data.update(similarity.signature_fields(post.title, post.content, post_data["content_text"]))
+    return post_data
+
+@app.post("/api/posts")
+async def create_post(
+    post: BlogPostCreate,
+    response: Response,
+    storage: PostStorage = Depends(get_storage),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    try:
+        logger.debug("📝 Creating new post: %s", post.title)
         
-        print(f"💾 Inserting post into MongoDB: {post_data}")
+        # A retried request with the same key replays the original response
+        if idempotency_key:
+            try:
+                replayed = await idempotency_store.reserve(
+                    idempotency_key, request_fingerprint(post.model_dump_json())
+                )
+            except IdempotencyConflict as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            if replayed is not None:
+                logger.info("✅ Replaying idempotent response", extra={"idempotency_key": idempotency_key})
+                response.headers["Idempotent-Replayed"] = "true"
+                return replayed
         
-        # Insert post
-        result = posts_collection.insert_one(post_data)
-        print(f"✅ Post inserted with ID: {result.inserted_id}")
+        try:
+            created_post = await insert_post(storage, post)
+        except BaseException:
+            if idempotency_key:
+                await idempotency_store.release(idempotency_key)
+            raise
         
-        # Retrieve and return the created post
-        created_post = posts_collection.find_one({"_id": result.inserted_id})
-        if created_post:
-            serialized_post = serialize_doc(created_post)
-            print(f"✅ Post created successfully: {serialized_post['id']}")
-            return serialized_post
-        else:
-            raise Exception("Failed to retrieve created post")
+        if idempotency_key:
+            await idempotency_store.complete(idempotency_key, created_post)
+        return created_post
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error creating post: {e}")
-        print(f"🔍 Stack trace: {traceback.format_exc()}")
+        logger.exception("❌ Error creating post: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to create post: {str(e)}")
 
+async def insert_post(storage, post):
+    """Insert a post in a single round trip and return it serialized"""
+    # Scoring, rendering and the MinHash signature are CPU-bound
+    post_data = await run_in_threadpool(build_post_document, post)
+    
+    # Slug uniqueness is enforced by the storage engine atomically, so there
+    # is no separate existence check (which two concurrent requests could both pass)
+    try:
+        await storage.insert_post(post_data)
+    except DuplicateSlugError:
+        raise HTTPException(status_code=400, detail="Slug already exists")
+    await post_aggregates.add([post_data])
+    # Check before indexing, so the post doesn't match itself
+    near_duplicates = similarity_index.near_duplicates(post_data["minhash"])
+    similarity_index.add(post_data)
+    feed_index.add(post_data)
+    
+    # The insert fills in _id; the document we sent is exactly what was
+    # stored, so there is no need to read it back
+    created_post = serialize_doc(post_data)
+    created_post["near_duplicates"] = near_duplicates
+    await post_cache.invalidate(post_id=created_post["id"], slug=post.slug)
+    logger.info("✅ Post created", extra={"post_id": created_post["id"]})
+    if near_duplicates:
+        logger.warning("⚠️  Post %s nearly duplicates %s", created_post["id"], near_duplicates[0]["id"],
+                       extra={"post_id": created_post["id"], "similarity": near_duplicates[0]["similarity"]})
+    return created_post
+
+async def iter_ndjson_lines(request):
+    """Yield raw lines from a streamed request body, one at a time"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+def validation_error_message(error):
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS_REPORTED:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+async def import_batch(storage, rows, report):
+    """Write one batch of (line number, validated row) pairs.
+
+    Slug uniqueness is enforced by the storage engine, so duplicates,
+    whether within the batch or already stored, come back as per-row
+    write errors instead of costing a lookup query.
+    """
+    # Building documents is CPU-bound (SEO, rendering, signatures)
+    batch = await run_in_threadpool(
+        lambda: [(line, build_post_document(row, row.created_at, row.updated_at)) for line, row in rows]
+    )
+    for _, doc in batch:
+        await post_cache.invalidate(slug=doc["slug"])
+    
+    inserted, errors = await storage.insert_many([doc for _, doc in batch])
+    report.inserted += inserted
+    for index, message in errors:
+        report.error(batch[index][0], message)
+    failed = {index for index, _ in errors}
+    stored = [doc for index, (_, doc) in enumerate(batch) if index not in failed]
+    await post_aggregates.add(stored)
+    for doc in stored:
+        similarity_index.add(doc)
+        feed_index.add(doc)
+
+@app.post("/api/posts/import")
+async def import_posts(request: Request, storage: PostStorage = Depends(get_storage)):
+    """Bulk import posts from an NDJSON request body (one post per line).
+
+    Rows are validated like POST /api/posts and written in unordered
+    batches. Invalid or duplicate rows are reported by line number and do
+    not stop the import.
+    """
+    try:
+        logger.debug("📥 Importing posts from NDJSON...")
+        report = ImportReport()
+        batch = []
+        line_number = 0
+        
+        async for raw_line in iter_ndjson_lines(request):
+            line_number += 1
+            if not raw_line.strip():
+                continue
+            try:
+                row = BlogPostImport.model_validate_json(raw_line)
+            except ValidationError as e:
+                report.error(line_number, validation_error_message(e))
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await import_batch(storage, batch, report)
+                batch = []
+        
+        if batch:
+            await import_batch(storage, batch, report)
+        
+        logger.info("✅ Import finished: %d inserted, %d failed", report.inserted, report.failed,
+                    extra={"inserted": report.inserted, "failed": report.failed})
+        return report.as_dict()
+        
+    except Exception as e:
+        logger.exception("❌ Error importing posts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to import posts: {str(e)}")
+
+def ndjson_line(doc):
+    return serialization.encode_post(doc) + b"\n"
+
+@app.get("/api/posts/export")
+async def export_posts(storage: PostStorage = Depends(get_storage)):
+    """Stream every post as NDJSON, straight from the cursor"""
+    logger.debug("📤 Exporting posts as NDJSON...")
+
+    async def ndjson_rows():
+        async for batch in storage.iter_posts(batch_size=EXPORT_BATCH_SIZE):
+            yield b"".join(ndjson_line(doc) for doc in batch)
+
+    return StreamingResponse(
+        ndjson_rows(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="posts.ndjson"'}
+    )
+
+@app.post("/api/drafts", status_code=201)
+async def create_draft(draft: DraftCreate):
+    try:
+        created = await draft_store.create(draft.model_dump())
+        logger.info("✅ Draft created", extra={"draft_id": created["_id"]})
+        return draft_view(created)
+    except InvalidPatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("❌ Error creating draft: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to create draft: {str(e)}")
+
+@app.get("/api/drafts/{draft_id}")
+async def get_draft(draft_id: str):
+    try:
+        return draft_view(await draft_store.get(draft_id))
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    except Exception as e:
+        logger.error("❌ Error fetching draft: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch draft: {str(e)}")
+
+@app.patch("/api/drafts/{draft_id}")
+async def patch_draft(draft_id: str, patch: DraftPatch):
+    """Apply edits made against ``base_revision``.
+
+    Answers with the new revision only, so autosave traffic stays
+    proportional to the edit. A stale ``base_revision`` gets 409 with the
+    current revision; the client re-reads the draft and rebases.
+    """
+    try:
+        draft = await draft_store.patch(
+            draft_id, patch.base_revision, [op.model_dump() for op in patch.ops]
+        )
+        return {"id": draft_id, "revision": draft["revision"], "updated_at": isoformat(draft["updated_at"])}
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    except RevisionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "revision": e.current})
+    except InvalidPatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("❌ Error patching draft: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to update draft: {str(e)}")
+
+@app.delete("/api/drafts/{draft_id}", status_code=204)
+async def delete_draft(draft_id: str):
+    try:
+        await draft_store.delete(draft_id)
+        return Response(status_code=204)
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    except Exception as e:
+        logger.error("❌ Error deleting draft: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to delete draft: {str(e)}")
+
+@app.post("/api/seo/analyze")
+async def analyze_seo(request: SEOAnalysisRequest):
+    """Score a batch of drafts without saving them"""
+    try:
+        drafts = [draft.model_dump() for draft in request.drafts]
+        # Analysis is CPU-bound; keep large batches off the event loop
+        results = await run_in_threadpool(lambda: [seo.analyze_post(d) for d in drafts])
+        logger.debug("✅ Analyzed SEO for %d drafts", len(results))
+        return {"results": results}
+    except Exception as e:
+        logger.error("❌ Error analyzing SEO: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to analyze SEO: {str(e)}")
+
+async def check_collection_validators(request, storage):
+    """Validators for a response computed from all posts.
+
+    Returns ``(headers, not_modified)``; the caller answers 304 with the
+    headers when ``not_modified`` is true, before running its query.
+    """
+    validators = collection_validators(*await storage.collection_state())
+    not_modified = validators.not_modified(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since")
+    )
+    return validators.headers(), not_modified
+
+async def serve_counts(kind, limit, request, storage):
+    try:
+        headers, not_modified = await check_collection_validators(request, storage)
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        counts = await post_aggregates.counts(kind, limit=limit)
+        return JSONResponse(content={"kind": kind, "counts": counts}, headers=headers)
+    except Exception as e:
+        logger.error("❌ Error fetching %s counts: %s", kind, e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch {kind} counts: {str(e)}")
+
+@app.get("/api/tags")
+async def tag_counts(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_FACETS),
+    storage: PostStorage = Depends(get_storage)
+):
+    """Posts per tag, most used first (for tag clouds and filters)"""
+    return await serve_counts("tag", limit, request, storage)
+
+@app.get("/api/authors")
+async def author_counts(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_FACETS),
+    storage: PostStorage = Depends(get_storage)
+):
+    """Posts per author, most prolific first"""
+    return await serve_counts("author", limit, request, storage)
+
+@app.get("/api/archive")
+async def archive_counts(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_FACETS),
+    storage: PostStorage = Depends(get_storage)
+):
+    """Posts per month (YYYY-MM), newest first"""
+    return await serve_counts("month", limit, request, storage)
+
+@app.post("/api/aggregates/rebuild")
+async def rebuild_aggregates(storage: PostStorage = Depends(get_storage)):
+    """Recompute tag, author and archive counts from the posts"""
+    try:
+        return await post_aggregates.rebuild(storage)
+    except Exception as e:
+        logger.exception("❌ Error rebuilding aggregates: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild aggregates: {str(e)}")
+
+@app.get("/api/posts/search")
+async def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    storage: PostStorage = Depends(get_storage)
+):
+    """Ranked full-text search over title, content, tags and SEO description"""
+    try:
+        logger.debug("🔍 Searching posts for: %s", q)
+        terms = search.query_terms(q)
+        if not terms:
+            return {"query": q, "results": [], "offset": offset, "has_more": False}
+        
+        headers, not_modified = await check_collection_validators(request, storage)
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        
+        # Fetch one extra result to know whether another page exists
+        docs = await storage.search(q, terms, offset=offset, limit=limit + 1)
+        
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+        # Snippets come from the readable text stored at write time. Posts
+        # stored before it existed are rendered (through the cache), off
+        # the event loop
+        unrendered = [doc for doc in docs if doc.get("content_text") is None]
+        if unrendered:
+            texts = await run_in_threadpool(lambda: [
+                render.render_cache.render(doc.get("content"))["content_text"] for doc in unrendered
+            ])
+            for doc, text in zip(unrendered, texts):
+                doc["content_text"] = text
+        results = []
+        for doc in docs:
+            text = doc.pop("content_text")
+            doc.pop("content", None)
+            result = serialize_doc(doc)
+            result["score"] = round(result.get("score", 0), 4)
+            result["snippet"] = search.make_snippet(text or doc.get("seo_description"), terms)
+            results.append(result)
+        
+        logger.debug("✅ Search returned %d posts", len(results))
+        return JSONResponse(
+            content={"query": q, "results": results, "offset": offset, "has_more": has_more},
+            headers=headers
+        )
+        
+    except Exception as e:
+        logger.error("❌ Error searching posts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to search posts: {str(e)}")
+
 @app.get("/api/posts")
-async def get_posts():
+async def get_posts(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    tag: Optional[str] = Query(None, max_length=100),
+    storage: PostStorage = Depends(get_storage)
+):
     try:
-        print("📖 Fetching posts from database...")
+        logger.debug("📖 Fetching posts from database...")
         
-        if not mongodb_connected:
-            # Demo posts
-            demo_posts = [
-                {
-                    "id": "demo_1",
-                    "title": "Welcome to AI Blog Platform",
-                    "content": "This is a demo post. Connect to MongoDB Atlas to save real posts.",
-                    "author": "System",
-                    "slug": "welcome-demo",
-                    "tags": ["demo", "welcome"],
-                    "seo_title": "Welcome Demo",
-                    "seo_description": "Demo post for AI Blog Platform",
-                    "created_at": datetime.now().isoformat(),
-                    "updated_at": datetime.now().isoformat()
-                }
-            ]
-            print("✅ Returning demo posts (MongoDB not connected)")
-            return demo_posts
+        # Keyset pagination: continue strictly after the last (created_at, _id)
+        after = None
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            if not ObjectId.is_valid(cursor_id):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            after = (cursor_created_at, ObjectId(cursor_id))
         
-        # Get all posts from MongoDB
-        print("🔍 Querying MongoDB for posts...")
-        posts_cursor = posts_collection.find().sort("created_at", -1)
-        posts_list = []
+        # An unchanged collection means an unchanged page: skip the query
+        headers, not_modified = await check_collection_validators(request, storage)
+        if not_modified:
+            return Response(status_code=304, headers=headers)
         
-        for post in posts_cursor:
-            serialized_post = serialize_doc(post)
-            posts_list.append(serialized_post)
+        # Fetch one extra document to know whether another page exists
+        batches = await data_access.prefetch(storage.list_posts(
+            limit + 1, after=after, tag=tag, batch_size=LIST_BATCH_SIZE
+        ))
         
-        print(f"✅ Found {len(posts_list)} posts in database")
-        return posts_list
+        # Encode straight from the cursor instead of building the page twice
+        return StreamingResponse(
+            serialization.stream_post_page(
+                batches, limit, lambda last: encode_cursor(last["created_at"], last["_id"])
+            ),
+            media_type="application/json",
+            headers=headers
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error fetching posts: {e}")
-        print(f"🔍 Stack trace: {traceback.format_exc()}")
+        logger.exception("❌ Error fetching posts: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch posts: {str(e)}")
 
+async def load_post(storage, post_id=None, slug=None):
+    """Fetch one serialized post from storage, or None"""
+    if post_id is not None:
+        doc = await storage.get_post(post_id)
+    else:
+        doc = await storage.get_post_by_slug(slug)
+    if doc is None:
+        return None
+    # Posts stored before rendering existed (or by an older renderer) are
+    # rendered here; the result lands in post_cache with the rest of the post
+    return serialize_doc({**doc, **render.rendered_fields(doc)})
+
+async def serve_post(request, storage, post_id=None, slug=None):
+    """Read-through cached single-post response with conditional GET"""
+    try:
+        entry = await post_cache.get(post_id=post_id, slug=slug)
+        if entry is None:
+            version = await post_cache.version()
+            post = await load_post(storage, post_id=post_id, slug=slug)
+            if post is None:
+                raise HTTPException(status_code=404, detail="Post not found")
+            entry = await post_cache.put(post, version=version)
+        
+        headers = entry.headers()
+        if entry.not_modified(
+            request.headers.get("if-none-match"),
+            request.headers.get("if-modified-since")
+        ):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=entry.post, headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Error fetching post: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch post: {str(e)}")
+
+@app.get("/api/posts/by-slug/{slug}")
+async def get_post_by_slug(slug: str, request: Request, storage: PostStorage = Depends(get_storage)):
+    return await serve_post(request, storage, slug=slug)
+
+@app.get("/api/posts/{post_id}/related")
+async def get_related_posts(
+    post_id: str,
+    request: Request,
+    limit: int = Query(5, ge=1, le=MAX_RELATED),
+    storage: PostStorage = Depends(get_storage)
+):
+    """Posts most similar in content, most similar first"""
+    try:
+        headers, not_modified = await check_collection_validators(request, storage)
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        
+        related = similarity_index.related(post_id, k=limit)
+        if related is None:
+            # Not indexed here yet (written by another process since the
+            # last refresh): index it now
+            doc = await storage.get_post(post_id)
+            if doc is None:
+                raise HTTPException(status_code=404, detail="Post not found")
+            similarity_index.add(doc)
+            related = similarity_index.related(post_id, k=limit)
+        
+        return JSONResponse(content={"post_id": post_id, "related": related}, headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Error finding related posts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to find related posts: {str(e)}")
+
+@app.get("/api/posts/{post_id}")
+async def get_post(post_id: str, request: Request, storage: PostStorage = Depends(get_storage)):
+    return await serve_post(request, storage, post_id=post_id)
+
 if __name__ == "__main__":
     print("\n🎉 Backend starting on http://localhost:8000")
     print("📚 API Documentation: http://localhost:8000/docs")
     print("🔍 Health Check: http://localhost:8000/api/health")
-    print(f"🗄️  Database: {'✅ MongoDB Atlas Connected' if mongodb_connected else '⚠️ Demo Mode'}")
+    print(f"🗄️  Database: {'✅ MongoDB Atlas (connects in the background)' if mongodb_configured else '⚠️ Demo Mode'}")
     print(f"🤖 AI Service: {'✅ Configured' if gemini_configured else '⚠️ Not Configured'}")
     print("\nPress Ctrl+C to stop the server\n")
     
+    # Development server with auto-reload; production uses serve.py
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,229 @@
+"""Read-through cache for single-post reads.
+
+Post pages are read far more often than they are written. Entries are
+looked up by id or by slug (both keys point at one entry) and evicted
+least-recently-used once ``max_entries`` is reached. Every write path
+must call ``invalidate`` so readers never see stale content.
+
+With a ``SharedCache`` (several worker processes, see ``shared_cache``)
+entries live in the shared store, not in a local copy: a write served by
+one worker must invalidate the post for all of them. While the shared
+store is unreachable the local tier stands in. It cannot see other
+workers' writes, so it is emptied each time the shared store fails again
+(every ``retry_seconds`` of an outage), before it is read, and is never
+read once the store is back. Invalidations the shared store did not get
+(it was down, or timed out) are kept and sent again before the store is
+read once more.
+
+Each entry carries the validators for conditional GETs, so a cache hit
+can answer ``If-None-Match``/``If-Modified-Since`` without re-serializing
+anything. ``collection_validators`` builds the same validators for
+listings and other responses computed from all posts.
+"""
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from timestamps import as_utc
+
+
+class Validators:
+    """ETag and Last-Modified for one representation"""
+
+    __slots__ = ("etag", "modified_at", "last_modified")
+
+    def __init__(self, etag, modified_at=None):
+        self.etag = etag
+        # HTTP dates have one-second resolution
+        self.modified_at = as_utc(modified_at).replace(microsecond=0) if modified_at else None
+        self.last_modified = format_datetime(self.modified_at, usegmt=True) if self.modified_at else None
+
+    def headers(self):
+        headers = {"ETag": self.etag}
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        # Clients may keep a copy but must revalidate it
+        headers["Cache-Control"] = "no-cache"
+        return headers
+
+    def not_modified(self, if_none_match=None, if_modified_since=None):
+        """True if the client's validators show its copy is current"""
+        if if_none_match:
+            # If-None-Match takes precedence over If-Modified-Since, and
+            # uses weak comparison
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+        if if_modified_since and self.modified_at:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.modified_at <= since
+        return False
+
+
+class CachedPost(Validators):
+    __slots__ = ("post",)
+
+    def __init__(self, post):
+        self.post = post
+        updated_at = as_utc(post.get("updated_at") or post["created_at"])
+        super().__init__(f'"{post["id"]}-{int(updated_at.timestamp() * 1000)}"', updated_at)
+
+
+def collection_validators(count, newest_update):
+    """Validators for any response built from the whole post collection.
+
+    Every write either adds a post or moves its ``updated_at`` forward, so
+    the post count and the newest ``updated_at`` change whenever such a
+    response could.
+    """
+    stamp = int(as_utc(newest_update).timestamp() * 1000) if newest_update else 0
+    return Validators(f'W/"posts-{count}-{stamp}"', newest_update)
+
+
+SHARED_NAMESPACE = "posts"
+
+
+class PostCache:
+    def __init__(self, max_entries=1024, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared  # SharedCache or None
+        self._entries = OrderedDict()  # post id -> CachedPost
+        self._slugs = {}  # slug -> post id
+        # Bumped on every invalidation. A reader that started its database
+        # fetch before a write must not put its (now stale) result back
+        self._version = 0
+        self._shared_failures = 0
+        # Keys whose shared invalidation failed; sent again on recovery
+        self._pending = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _use_shared(self):
+        """Whether to go to the shared store, or fall back to the local tier"""
+        if self.shared is None:
+            return False
+        if self.shared.available:
+            return True
+        if self.shared.failures != self._shared_failures:
+            # Entries cached before this failure may have missed other
+            # workers' invalidations
+            self._shared_failures = self.shared.failures
+            self._clear_local()
+        return False
+
+    async def _shared_ready(self):
+        """Like ``_use_shared``, but first sends the invalidations the
+        shared store missed: until it has them it may hold stale posts"""
+        if not self._use_shared():
+            return False
+        if self._pending:
+            keys = list(self._pending)
+            if await self.shared.invalidate(SHARED_NAMESPACE, keys) is None:
+                return self._use_shared()
+            self._pending.difference_update(keys)
+        return True
+
+    async def version(self):
+        """The version to pass to ``put``; read it before fetching the post"""
+        if await self._shared_ready():
+            version = await self.shared.version(SHARED_NAMESPACE)
+            if version is not None:
+                return ("shared", version)
+            # Empty the local tier before reading its version
+            self._use_shared()
+        return ("local", self._version)
+
+    async def get(self, post_id=None, slug=None):
+        if await self._shared_ready():
+            post = await self.shared.get(SHARED_NAMESPACE, f"id:{post_id}" if post_id is not None else f"slug:{slug}")
+            if post is not None:
+                self.hits += 1
+                return CachedPost(post)
+            if self._use_shared():
+                self.misses += 1
+                return None
+            # The store failed just now; only entries cached from here on
+            # are read
+        if post_id is None:
+            post_id = self._slugs.get(slug)
+        entry = self._entries.get(post_id) if post_id is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(post_id)
+        self.hits += 1
+        return entry
+
+    async def put(self, post, version=None):
+        """Cache a serialized post and return its entry.
+
+        Pass the ``version`` read before fetching the post; if a write has
+        invalidated the cache since then, the entry is returned uncached.
+        """
+        entry = CachedPost(post)
+        tier, number = version if version is not None else (None, None)
+        if self._use_shared():
+            if tier == "shared":
+                await self.shared.set(
+                    SHARED_NAMESPACE, f"id:{post['id']}", post,
+                    aliases=[f"slug:{post['slug']}"], version=number
+                )
+            return entry
+        if self.shared is not None and tier != "local":
+            return entry
+        if version is not None and number != self._version:
+            return entry
+        post_id = post["id"]
+        old = self._entries.pop(post_id, None)
+        if old is not None:
+            self._slugs.pop(old.post.get("slug"), None)
+        self._entries[post_id] = entry
+        self._slugs[post["slug"]] = post_id
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._slugs.pop(evicted.post.get("slug"), None)
+        return entry
+
+    async def invalidate(self, post_id=None, slug=None):
+        keys = [f"id:{post_id}"] if post_id is not None else []
+        if slug is not None:
+            keys.append(f"slug:{slug}")
+        self._version += 1
+        if post_id is None and slug is not None:
+            post_id = self._slugs.get(slug)
+        entry = self._entries.pop(post_id, None) if post_id is not None else None
+        if entry is not None:
+            self._slugs.pop(entry.post.get("slug"), None)
+        if slug is not None:
+            self._slugs.pop(slug, None)
+        if self.shared is None:
+            return
+        if not self._use_shared() or await self.shared.invalidate(SHARED_NAMESPACE, keys) is None:
+            self._pending.update(keys)
+
+    def _clear_local(self):
+        self._version += 1
+        self._entries.clear()
+        self._slugs.clear()
+
+    async def clear(self):
+        self._clear_local()
+        if self._use_shared():
+            await self.shared.clear(SHARED_NAMESPACE)
+
+    async def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending_invalidations": len(self._pending),
+            "shared": await self.shared.stats() if self.shared is not None else None,
+        }
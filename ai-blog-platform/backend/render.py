@@ -0,0 +1,164 @@
+"""Markdown rendering done once, at write time.
+
+Posts are written in markdown. Before this module, every client downloaded
+the raw body and parsed it on every view. Now a post is rendered when it
+is written, and these forms are stored next to the source:
+
+- ``content_html``: sanitized HTML, safe to insert into a page as is;
+- ``excerpt``: a plain-text summary for listings, without markdown syntax;
+- ``content_text``: the whole readable text, which search snippets are
+  cut from (internal, never sent to clients).
+
+``RenderCache`` is keyed on a hash of the content (plus the renderer
+version), so identical content is only rendered once. This covers
+re-imports, repeated saves and cloned posts.
+
+Rendering uses ``markdown`` and ``nh3`` when both are installed. Without
+them the body is escaped and split into paragraphs, which is plain but
+still safe.
+"""
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+
+import metrics
+
+try:
+    import markdown
+    import nh3
+except ImportError:  # optional; falls back to escaped paragraphs
+    markdown = nh3 = None
+
+# Bump when the rendering output changes, so cached and stored renders of
+# unchanged content are not reused
+RENDERER_VERSION = "1" if markdown is not None else "1-plain"
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+EXCERPT_LENGTH = 200
+
+RENDERS = metrics.REGISTRY.counter(
+    "post_renders", "Markdown render requests by cache outcome", ("cache",)
+)
+# Created up front, so worker threads never add a label while /metrics reads them
+_RENDER_HITS = RENDERS.labels("hit")
+_RENDER_MISSES = RENDERS.labels("miss")
+
+# Blocks that read badly as running text are left out of excerpts
+_CODE_BLOCK = re.compile(r"^\s*(```|~~~).*?(^\s*\1\s*$|\Z)", re.MULTILINE | re.DOTALL)
+_RAW_BLOCK = re.compile(r"<(script|style)\b.*?(</\1\s*>|\Z)", re.IGNORECASE | re.DOTALL)
+_TABLE_ROW = re.compile(r"^\s*\|.*$", re.MULTILINE)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_TAG = re.compile(r"<[^>]+>")
+_LINE_MARKUP = re.compile(r"^\s{0,3}(#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)", re.MULTILINE)
+_RULE = re.compile(r"^\s*([-*_]\s*){3,}$", re.MULTILINE)
+_EMPHASIS = re.compile(r"(\*\*|__|\*|_|~~|`)")
+_WHITESPACE = re.compile(r"\s+")
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+
+def content_hash(content):
+    payload = f"{RENDERER_VERSION}\n{content or ''}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_html(content):
+    """Markdown to sanitized HTML"""
+    if markdown is not None:
+        return nh3.clean(markdown.markdown(content or "", extensions=MARKDOWN_EXTENSIONS))
+    paragraphs = (p.strip() for p in _BLANK_LINES.split(content or ""))
+    return "".join(
+        "<p>" + html.escape(p).replace("\n", "<br>") + "</p>" for p in paragraphs if p
+    )
+
+
+def plain_text(content):
+    """Strip markdown syntax, leaving the readable text"""
+    text = _CODE_BLOCK.sub("", content or "")
+    text = _RAW_BLOCK.sub("", text)
+    text = _TABLE_ROW.sub("", text)
+    text = _IMAGE.sub(r"\1", text)
+    text = _LINK.sub(r"\1", text)
+    text = _TAG.sub("", text)
+    text = _RULE.sub("", text)
+    text = _LINE_MARKUP.sub("", text)
+    text = _EMPHASIS.sub("", text)
+    return html.unescape(_WHITESPACE.sub(" ", text)).strip()
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH, text=None):
+    """Plain-text excerpt, cut at a word boundary. Pass ``text`` when the
+    content's ``plain_text`` is already at hand"""
+    if text is None:
+        text = plain_text(content)
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    space = cut.rfind(" ")
+    if space > length // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:.-")
+
+
+class RenderCache:
+    """LRU of content hash -> (html, excerpt, text).
+
+    Posts are built in worker threads (create and import), so the entries
+    and counters, ``RENDERS`` included, are only touched under ``_lock``.
+    Rendering itself happens outside it.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, content):
+        """Return ``{"content_html", "excerpt", "content_text", "content_hash"}``
+        for the content"""
+        key = content_hash(content)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _RENDER_HITS.inc()
+        if entry is None:
+            text = plain_text(content)
+            entry = (render_html(content), make_excerpt(content, text=text), text)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self.misses += 1
+                _RENDER_MISSES.inc()
+        return {"content_html": entry[0], "excerpt": entry[1], "content_text": entry[2], "content_hash": key}
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "renderer": RENDERER_VERSION,
+        }
+
+
+render_cache = RenderCache()
+
+
+def rendered_fields(document):
+    """The rendered fields for a stored document.
+
+    Uses the stored render when it matches the current content and
+    renderer, and renders otherwise (posts written before rendering
+    existed, or after a renderer upgrade).
+    """
+    content = document.get("content")
+    if document.get("content_html") is not None and document.get("content_hash") == content_hash(content):
+        return {key: document[key] for key in ("content_html", "excerpt", "content_hash")}
+    return render_cache.render(content)
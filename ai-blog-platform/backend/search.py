@@ -0,0 +1,150 @@
+"""Full-text search helpers for posts.
+
+With MongoDB connected, search runs on a weighted ``$text`` index (see
+``TEXT_INDEX_WEIGHTS``). Without Mongo, ``InvertedIndex`` offers the same
+features in-process: the same field weights, relevance ranking and
+pagination. It is updated on every insert.
+
+``make_snippet`` builds the highlighted excerpt shown in results for both
+backends.
+"""
+import heapq
+import html
+import math
+import re
+from collections import defaultdict
+
+# Relative importance of each field; also used for the Mongo text index
+TEXT_INDEX_WEIGHTS = {
+    "title": 10,
+    "tags": 5,
+    "seo_description": 3,
+    "content": 1,
+}
+
+SNIPPET_LENGTH = 160
+
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "was",
+    "what", "with",
+})
+
+_WORD = re.compile(r"\w+")
+
+
+def stem(word):
+    """Very light suffix stripping so 'posts'/'posting' match 'post'"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def analyze(text):
+    """Lowercase, split, drop stop words and stem"""
+    return [stem(w) for w in _WORD.findall(text.lower()) if w not in STOP_WORDS]
+
+
+def query_terms(query):
+    # Unique terms, in query order
+    return list(dict.fromkeys(analyze(query)))
+
+
+def make_snippet(text, terms, length=SNIPPET_LENGTH):
+    """Excerpt of text around the first match, with matches in <mark> tags.
+
+    The result is HTML-escaped, so it is safe to render directly.
+    """
+    text = text or ""
+    if not terms:
+        return html.escape(text[:length])
+
+    # Terms are stems: match any word that starts with one
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+    first = pattern.search(text)
+    start = 0
+    if first:
+        start = max(0, first.start() - length // 4)
+        # Don't cut a word in half at the start of the window
+        space = text.rfind(" ", 0, start)
+        start = space + 1 if start and space != -1 else start
+    window = text[start:start + length]
+
+    parts = []
+    last = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    parts.append(html.escape(window[last:]))
+
+    snippet = "".join(parts)
+    if start > 0:
+        snippet = "…" + snippet
+    if start + length < len(text):
+        snippet += "…"
+    return snippet
+
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return value or ""
+
+
+class InvertedIndex:
+    """In-process weighted inverted index over post fields.
+
+    Postings map each term to ``{doc_id: weighted term frequency}``.
+    Scoring is TF-IDF with the field weights applied to term frequency.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = weights or TEXT_INDEX_WEIGHTS
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.docs = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, doc):
+        """Index (or re-index) a document"""
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        frequencies = defaultdict(float)
+        for field, weight in self.weights.items():
+            for term in analyze(_field_text(doc.get(field))):
+                frequencies[term] += weight
+        for term, tf in frequencies.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = set(frequencies)
+        self.docs[doc_id] = doc
+
+    def remove(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.docs.pop(doc_id, None)
+
+    def search(self, terms, offset=0, limit=20):
+        """Return ``[(doc_id, score)]`` for the requested page, best first.
+
+        A document matches if it contains any of the terms, as with Mongo's
+        ``$text``.
+        """
+        total_docs = len(self.docs)
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + total_docs / len(postings))
+            for doc_id, tf in postings.items():
+                scores[doc_id] += (1 + math.log(tf)) * idf
+        ranked = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        return ranked[offset:]
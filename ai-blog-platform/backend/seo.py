@@ -0,0 +1,111 @@
+"""Server-side SEO analysis for blog posts.
+
+Port of the scoring in frontend/src/components/SEOAnalysis.tsx. The same
+thresholds and suggestions apply, so scores match what editors see in the
+browser. Posts are scored once at write time and the result is stored on
+the document.
+
+Word count and keyword frequencies are collected in a single pass over the
+content instead of re-splitting it once per metric.
+"""
+import re
+from collections import Counter
+
+WORDS_PER_MINUTE = 200
+TOP_KEYWORDS = 5
+STOP_WORDS = frozenset({"this", "that", "with", "from", "have", "were"})
+
+_TOKEN = re.compile(r"\S+")
+_NON_WORD = re.compile(r"[^\w]")
+
+
+def tokenize(content):
+    """Single pass over content.
+
+    Returns ``(word_count, keyword_counts, keyword_candidates)``, where
+    ``keyword_candidates`` counts tokens longer than three characters (the
+    denominator used for keyword density).
+    """
+    word_count = 0
+    candidates = 0
+    counts = Counter()
+    for match in _TOKEN.finditer(content):
+        word_count += 1
+        token = match.group()
+        if len(token) <= 3:
+            continue
+        candidates += 1
+        word = _NON_WORD.sub("", token.lower())
+        if len(word) > 3 and word not in STOP_WORDS:
+            counts[word] += 1
+    return word_count, counts, candidates
+
+
+def analyze(title, content, meta_description=""):
+    """Score a post. Returns the same fields as the frontend analysis"""
+    title = title or ""
+    content = content or ""
+    meta_description = meta_description or ""
+
+    word_count, counts, candidates = tokenize(content)
+    reading_time = -(-word_count // WORDS_PER_MINUTE)  # ceil
+
+    keyword_density = {
+        word: round(count / candidates * 100, 2)
+        for word, count in counts.most_common(TOP_KEYWORDS)
+    }
+
+    score = 0
+    suggestions = []
+
+    # Title check
+    if 50 <= len(title) <= 60:
+        score += 25
+    else:
+        suggestions.append(
+            "Title is too short. Aim for 50-60 characters." if len(title) < 50
+            else "Title is too long. Keep it under 60 characters."
+        )
+
+    # Description check
+    if 120 <= len(meta_description) <= 160:
+        score += 25
+    else:
+        suggestions.append(
+            "Meta description is too short. Aim for 120-160 characters." if len(meta_description) < 120
+            else "Meta description is too long. Keep it under 160 characters."
+        )
+
+    # Content length check
+    if word_count >= 300:
+        score += 25
+    else:
+        suggestions.append("Content is too short. Aim for at least 300 words for better SEO.")
+
+    # Reading time check
+    if reading_time >= 2:
+        score += 25
+    else:
+        suggestions.append("Content might be too brief. Longer articles tend to rank better.")
+
+    if not keyword_density and word_count > 0:
+        suggestions.append("Consider adding more specific keywords to improve SEO.")
+
+    return {
+        "title_length": len(title),
+        "description_length": len(meta_description),
+        "word_count": word_count,
+        "reading_time": reading_time,
+        "keyword_density": keyword_density,
+        "seo_score": score,
+        "suggestions": suggestions or ["Great! Your SEO looks good."],
+    }
+
+
+def analyze_post(post):
+    """Analyze a post-shaped mapping (title/content/seo_title/seo_description)"""
+    return analyze(
+        post.get("seo_title") or post.get("title"),
+        post.get("content"),
+        post.get("seo_description"),
+    )
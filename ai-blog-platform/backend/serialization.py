@@ -0,0 +1,96 @@
+"""Fast JSON encoding for post documents.
+
+``serialize_doc`` copies each document, walks every field to convert
+datetimes, and FastAPI's default response path then walks the result
+again in ``jsonable_encoder`` before encoding it. For large listings that
+dominates CPU time and keeps the whole list in memory twice.
+
+The encoder here handles ``ObjectId`` and ``datetime`` natively and writes
+bytes directly. It uses orjson when installed and falls back to the
+standard library otherwise. ``stream_post_page`` writes a listing's JSON
+incrementally as batches arrive from the cursor.
+"""
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+
+from timestamps import isoformat
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value):
+        """Encode to JSON bytes (orjson encodes datetimes itself; stored
+        ones are naive UTC, so it is told to mark them as UTC)"""
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NAIVE_UTC)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(value):
+        """Encode to JSON bytes"""
+        return _encoder.encode(value).encode("utf-8")
+
+
+# Stored for the backend's own use, never sent to clients
+INTERNAL_FIELDS = ("minhash", "minhash_version", "indexed_at", "content_text")
+
+
+def post_view(doc):
+    """Expose ``_id`` as ``id`` and leave out ``INTERNAL_FIELDS``"""
+    view = {"id": doc["_id"]} if "_id" in doc else {}
+    view.update(doc)
+    view.pop("_id", None)
+    for field in INTERNAL_FIELDS:
+        view.pop(field, None)
+    return view
+
+
+def encode_post(doc):
+    return dumps(post_view(doc))
+
+
+async def stream_post_page(batches, limit, make_cursor):
+    """Write ``{"posts": [...], "next_cursor": ...}`` incrementally.
+
+    ``batches`` yields lists of raw documents. The query should ask for
+    ``limit + 1`` documents: if the extra one arrives, there is another
+    page and ``make_cursor(last_doc)`` builds the cursor for it.
+    """
+    yield b'{"posts":['
+    count = 0
+    last = None
+    has_more = False
+    try:
+        async for batch in batches:
+            parts = []
+            for doc in batch:
+                if count == limit:
+                    has_more = True
+                    break
+                parts.append(encode_post(doc))
+                count += 1
+                last = doc
+            if parts:
+                # Comma between batches, except before the very first post
+                yield (b"," if count > len(parts) else b"") + b",".join(parts)
+            if has_more:
+                break
+    finally:
+        await batches.aclose()
+    next_cursor = make_cursor(last) if has_more else None
+    yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
@@ -0,0 +1,145 @@
+"""Production entry point: several worker processes behind one port.
+
+    python serve.py                 # WEB_CONCURRENCY workers on PORT
+    python serve.py --workers 4 --port 8080
+
+``python main.py`` stays the single-process development server with
+auto-reload. Here, on POSIX systems with gunicorn installed:
+
+- the app is imported once in the master (``preload_app``) and the
+  workers are forked from it, so they start fast and share the imported
+  code's memory. Importing the app does no I/O: the Mongo client connects
+  lazily and the Gemini SDK loads on first use, so nothing that can't
+  survive a fork exists before it. Each worker then runs its own startup
+  (indexes, health checks, background tasks);
+- each worker is replaced after ``MAX_REQUESTS`` requests (plus up to
+  ``MAX_REQUESTS_JITTER``, so they don't all restart together), which
+  bounds slow memory growth. A replaced or stopped worker gets
+  ``GRACEFUL_TIMEOUT`` seconds to finish its requests (and flush drafts);
+- a cache server (``shared_cache``) runs next to the workers, so
+  generation results and post lookups cached by one serve all of them.
+
+Without gunicorn (Windows), uvicorn's own process manager runs the
+workers. It imports the app in each worker and does not recycle them.
+
+Rate limits, generation concurrency and the similarity index are per
+worker: set ``GENERATION_RATE_PER_MINUTE`` to the account's quota divided
+by the worker count. Demo mode keeps posts in each process's memory, so
+without MongoDB only one worker is started.
+"""
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+import shared_cache
+from logging_config import configure_logging
+
+load_dotenv()
+configure_logging()
+logger = logging.getLogger("blog.serve")
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4))))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+# Generation streams can run for minutes; the worker timeout only covers
+# a worker that stops answering the master's heartbeat
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "120"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+KEEPALIVE_SECONDS = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE", "true").lower() == "true"
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+
+def uses_memory_storage():
+    """Mirror of main's storage selection, decided before main is imported"""
+    uri = os.getenv("MONGODB_URI")
+    return (
+        os.getenv("STORAGE_BACKEND", "auto").lower() == "memory"
+        or not uri
+        or "your_mongodb_uri" in uri
+    )
+
+
+if BaseApplication is not None:
+    class ProductionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import main
+            return main.app
+
+
+def run_gunicorn(host, port, workers):
+    ProductionServer({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS_JITTER,
+        "timeout": WORKER_TIMEOUT,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "keepalive": KEEPALIVE_SECONDS,
+    }).run()
+
+
+def run_uvicorn(host, port, workers):
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend with several worker processes")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    args = parser.parse_args()
+
+    workers = max(args.workers, 1)
+    if workers > 1 and uses_memory_storage():
+        logger.warning("⚠️  Demo mode keeps posts in process memory; starting 1 worker instead of %d", workers)
+        workers = 1
+    # main reads this to pick multi-worker behaviour (e.g. draft write-through)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    cache_manager = None
+    if workers > 1 and SHARED_CACHE_ENABLED:
+        # Started before the app is imported, so main finds it in the environment
+        cache_manager = shared_cache.start_server()
+
+    logger.info("🚀 Serving on http://%s:%d with %d worker(s)", args.host, args.port, workers)
+    try:
+        if BaseApplication is not None:
+            run_gunicorn(args.host, args.port, workers)
+        else:
+            logger.warning("⚠️  gunicorn not installed; using uvicorn workers (no preload or recycling)")
+            run_uvicorn(args.host, args.port, workers)
+    finally:
+        if cache_manager is not None:
+            shared_cache.stop_server(cache_manager)
+
+
+if __name__ == "__main__":
+    main()
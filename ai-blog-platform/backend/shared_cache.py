@@ -0,0 +1,275 @@
+"""Cache shared by every worker process on one host.
+
+With several worker processes, an in-process cache only helps the worker
+that filled it. A generation paid for by one worker would be paid for
+again by the next, and a post cached by one worker could not be
+invalidated by a write served by another. So ``serve.py`` starts one small
+cache server next to the workers, a ``multiprocessing`` manager that
+listens on a local socket (a Unix socket where available), and every
+worker talks to it through ``SharedCache``.
+
+The server holds one LRU of ``max_entries`` values with optional TTLs,
+split into namespaces. Each namespace has a version counter that
+``invalidate`` bumps, so ``set(..., version=v)`` can refuse a value read
+before a concurrent write, across processes, as ``PostCache`` does within
+one. Aliases let one entry be found under a second key (a post's slug).
+
+Each call is a blocking round-trip over the local socket, a few tens of
+microseconds when the server is healthy, so the client's methods are
+coroutines that run it on a small thread pool of their own and give up
+after ``SHARED_CACHE_TIMEOUT`` seconds: a stalled server costs a request
+at most that long, never the event loop. A client whose call fails or
+times out logs it, answers every call as a miss for ``retry_seconds``,
+then reconnects. Callers must treat the shared cache as optional and fall
+back to their own tier while ``available`` is false.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing.managers import BaseManager
+
+logger = logging.getLogger(__name__)
+
+# Set by serve.py for its workers; unset means no shared cache
+ADDRESS_ENV = "SHARED_CACHE_ADDRESS"
+AUTHKEY_ENV = "SHARED_CACHE_AUTHKEY"
+SHARED_CACHE_SIZE = int(os.getenv("SHARED_CACHE_SIZE", "4096"))
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", "0.25"))
+# Threads per process for calls to the server; calls stuck on a stalled
+# server hold one each, so this also caps how many can pile up
+SHARED_CACHE_THREADS = int(os.getenv("SHARED_CACHE_THREADS", "4"))
+
+
+class SharedStore:
+    """The store inside the server process; every method is one call"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at or None, value, aliases)
+        self._aliases = {}  # (namespace, alias) -> key
+        self._versions = {}  # namespace -> int
+        self._lock = threading.Lock()  # the manager serves each client on its own thread
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve(self, namespace, key):
+        return self._aliases.get((namespace, key), key)
+
+    def _drop(self, namespace, key):
+        entry = self._entries.pop((namespace, key), None)
+        if entry is not None:
+            for alias in entry[2]:
+                if self._aliases.get((namespace, alias)) == key:
+                    del self._aliases[(namespace, alias)]
+
+    def get(self, namespace, key):
+        with self._lock:
+            slot = (namespace, self._resolve(namespace, key))
+            entry = self._entries.get(slot)
+            if entry is None or (entry[0] is not None and entry[0] < time.monotonic()):
+                if entry is not None:
+                    self._drop(*slot)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, namespace, key, value, ttl=None, aliases=(), version=None):
+        """Store value; with ``version``, only if the namespace is still at
+        that version. Returns whether it was stored."""
+        with self._lock:
+            if version is not None and version != self._versions.get(namespace, 0):
+                return False
+            self._drop(namespace, key)
+            self._entries[(namespace, key)] = (time.monotonic() + ttl if ttl else None, value, tuple(aliases))
+            for alias in aliases:
+                self._aliases[(namespace, alias)] = key
+            while len(self._entries) > self.max_entries:
+                self._drop(*next(iter(self._entries)))
+            return True
+
+    def invalidate(self, namespace, keys=()):
+        """Bump the namespace version and drop the given keys (or aliases)"""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            for key in keys:
+                self._drop(namespace, self._resolve(namespace, key))
+                self._aliases.pop((namespace, key), None)
+            return self._versions[namespace]
+
+    def version(self, namespace):
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def clear(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            for slot in [slot for slot in self._entries if slot[0] == namespace]:
+                self._drop(*slot)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_store = None
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        _store = SharedStore(max_entries=SHARED_CACHE_SIZE)
+    return _store
+
+
+class SharedCacheManager(BaseManager):
+    pass
+
+
+SharedCacheManager.register("get_store", callable=_get_store)
+
+
+def default_address():
+    if sys.platform == "win32":
+        return ("127.0.0.1", 0)  # any free port
+    return os.path.join(tempfile.mkdtemp(prefix="blog-cache-"), "cache.sock")
+
+
+def start_server(address=None):
+    """Start the cache server process and export its address and key, so
+    workers started (or forked) afterwards find it. Returns the manager
+    to pass to ``stop_server``."""
+    authkey = secrets.token_bytes(32)
+    manager = SharedCacheManager(address=address or default_address(), authkey=authkey)
+    manager.start()
+    address = manager.address
+    os.environ[ADDRESS_ENV] = address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+    os.environ[AUTHKEY_ENV] = authkey.hex()
+    logger.info("🔗 Shared cache listening on %s", os.environ[ADDRESS_ENV])
+    return manager
+
+
+def stop_server(manager):
+    manager.shutdown()
+    if isinstance(manager.address, str) and os.path.basename(os.path.dirname(manager.address)).startswith("blog-cache-"):
+        shutil.rmtree(os.path.dirname(manager.address), ignore_errors=True)
+
+
+def _parse_address(value):
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and not value.startswith("/"):
+        return (host, int(port))
+    return value
+
+
+class SharedCache:
+    """Client side: a proxy per process, reconnecting after failures"""
+
+    def __init__(self, address, authkey, retry_seconds=5.0, timeout=SHARED_CACHE_TIMEOUT):
+        self.address = _parse_address(address)
+        self.authkey = authkey
+        self.retry_seconds = retry_seconds
+        self.timeout = timeout
+        self.failures = 0
+        self._store = None
+        self._pid = None
+        self._executor = None
+        self._executor_pid = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """The shared cache serve.py started, or None when there is none"""
+        address = os.getenv(ADDRESS_ENV)
+        authkey = os.getenv(AUTHKEY_ENV)
+        if not address or not authkey:
+            return None
+        return cls(address, bytes.fromhex(authkey))
+
+    def _proxy(self):
+        # A proxy inherited through fork shares its socket with the parent,
+        # so each process connects for itself, on first use
+        if self._store is None or self._pid != os.getpid():
+            with self._lock:
+                if self._store is None or self._pid != os.getpid():
+                    manager = SharedCacheManager(address=self.address, authkey=self.authkey)
+                    manager.connect()
+                    self._store = manager.get_store()
+                    self._pid = os.getpid()
+        return self._store
+
+    def _threads(self):
+        # Pool threads don't survive a fork either
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(SHARED_CACHE_THREADS, thread_name_prefix="shared-cache")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _failed(self, error):
+        self._store = None
+        self.failures += 1
+        self._down_until = time.monotonic() + self.retry_seconds
+        logger.warning("⚠️  Shared cache unavailable, retrying in %.0fs: %s", self.retry_seconds, error)
+
+    def _invoke(self, method, args, kwargs):
+        return getattr(self._proxy(), method)(*args, **kwargs)
+
+    async def _call(self, method, *args, default=None, **kwargs):
+        if not self.available:
+            return default
+        # Connecting blocks too, so it happens in the pool thread as well
+        call = partial(self._invoke, method, args, kwargs)
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self._threads(), call), self.timeout
+            )
+        except asyncio.TimeoutError:
+            # The thread stays blocked until the server answers; its result is dropped
+            self._failed(f"no answer to {method} within {self.timeout}s")
+            return default
+        except (OSError, EOFError) as e:
+            self._failed(e)
+            return default
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    async def get(self, namespace, key):
+        return await self._call("get", namespace, key)
+
+    async def set(self, namespace, key, value, ttl=None, aliases=(), version=None):
+        return await self._call(
+            "set", namespace, key, value, ttl=ttl, aliases=tuple(aliases), version=version, default=False
+        )
+
+    async def invalidate(self, namespace, keys=()):
+        return await self._call("invalidate", namespace, tuple(keys))
+
+    async def version(self, namespace):
+        return await self._call("version", namespace)
+
+    async def clear(self, namespace):
+        await self._call("clear", namespace)
+
+    async def stats(self):
+        stats = await self._call("stats", default={})
+        return dict(stats, address=str(self.address), available=self.available, failures=self.failures)
@@ -0,0 +1,444 @@
+"""Post storage engines.
+
+Routes talk to a ``PostStorage`` rather than to pymongo directly. There are
+two engines:
+
+- ``MongoPostStorage``: MongoDB (Atlas), through the non-blocking
+  ``data_access.AsyncCollection`` facade.
+- ``MemoryPostStorage``: an in-process engine with real secondary indexes
+  (unique slug, created_at order, per-tag created_at order, full-text). It
+  replaces the old "demo mode", which returned hard-coded posts. Demo and
+  CI runs now behave like production, and benchmarks can run offline and
+  deterministically.
+
+Both engines store the same document shape (``ObjectId`` _id, naive
+UTC datetimes, see ``timestamps``) and return the same shapes, so
+serialization treats them alike.
+"""
+import asyncio
+import bisect
+import itertools
+import logging
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import search
+from data_access import AsyncCollection, run_mongo_op
+from render import EXCERPT_LENGTH
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Summary projection used by post listings: everything except the full
+# markdown body and its rendered HTML. The excerpt is stored at write time;
+# posts written before that get the start of the raw body instead
+POST_SUMMARY_PROJECTION = {
+    "title": 1,
+    "author": 1,
+    "slug": 1,
+    "tags": 1,
+    "seo_title": 1,
+    "seo_description": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "seo": 1,
+    "excerpt": {"$ifNull": ["$excerpt", {"$substrCP": ["$content", 0, EXCERPT_LENGTH]}]},
+}
+
+SUMMARY_FIELDS = [field for field in POST_SUMMARY_PROJECTION if field != "excerpt"]
+
+SEARCH_PROJECTION = {
+    "title": 1,
+    "author": 1,
+    "slug": 1,
+    "tags": 1,
+    "seo_title": 1,
+    "seo_description": 1,
+    # Snippets are cut from the stored plain text; the markdown body is
+    # only fetched for posts stored before there was one
+    "content_text": 1,
+    "content": {"$cond": [{"$eq": [{"$type": "$content_text"}, "string"]}, "$$REMOVE", "$content"]},
+    "created_at": 1,
+    "updated_at": 1,
+    "score": {"$meta": "textScore"},
+}
+
+SEARCH_FIELDS = [field for field in SEARCH_PROJECTION if field != "score"]
+
+# Every write stamps ``indexed_at`` (server time, unlike the imported
+# created_at/updated_at). Incremental readers re-read this much before
+# their newest stamp, for writes that committed late or came from a
+# host with a slightly different clock
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class DuplicateSlugError(Exception):
+    pass
+
+
+def duplicate_slug_message(slug):
+    return f"Slug already exists: {slug}"
+
+
+class PostStorage:
+    """Interface the routes depend on. All methods are coroutines.
+
+    Listing and export methods return async iterators of document batches
+    so responses can stream without holding a whole result set.
+    """
+
+    name = "abstract"
+
+    async def ensure_indexes(self):
+        """Create whatever indexes the engine needs (idempotent).
+
+        Returns the names of the indexes that could not be created.
+        """
+        return []
+
+    async def ping(self):
+        """Return True if the engine can serve queries"""
+        raise NotImplementedError
+
+    async def insert_post(self, document):
+        """Insert document (assigning _id); raises DuplicateSlugError"""
+        raise NotImplementedError
+
+    async def insert_many(self, documents):
+        """Unordered bulk insert.
+
+        Returns ``(inserted_count, errors)``, where errors is a list of
+        ``(index, message)`` for rejected documents.
+        """
+        raise NotImplementedError
+
+    async def get_post(self, post_id):
+        """Fetch by id string; None if missing or not a valid id"""
+        raise NotImplementedError
+
+    async def get_post_by_slug(self, slug):
+        raise NotImplementedError
+
+    async def get_posts(self, post_ids, fields=None):
+        """The posts with these ``_id``s (any order; missing ones left out),
+        limited to ``fields`` like ``iter_posts``"""
+        raise NotImplementedError
+
+    def list_posts(self, limit, after=None, tag=None, batch_size=50):
+        """Newest-first summaries (excerpt instead of content).
+
+        ``after`` is a ``(created_at, ObjectId)`` keyset position; only
+        posts strictly older are returned. At most ``limit`` documents.
+        """
+        raise NotImplementedError
+
+    async def search(self, query, terms, offset, limit):
+        """Ranked full-text results: documents with ``content`` and ``score``"""
+        raise NotImplementedError
+
+    def iter_posts(self, batch_size=500, indexed_since=None, fields=None):
+        """Every post document, in batches; with ``indexed_since``, only
+        posts written at or after it (by ``indexed_at``, see
+        ``REFRESH_OVERLAP``). ``fields`` limits the documents to those
+        fields (and ``_id``)"""
+        raise NotImplementedError
+
+    async def collection_state(self):
+        """``(post count, newest updated_at)``: changes on every write, and
+        is cheap enough to compute per request (see conditional GETs)"""
+        raise NotImplementedError
+
+    def collection(self, name):
+        """AsyncCollection for an auxiliary collection, if the engine has one"""
+        return None
+
+
+class MongoPostStorage(PostStorage):
+    name = "mongo"
+
+    def __init__(self, db):
+        self.db = db
+        self.posts = AsyncCollection(db["posts"])
+
+    def collection(self, name):
+        return AsyncCollection(self.db[name])
+
+    async def ensure_indexes(self):
+        """Create the indexes the queries rely on.
+
+        Each index is attempted on its own so one failure (e.g. duplicate
+        slugs in old data blocking the unique index) doesn't skip the rest.
+        Returns the names of the indexes that failed.
+        """
+        index_builders = [
+            # Keyset pagination walks (created_at, _id) in descending order
+            ("created_at_id_desc", lambda: self.posts.create_index(
+                [("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="created_at_id_desc"
+            )),
+            # Same walk restricted to one tag
+            ("tags_created_at_id_desc", lambda: self.posts.create_index(
+                [("tags", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="tags_created_at_id_desc"
+            )),
+            # Audit dashboards filter and sort on the precomputed SEO score
+            ("seo_score", lambda: self.posts.create_index("seo.seo_score", name="seo_score")),
+            # Newest updated_at for collection validators (ETags on listings)
+            ("updated_at_desc", lambda: self.posts.create_index(
+                [("updated_at", DESCENDING)], name="updated_at_desc"
+            )),
+            # Incremental refreshes of the feed and similarity indexes
+            ("indexed_at", lambda: self.posts.create_index("indexed_at", name="indexed_at")),
+            ("slug_unique", self._ensure_unique_slug_index),
+            # Weighted full-text index backing /api/posts/search
+            ("posts_text", lambda: self.posts.create_index(
+                [(field, TEXT) for field in search.TEXT_INDEX_WEIGHTS],
+                weights=search.TEXT_INDEX_WEIGHTS,
+                name="posts_text"
+            )),
+        ]
+        failed = []
+        for name, build in index_builders:
+            try:
+                await build()
+            except Exception as e:
+                failed.append(name)
+                logger.error("❌ Failed to create MongoDB index %s: %s", name, e)
+        return failed
+
+    async def _ensure_unique_slug_index(self):
+        """Slugs are unique; the index both enforces that and serves lookups"""
+        indexes = await self.posts.index_information()
+        # Replace the non-unique lookup index created by earlier versions
+        if "slug" in indexes and not indexes["slug"].get("unique"):
+            await self.posts.drop_index("slug")
+        await self.posts.create_index("slug", unique=True, name="slug_unique")
+
+    async def ping(self):
+        await run_mongo_op("ping", self.db.command, "ping")
+        return True
+
+    async def insert_post(self, document):
+        document["indexed_at"] = utcnow()
+        try:
+            await self.posts.insert_one(document)
+        except DuplicateKeyError:
+            raise DuplicateSlugError(duplicate_slug_message(document["slug"]))
+        return document
+
+    async def insert_many(self, documents):
+        if not documents:
+            return 0, []
+        now = utcnow()
+        for document in documents:
+            document["indexed_at"] = now
+        try:
+            result = await self.posts.insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            # Unordered: every row without an error was still written
+            errors = []
+            for write_error in e.details.get("writeErrors", []):
+                index = write_error["index"]
+                if write_error.get("code") == DUPLICATE_KEY_ERROR:
+                    errors.append((index, duplicate_slug_message(documents[index]["slug"])))
+                else:
+                    errors.append((index, write_error.get("errmsg", "Write failed")))
+            return e.details.get("nInserted", 0), errors
+
+    async def get_post(self, post_id):
+        if not ObjectId.is_valid(post_id):
+            return None
+        return await self.posts.find_one({"_id": ObjectId(post_id)})
+
+    async def get_post_by_slug(self, slug):
+        return await self.posts.find_one({"slug": slug})
+
+    async def get_posts(self, post_ids, fields=None):
+        projection = {field: 1 for field in fields} if fields else None
+        return await self.posts.find_list({"_id": {"$in": list(post_ids)}}, projection)
+
+    def list_posts(self, limit, after=None, tag=None, batch_size=50):
+        query = {}
+        if tag is not None:
+            query["tags"] = tag
+        if after is not None:
+            created_at, oid = after
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": oid}}
+            ]
+        return self.posts.iter_batches(
+            query,
+            POST_SUMMARY_PROJECTION,
+            sort=[("created_at", DESCENDING), ("_id", DESCENDING)],
+            batch_size=batch_size,
+            limit=limit
+        )
+
+    async def search(self, query, terms, offset, limit):
+        return await self.posts.find_list(
+            {"$text": {"$search": query}},
+            SEARCH_PROJECTION,
+            sort=[("score", {"$meta": "textScore"})],
+            skip=offset,
+            limit=limit
+        )
+
+    def iter_posts(self, batch_size=500, indexed_since=None, fields=None):
+        projection = {field: 1 for field in fields} if fields else None
+        if indexed_since is not None:
+            # Served by the indexed_at index
+            return self.posts.iter_batches(
+                {"indexed_at": {"$gte": indexed_since}}, projection,
+                sort=[("indexed_at", ASCENDING)], batch_size=batch_size
+            )
+        return self.posts.iter_batches(projection=projection, sort=[("_id", ASCENDING)], batch_size=batch_size)
+
+    async def collection_state(self):
+        # Collection metadata count plus one index-backed lookup
+        count, newest = await asyncio.gather(
+            self.posts.estimated_document_count(),
+            self.posts.find_list({}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", DESCENDING)], limit=1),
+        )
+        return count, newest[0].get("updated_at") if newest else None
+
+
+class MemoryPostStorage(PostStorage):
+    """In-process engine with secondary indexes.
+
+    - ``_by_id``: ``_id`` -> document (primary)
+    - ``_by_slug``: slug -> ``_id`` (unique)
+    - ``_by_created``: sorted ``(created_at, _id)`` keys, for keyset pages
+    - ``_by_tag``: tag -> sorted ``(created_at, _id)`` keys
+    - ``_text``: ``search.InvertedIndex`` over the searchable fields
+
+    Everything runs on the event loop without awaiting, so each operation
+    is atomic with respect to other requests.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_slug = {}
+        self._by_created = []
+        self._by_tag = {}
+        self._text = search.InvertedIndex()
+        self._newest_update = None
+
+    def __len__(self):
+        return len(self._by_id)
+
+    async def ping(self):
+        return True
+
+    @staticmethod
+    def _updated_at(document):
+        return document.get("updated_at") or document["created_at"]
+
+    def _insert(self, document):
+        slug = document["slug"]
+        if slug in self._by_slug:
+            raise DuplicateSlugError(duplicate_slug_message(slug))
+        document.setdefault("_id", ObjectId())
+        document.setdefault("created_at", utcnow())
+        document["indexed_at"] = utcnow()
+        oid = document["_id"]
+        key = (document["created_at"], oid)
+        # Everything that can fail (comparing timestamps, analyzing the
+        # text) runs before any index changes, so a rejected document
+        # leaves no trace
+        position = bisect.bisect(self._by_created, key)
+        tag_positions = {
+            tag: bisect.bisect(self._by_tag.get(tag, ()), key) for tag in set(document.get("tags") or ())
+        }
+        updated_at = self._updated_at(document)
+        newest = self._newest_update is None or updated_at > self._newest_update
+        self._text.add(oid, document)
+        self._by_id[oid] = document
+        self._by_slug[slug] = oid
+        self._by_created.insert(position, key)
+        for tag, tag_position in tag_positions.items():
+            self._by_tag.setdefault(tag, []).insert(tag_position, key)
+        if newest:
+            self._newest_update = updated_at
+        return document
+
+    async def insert_post(self, document):
+        return self._insert(document)
+
+    async def insert_many(self, documents):
+        inserted = 0
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                self._insert(document)
+                inserted += 1
+            except DuplicateSlugError as e:
+                errors.append((index, str(e)))
+            except (TypeError, ValueError) as e:
+                # A row the indexes can't order (Mongo reports these per row too)
+                errors.append((index, f"Write failed: {e}"))
+        return inserted, errors
+
+    async def get_post(self, post_id):
+        if not ObjectId.is_valid(post_id):
+            return None
+        return self._by_id.get(ObjectId(post_id))
+
+    async def get_post_by_slug(self, slug):
+        oid = self._by_slug.get(slug)
+        return self._by_id.get(oid) if oid is not None else None
+
+    async def get_posts(self, post_ids, fields=None):
+        documents = [self._by_id[oid] for oid in post_ids if oid in self._by_id]
+        return [self._project(document, fields) for document in documents] if fields else documents
+
+    def _project(self, document, fields, **extra):
+        projected = {"_id": document["_id"]}
+        for field in fields:
+            if field in document:
+                projected[field] = document[field]
+        projected.update(extra)
+        return projected
+
+    def _summary(self, document):
+        summary = self._project(document, SUMMARY_FIELDS)
+        summary["excerpt"] = document.get("excerpt")
+        if summary["excerpt"] is None:
+            summary["excerpt"] = (document.get("content") or "")[:EXCERPT_LENGTH]
+        return summary
+
+    async def list_posts(self, limit, after=None, tag=None, batch_size=50):
+        keys = self._by_created if tag is None else self._by_tag.get(tag, [])
+        # Newest first: walk the sorted keys backwards from the cursor
+        end = len(keys) if after is None else bisect.bisect_left(keys, after)
+        start = max(0, end - limit)
+        page = [self._summary(self._by_id[oid]) for _, oid in reversed(keys[start:end])]
+        for i in range(0, len(page), batch_size):
+            yield page[i:i + batch_size]
+
+    async def search(self, query, terms, offset, limit):
+        hits = self._text.search(terms, offset=offset, limit=limit)
+        return [self._project(self._by_id[oid], SEARCH_FIELDS, score=score) for oid, score in hits]
+
+    async def collection_state(self):
+        return len(self._by_id), self._newest_update
+
+    async def iter_posts(self, batch_size=500, indexed_since=None, fields=None):
+        # Snapshot ids so concurrent inserts don't break iteration
+        ids = list(self._by_id)
+        if indexed_since is not None:
+            ids = [oid for oid in ids if (self._by_id[oid].get("indexed_at") or datetime.min) >= indexed_since]
+        ids = iter(ids)
+        while True:
+            batch = [self._by_id[oid] for oid in itertools.islice(ids, batch_size) if oid in self._by_id]
+            if not batch:
+                break
+            yield [self._project(document, fields) for document in batch] if fields else batch
@@ -0,0 +1,46 @@
+import os
+
+# Never touch Atlas or the real API, whatever .env says; set before the
+# app is imported, since it reads its configuration at import time
+os.environ["MONGODB_URI"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["GENERATION_RATE_PER_MINUTE"] = "60000"
+os.environ["GENERATION_BURST"] = "1000"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from fakes import FakeGeminiModel
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """The fake model, installed as the app's Gemini model"""
+    fake = FakeGeminiModel()
+    monkeypatch.setattr(main, "gemini_model", fake)
+    monkeypatch.setattr(main, "gemini_configured", True)
+    return fake
+
+
+@pytest.fixture
+def client(model):
+    with TestClient(main.app) as client:
+        yield client
+
+
+def parse_sse(lines):
+    """``[(event, data)]`` from the lines of a Server-Sent Events body,
+    checking each frame is an ``event:`` line, a ``data:`` line and a blank line"""
+    events = []
+    lines = list(lines)
+    assert lines and lines[-1] == "", "stream must end with a complete frame"
+    for start in range(0, len(lines) - 1, 3):
+        event, data, blank = lines[start:start + 3]
+        assert event.startswith("event: ") and data.startswith("data: ") and blank == ""
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
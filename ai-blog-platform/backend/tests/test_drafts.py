@@ -0,0 +1,170 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from drafts import DraftNotFound, DraftStore, InvalidPatch, RevisionConflict, splice_utf16
+
+
+class FakeCollection:
+    """Enough of AsyncCollection for DraftStore. Every call yields to the
+    loop first, and ``hold(name)`` parks calls to one method until the
+    returned event is set."""
+
+    def __init__(self):
+        self.docs = {}
+        self._held = {}
+
+    def hold(self, name):
+        event = self._held[name] = asyncio.Event()
+        return event
+
+    async def _enter(self, name):
+        await asyncio.sleep(0)
+        if name in self._held:
+            await self._held[name].wait()
+
+    def _matches(self, doc, query):
+        for key, expected in query.items():
+            value = doc.get(key)
+            if isinstance(expected, dict):
+                if not value <= expected["$lte"]:
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    def _find(self, query):
+        doc = self.docs.get(query["_id"])
+        return doc if doc is not None and self._matches(doc, query) else None
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, doc):
+        await self._enter("insert_one")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query, projection=None):
+        # Read before parking, as a real read would be in flight
+        doc = copy.deepcopy(self._find(query))
+        await self._enter("find_one")
+        return doc
+
+    async def update_one(self, query, update):
+        await self._enter("update_one")
+        doc = self._find(query)
+        if doc is not None:
+            doc.update(copy.deepcopy(update["$set"]))
+        return SimpleNamespace(matched_count=int(doc is not None))
+
+    async def replace_one(self, query, replacement, upsert=False):
+        await self._enter("replace_one")
+        if upsert or self._find(query) is not None:
+            self.docs[query["_id"]] = copy.deepcopy(replacement)
+
+    async def delete_one(self, query):
+        await self._enter("delete_one")
+        return SimpleNamespace(deleted_count=int(self.docs.pop(query["_id"], None) is not None))
+
+
+def insert(start, text, delete=0):
+    return [{"op": "splice", "field": "content", "start": start, "delete": delete, "insert": text}]
+
+
+def test_splice_counts_utf16_code_units():
+    # The emoji is one code point but two UTF-16 units, as in JavaScript
+    assert splice_utf16("a😀b", 3, 0, "!") == "a😀!b"
+    assert splice_utf16("a😀b", 1, 2, "") == "ab"
+    assert splice_utf16("", 0, 0, "é") == "é"
+
+
+def test_splice_rejects_splitting_a_surrogate_pair():
+    with pytest.raises(InvalidPatch, match="surrogate"):
+        splice_utf16("a😀b", 2, 0, "x")
+    with pytest.raises(InvalidPatch, match="surrogate"):
+        splice_utf16("a😀b", 1, 1, "")
+    with pytest.raises(InvalidPatch, match="outside"):
+        splice_utf16("a😀b", 3, 2, "")
+
+
+def test_in_memory_patch_on_an_old_revision_conflicts():
+    async def scenario():
+        store = DraftStore()
+        draft = await store.create({"title": "Draft", "content": "Hello", "tags": []})
+        patched = await store.patch(draft["_id"], 1, insert(5, " world"))
+        assert (patched["revision"], patched["content"]) == (2, "Hello world")
+
+        with pytest.raises(RevisionConflict) as conflict:
+            await store.patch(draft["_id"], 1, insert(0, "Oh, "))
+        assert conflict.value.current == 2
+        assert (await store.get(draft["_id"]))["content"] == "Hello world"
+
+    asyncio.run(scenario())
+
+
+def test_write_through_workers_racing_on_a_revision_conflict():
+    async def scenario():
+        collection = FakeCollection()
+        first = DraftStore(collection, write_through=True)
+        second = DraftStore(collection, write_through=True)
+        draft = await first.create({"content": "Hello", "tags": []})
+
+        # Both read revision 1; only one conditional update can match it
+        results = await asyncio.gather(
+            first.patch(draft["_id"], 1, insert(5, "!")),
+            second.patch(draft["_id"], 1, insert(5, "?")),
+            return_exceptions=True,
+        )
+        conflicts = [result for result in results if isinstance(result, RevisionConflict)]
+        assert len(conflicts) == 1 and conflicts[0].current == 2
+        assert collection.docs[draft["_id"]]["revision"] == 2
+        assert collection.docs[draft["_id"]]["content"] in ("Hello!", "Hello?")
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_in_flight_does_not_bring_back_a_deleted_draft():
+    async def scenario():
+        collection = FakeCollection()
+        store = DraftStore(collection)
+        draft = await store.create({"content": "Hello", "tags": []})
+        await store.patch(draft["_id"], 1, insert(5, "!"))
+
+        release = collection.hold("replace_one")
+        flush = asyncio.create_task(store.flush())
+        await asyncio.sleep(0.01)
+        await store.delete(draft["_id"])
+        release.set()
+        await flush
+
+        assert draft["_id"] not in collection.docs
+        assert await store.flush() == 0
+        with pytest.raises(DraftNotFound):
+            await store.get(draft["_id"])
+
+    asyncio.run(scenario())
+
+
+def test_load_during_a_delete_does_not_bring_back_the_draft():
+    async def scenario():
+        collection = FakeCollection()
+        store = DraftStore(collection)
+        draft = await store.create({"content": "Hello", "tags": []})
+
+        # The delete drops the live copy, then waits on the collection; a
+        # read meanwhile loads the draft, which is still stored
+        release = collection.hold("delete_one")
+        delete = asyncio.create_task(store.delete(draft["_id"]))
+        await asyncio.sleep(0.01)
+        assert draft["_id"] in collection.docs
+        with pytest.raises(DraftNotFound):
+            await store.get(draft["_id"])
+        release.set()
+        await delete
+        assert draft["_id"] not in store._live
+        with pytest.raises(DraftNotFound):
+            await store.get(draft["_id"])
+
+    asyncio.run(scenario())
@@ -0,0 +1,143 @@
+import asyncio
+import copy
+from types import SimpleNamespace
+
+from generation_jobs import DONE, QUEUED, RUNNING, GenerationScheduler
+from timestamps import utcnow
+
+
+class FakeJobs:
+    """The job collection several schedulers (processes) share. Supports
+    the queries the scheduler makes; ``hold(name)`` parks calls to one
+    method until the returned event is set."""
+
+    def __init__(self):
+        self.docs = {}
+        self._held = {}
+
+    def hold(self, name):
+        event = self._held[name] = asyncio.Event()
+        return event
+
+    async def _enter(self, name):
+        await asyncio.sleep(0)
+        if name in self._held:
+            await self._held[name].wait()
+
+    def _matches(self, doc, query):
+        for key, expected in query.items():
+            if key == "$or":
+                if not any(self._matches(doc, clause) for clause in expected):
+                    return False
+            elif isinstance(expected, dict):
+                value = doc.get(key)
+                if value is None or not value < expected["$lt"]:
+                    return False
+            elif doc.get(key) != expected:
+                return False
+        return True
+
+    def _find(self, query):
+        return [doc for doc in self.docs.values() if self._matches(doc, query)]
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, doc):
+        await self._enter("insert_one")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query, projection=None):
+        await self._enter("find_one")
+        found = self._find(query)
+        return copy.deepcopy(found[0]) if found else None
+
+    async def find_list(self, query=None, projection=None, sort=None, skip=0, limit=0):
+        await self._enter("find_list")
+        return sorted((copy.deepcopy(doc) for doc in self._find(query or {})), key=lambda doc: doc["created_at"])
+
+    async def update_one(self, query, update):
+        await self._enter("update_one")
+        found = self._find(query)
+        for doc in found[:1]:
+            doc.update(copy.deepcopy(update["$set"]))
+        return SimpleNamespace(matched_count=len(found[:1]), modified_count=len(found[:1]))
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        await self._enter("find_one_and_update")
+        found = self._find(query)
+        if not found:
+            return None
+        doc = found[0]
+        doc.update(copy.deepcopy(update["$set"]))
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+        return copy.deepcopy(doc)
+
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_expired_lease_is_reclaimed_by_another_scheduler():
+    async def scenario():
+        jobs = FakeJobs()
+        stuck = asyncio.Event()
+
+        async def hang(job):
+            await stuck.wait()
+
+        async def generate(job):
+            return f"Post about {job['prompt']}", "miss"
+
+        first = GenerationScheduler(hang, collection=jobs, lease_seconds=0.3)
+        second = GenerationScheduler(generate, collection=jobs, lease_seconds=0.3)
+        job = await first.submit("leases")
+        await wait_until(lambda: jobs.docs[job["_id"]]["status"] == RUNNING)
+        await second.start()
+
+        # Renewed while its process lives, so nobody else takes it
+        await asyncio.sleep(0.6)
+        assert jobs.docs[job["_id"]]["worker_id"] == first.worker_id
+
+        # The first process dies mid-job; its lease runs out
+        await first.stop()
+        await wait_until(lambda: jobs.docs[job["_id"]]["status"] == DONE)
+        doc = jobs.docs[job["_id"]]
+        assert doc["worker_id"] == second.worker_id
+        assert doc["attempts"] == 2
+        assert doc["content"] == "Post about leases"
+        await second.stop()
+
+    asyncio.run(scenario())
+
+
+def test_lost_claim_gives_its_token_back():
+    async def scenario():
+        jobs = FakeJobs()
+        now = utcnow()
+        jobs.docs["j1"] = {
+            "_id": "j1", "prompt": "tokens", "priority": "normal", "bypass_cache": False,
+            "status": QUEUED, "attempts": 0, "created_at": now,
+        }
+
+        async def generate(job):
+            raise AssertionError("the job was claimed elsewhere")
+
+        # One token, and next to no refill
+        scheduler = GenerationScheduler(generate, collection=jobs, rate_per_minute=0.001, burst=1)
+        release = jobs.hold("find_one_and_update")
+        await scheduler.start()
+        await wait_until(lambda: scheduler.bucket.tokens < 1)
+
+        # Another process claims the job while this one's claim is in flight
+        jobs.docs["j1"].update(status=RUNNING, worker_id="elsewhere")
+        release.set()
+        await wait_until(lambda: "j1" not in scheduler._jobs)
+        assert scheduler.bucket.available() >= 0.99
+        await scheduler.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+import longform
+from conftest import parse_sse
+
+
+def longform_events(client, prompt, sections=3, bypass_cache=True):
+    body = {"prompt": prompt, "sections": sections, "section_words": 100, "bypass_cache": bypass_cache}
+    with client.stream("POST", "/api/generate-content/longform", json=body) as response:
+        assert response.status_code == 200
+        return parse_sse(response.iter_lines())
+
+
+def test_parse_outline_needs_two_headings():
+    assert longform.parse_outline("TITLE: Post\n1. One\n2. Two") == ("Post", ["One", "Two"])
+    with pytest.raises(longform.OutlineError):
+        longform.parse_outline("TITLE: Post\n1. Only one\n   - a sub-point")
+
+
+def test_unusable_outline_is_retried_then_reported(client, model):
+    model.outline = "TITLE: Post\n1. Only one"
+
+    events = longform_events(client, "longform bad outline")
+
+    assert [name for name, _ in events] == ["error"]
+    assert "usable sections" in events[0][1]["detail"]
+    assert model.calls == 2
+
+
+def test_sections_are_stitched_in_outline_order(client, model):
+    # Later sections finish first
+    model.section_seconds = {1: 0.3, 2: 0.15, 3: 0.0}
+
+    events = longform_events(client, "longform order")
+
+    names = [name for name, _ in events]
+    assert names == ["outline", "section", "section", "section", "done"]
+    headings = events[0][1]["sections"]
+    assert [data["index"] for name, data in events if name == "section"] == [2, 1, 0]
+
+    done = events[-1][1]
+    title, sections = longform.split_post(done["content"])
+    assert title == done["title"] == "A Long Post"
+    assert [heading for heading, _ in sections] == headings
+    for number, (_, text) in enumerate(sections, 1):
+        # The echoed heading is dropped and the nested one demoted
+        assert text.startswith(f"Section {number} ")
+        assert "### Nested" in text and "## " not in text.replace("### ", "")
+
+
+def test_failed_section_ends_the_stream_with_an_error(client, model):
+    model.fail_sections = {2}
+    model.section_seconds = {1: 0.0, 3: 0.5}
+
+    events = longform_events(client, "longform failure", bypass_cache=False)
+
+    names = [name for name, _ in events]
+    assert names[0] == "outline" and names[-1] == "error" and "done" not in names
+    assert "Section 2 failed" in events[-1][1]["detail"]
+    assert all(data["index"] != 1 for name, data in events if name == "section")
+
+    # Nothing half-written was cached: the next request generates afresh
+    model.fail_sections = set()
+    calls = model.calls
+    events = longform_events(client, "longform failure", bypass_cache=False)
+    assert events[-1][0] == "done" and events[-1][1]["cached"] is False
+    assert model.calls > calls
+
+
+def test_default_post_takes_about_one_section(client, model):
+    # Under the default limits all six sections run at once: two waves
+    # would take at least 0.8s
+    model.section_seconds = {number: 0.4 for number in range(1, longform.DEFAULT_SECTIONS + 1)}
+    body = {"prompt": "longform wall clock", "bypass_cache": True}
+
+    started = time.perf_counter()
+    with client.stream("POST", "/api/generate-content/longform", json=body) as response:
+        events = parse_sse(response.iter_lines())
+    elapsed = time.perf_counter() - started
+
+    assert events[-1][0] == "done" and events[-1][1]["sections"] == longform.DEFAULT_SECTIONS
+    assert elapsed < 0.75, elapsed
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+
+from post_cache import SHARED_NAMESPACE, PostCache
+from shared_cache import SharedCache, SharedStore
+
+
+class FlakyStore(SharedStore):
+    """The server's store, called in-process, that can be taken down"""
+
+    down = False
+
+
+def shared_cache(store):
+    shared = SharedCache("unused", b"key", retry_seconds=60)
+
+    def invoke(method, args, kwargs):
+        if store.down:
+            raise OSError("cache server down")
+        return getattr(store, method)(*args, **kwargs)
+
+    shared._invoke = invoke
+    return shared
+
+
+def recover(store, shared):
+    store.down = False
+    shared._down_until = 0.0
+
+
+def post(title):
+    return {"id": "p1", "slug": "hello", "title": title, "created_at": datetime(2024, 1, 1)}
+
+
+def test_outage_reads_only_entries_cached_during_it():
+    async def scenario():
+        store = FlakyStore()
+        shared = shared_cache(store)
+        cache = PostCache(shared=shared)
+
+        # A first outage fills the local tier
+        store.down = True
+        assert await cache.get(post_id="p1") is None
+        await cache.put(post("old"), version=await cache.version())
+        assert (await cache.get(post_id="p1")).post["title"] == "old"
+
+        # Back up; another worker edits the post
+        recover(store, shared)
+        store.invalidate(SHARED_NAMESPACE, ["id:p1", "slug:hello"])
+        assert await cache.get(post_id="p1") is None
+
+        # The store fails again mid-read: the old local entry predates it
+        store.down = True
+        assert await cache.get(post_id="p1") is None
+        await cache.put(post("new"), version=await cache.version())
+        assert (await cache.get(post_id="p1")).post["title"] == "new"
+
+    asyncio.run(scenario())
+
+
+def test_failed_invalidation_is_sent_again_on_recovery():
+    async def scenario():
+        store = FlakyStore()
+        shared = shared_cache(store)
+        cache = PostCache(shared=shared)
+        await cache.put(post("old"), version=await cache.version())
+        assert (await cache.get(slug="hello")).post["title"] == "old"
+
+        # The write's invalidation never reaches the store
+        store.down = True
+        await cache.invalidate(post_id="p1", slug="hello")
+        assert (await cache.stats())["pending_invalidations"] == 2
+        # Nor does one made while the store is known to be down
+        await cache.invalidate(post_id="p2")
+        assert (await cache.stats())["pending_invalidations"] == 3
+
+        recover(store, shared)
+        assert await cache.get(slug="hello") is None
+        assert await cache.get(post_id="p1") is None
+        assert (await cache.stats())["pending_invalidations"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import render
+
+
+def test_render_cache_is_safe_across_worker_threads():
+    # A small cache so threads constantly evict entries others just read
+    cache = render.RenderCache(max_entries=4)
+
+    def work(offset):
+        for n in range(200):
+            assert cache.render(f"# Post {(offset + n) % 9}\n\nBody")["content_html"]
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, range(8)))
+
+    assert cache.hits + cache.misses == 8 * 200
+    assert len(cache._entries) == 4
@@ -0,0 +1,18 @@
+import render
+
+
+def test_snippets_come_from_stored_plain_text(client, monkeypatch):
+    body = "Intro. " * 30 + "Some **bold** talk about [gardening](http://example.com) in `spring`."
+    created = client.post("/api/posts", json={"title": "Snippets", "content": body, "slug": "snippets"}).json()
+    assert "content_text" not in created
+
+    # Search must not render markdown again for posts that have their text stored
+    def no_rendering(content):
+        raise AssertionError("rendered at search time")
+    monkeypatch.setattr(render, "plain_text", no_rendering)
+
+    results = client.get("/api/posts/search", params={"q": "gardening"}).json()["results"]
+    result = next(result for result in results if result["slug"] == "snippets")
+    assert "<mark>gardening</mark> in spring" in result["snippet"]
+    assert "**" not in result["snippet"] and "](" not in result["snippet"]
+    assert "content" not in result and "content_text" not in result
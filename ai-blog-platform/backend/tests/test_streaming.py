@@ -0,0 +1,58 @@
+import time
+
+import httpx
+
+import main
+from conftest import parse_sse
+from fakes import loopback_server
+
+
+def stream_events(client, prompt, bypass_cache=True):
+    body = {"prompt": prompt, "bypass_cache": bypass_cache}
+    with client.stream("POST", "/api/generate-content/stream", json=body) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return parse_sse(response.iter_lines())
+
+
+def test_stream_sends_chunks_then_one_done_event(client, model):
+    model.post_words = 100
+    events = stream_events(client, "streaming framing")
+
+    *chunks, (event, done) = events
+    assert event == "done"
+    assert chunks and all(name == "chunk" for name, _ in chunks)
+    assert "".join(data["text"] for _, data in chunks) == "# A Long Post\n\n" + " ".join(["word"] * 100)
+    assert done["chunks"] == len(chunks) == model.chunks_sent
+    assert done["cached"] is False
+
+
+def test_stream_replays_a_cached_result_as_one_chunk(client, model):
+    first = stream_events(client, "streaming cache")
+    calls = model.calls
+
+    events = stream_events(client, "streaming cache", bypass_cache=False)
+
+    assert [name for name, _ in events] == ["chunk", "done"]
+    assert events[0][1]["text"] == "".join(data["text"] for name, data in first if name == "chunk")
+    assert events[1][1]["cached"] is True
+    assert model.calls == calls
+
+
+def test_client_disconnect_stops_generation(model):
+    # Ten seconds of output; the in-process transport would buffer the
+    # whole stream, so this goes over a real socket
+    model.words_per_second = 200
+    model.post_words = 2000
+    with loopback_server(main.app) as base_url:
+        with httpx.Client(base_url=base_url, timeout=10) as http:
+            body = {"prompt": "streaming disconnect", "bypass_cache": True}
+            with http.stream("POST", "/api/generate-content/stream", json=body) as response:
+                assert next(response.iter_lines()) == "event: chunk"
+        # Let the chunk being written when the client left finish
+        time.sleep(0.5)
+        sent = model.chunks_sent
+        time.sleep(0.5)
+
+    assert model.chunks_sent == sent
+    assert sent < 20, sent
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+import serialization
+import timestamps
+
+
+def test_naive_and_aware_times_serialize_with_an_offset():
+    stored = datetime(2024, 5, 1, 12, 30)
+    aware = datetime(2024, 5, 1, 14, 30, tzinfo=timezone.utc).astimezone()
+
+    assert timestamps.isoformat(stored) == "2024-05-01T12:30:00+00:00"
+    assert timestamps.isoformat(timestamps.naive_utc(aware)) == "2024-05-01T14:30:00+00:00"
+    assert serialization.dumps({"at": stored}) == b'{"at":"2024-05-01T12:30:00+00:00"}'
+
+
+def test_api_times_carry_their_offset(client):
+    created = client.post("/api/posts", json={"title": "Offsets", "content": "Body", "slug": "offsets"}).json()
+    listed = next(post for post in client.get("/api/posts").json()["posts"] if post["slug"] == "offsets")
+    fetched = client.get("/api/posts/by-slug/offsets").json()
+
+    for post in (created, listed, fetched):
+        assert post["created_at"].endswith("+00:00")
+        assert datetime.fromisoformat(post["created_at"]) == datetime.fromisoformat(created["created_at"])
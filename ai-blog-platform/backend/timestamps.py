@@ -0,0 +1,40 @@
+"""Stored timestamps: naive datetimes in UTC.
+
+pymongo stores naive datetimes as UTC and reads them back naive, so every
+timestamp the backend writes (posts, drafts, jobs, cache records) is
+naive UTC, taken from ``utcnow``. Aware values from clients are converted
+with ``naive_utc`` before they are stored, so stored values always compare
+with each other. ``as_utc`` turns a stored value back into an aware one
+for HTTP dates, sitemaps and feeds, and ``isoformat`` writes it for
+clients with an explicit ``+00:00``: an ISO string without an offset is
+read as local time by browsers (``new Date(...)``).
+"""
+from datetime import datetime, timezone
+
+
+def utcnow():
+    """Current time as naive UTC, truncated to the milliseconds MongoDB
+    keeps, so a response built from a new document matches later reads"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def naive_utc(value):
+    """A datetime as stored: aware values converted to UTC, naive ones kept"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def as_utc(value):
+    """A stored (or ISO string) timestamp as an aware UTC datetime"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def isoformat(value):
+    """A stored timestamp as an ISO string with its UTC offset"""
+    return as_utc(value).isoformat()
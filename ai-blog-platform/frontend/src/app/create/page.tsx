@@ -1,11 +1,27 @@
 'use client'
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef, useCallback } from 'react'
 import { useRouter } from 'next/navigation'
 import MarkdownEditor from '@/components/MarkdownEditor'
 import AIAssistant from '@/components/AIAssistant'
 import SEOAnalysis from '@/components/SEOAnalysis'
 import Link from 'next/link'
-import { blogAPI } from '@/lib/api'
+import { blogAPI, DraftConflictError, DraftFields, DraftOperation, textSplice } from '@/lib/api'
+
+const AUTOSAVE_DELAY_MS = 2000
+const DRAFT_STORAGE_KEY = 'blog-draft-id'
+
+// Operations turning the last saved fields into the current ones
+function draftOps(saved: DraftFields, current: DraftFields): DraftOperation[] {
+  const ops: DraftOperation[] = []
+  for (const field of ['title', 'content', 'author', 'slug', 'seo_title', 'seo_description'] as const) {
+    const op = textSplice(field, saved[field] || '', current[field])
+    if (op) ops.push(op)
+  }
+  if ((saved.tags || []).join('\n') !== current.tags.join('\n')) {
+    ops.push({ op: 'set', field: 'tags', value: current.tags })
+  }
+  return ops
+}
 
 export default function CreatePostPage() {
   const router = useRouter()
@@ -22,6 +38,95 @@ export default function CreatePostPage() {
   const [isSaving, setIsSaving] = useState(false)
   const [saveError, setSaveError] = useState<string | null>(null)
   const [saveSuccess, setSaveSuccess] = useState(false)
+  const [autosaveStatus, setAutosaveStatus] = useState<'idle' | 'saving' | 'saved' | 'error'>('idle')
+
+  // Autosave state: the server's revision and the fields it has, so each
+  // save only sends what changed since
+  const draftId = useRef<string | null>(null)
+  const draftRevision = useRef(0)
+  const savedFields = useRef<DraftFields | null>(null)
+  const autosaving = useRef<Promise<void> | null>(null)
+  const autosaveTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+  // Set once the post is published; no save may recreate its draft after that
+  const published = useRef(false)
+
+  const currentFields = useCallback((): DraftFields => ({
+    title,
+    content,
+    author,
+    slug,
+    tags: tags.split(',').map(tag => tag.trim()).filter(tag => tag),
+    seo_title: title,
+    seo_description: metaDescription,
+  }), [title, content, author, slug, tags, metaDescription])
+
+  const autosave = useCallback(async () => {
+    const fields = currentFields()
+    const run = async () => {
+      if (published.current) return
+      try {
+        if (!draftId.current || !savedFields.current) {
+          if (!fields.title && !fields.content) return
+          setAutosaveStatus('saving')
+          const draft = await blogAPI.createDraft(fields)
+          draftId.current = draft.id
+          draftRevision.current = draft.revision
+          localStorage.setItem(DRAFT_STORAGE_KEY, draft.id)
+        } else {
+          let ops = draftOps(savedFields.current, fields)
+          if (ops.length === 0) return
+          setAutosaveStatus('saving')
+          try {
+            const result = await blogAPI.patchDraft(draftId.current, draftRevision.current, ops)
+            draftRevision.current = result.revision
+          } catch (error) {
+            if (!(error instanceof DraftConflictError)) throw error
+            // Changed elsewhere: rebase onto the server copy; this editor wins
+            const server = await blogAPI.getDraft(draftId.current)
+            ops = draftOps(server, fields)
+            const result = await blogAPI.patchDraft(draftId.current, server.revision, ops)
+            draftRevision.current = result.revision
+          }
+        }
+        savedFields.current = fields
+        setAutosaveStatus('saved')
+      } catch (error) {
+        console.error('Autosave failed:', error)
+        setAutosaveStatus('error')
+      }
+    }
+    // One save at a time; each diffs against what the previous one stored
+    const next = (autosaving.current ?? Promise.resolve()).then(run)
+    autosaving.current = next
+    await next
+    if (autosaving.current === next) autosaving.current = null
+  }, [currentFields])
+
+  // Resume the draft left open in this browser
+  useEffect(() => {
+    const storedId = localStorage.getItem(DRAFT_STORAGE_KEY)
+    if (!storedId) return
+    blogAPI.getDraft(storedId)
+      .then((draft) => {
+        draftId.current = draft.id
+        draftRevision.current = draft.revision
+        savedFields.current = draft
+        setTitle(draft.title || '')
+        setContent(draft.content || '')
+        setAuthor(draft.author || '')
+        setSlug(draft.slug || '')
+        setTags((draft.tags || []).join(', '))
+        setMetaDescription(draft.seo_description || '')
+      })
+      .catch(() => localStorage.removeItem(DRAFT_STORAGE_KEY))
+  }, [])
+
+  // Autosave a moment after the last edit
+  useEffect(() => {
+    const timer = setTimeout(autosave, AUTOSAVE_DELAY_MS)
+    autosaveTimer.current = timer
+    return () => clearTimeout(timer)
+  }, [autosave])
 
   // Auto-generate slug from title
   useEffect(() => {
@@ -54,6 +159,11 @@ export default function CreatePostPage() {
   }
 
   const handleSave = async (publish: boolean = true) => {
+    if (!publish) {
+      await autosave()
+      return
+    }
+
     if (!title.trim()) {
       setSaveError('Title is required')
       return
@@ -83,6 +193,18 @@ export default function CreatePostPage() {
       
       await blogAPI.createPost(postData)
       
+      // Published: the draft has served its purpose. Stop autosaving and
+      // let a save already in flight finish, or it would recreate the draft
+      published.current = true
+      if (autosaveTimer.current) clearTimeout(autosaveTimer.current)
+      if (autosaving.current) await autosaving.current
+      if (draftId.current) {
+        blogAPI.deleteDraft(draftId.current).catch(() => {})
+        draftId.current = null
+        savedFields.current = null
+      }
+      localStorage.removeItem(DRAFT_STORAGE_KEY)
+      
       setSaveSuccess(true)
       
       // Redirect to home after 2 seconds
@@ -125,6 +247,11 @@ export default function CreatePostPage() {
             </Link>
             <h1 className="text-3xl font-bold text-gray-900">Create New Post</h1>
             <p className="text-gray-700 mt-2">Write your blog post with AI assistance and SEO optimization</p>
+            <p className="text-sm text-gray-500 mt-1">
+              {autosaveStatus === 'saving' && 'Saving draft...'}
+              {autosaveStatus === 'saved' && '✓ Draft saved'}
+              {autosaveStatus === 'error' && '⚠️ Draft not saved'}
+            </p>
           </div>
           
           <div className="flex gap-3">
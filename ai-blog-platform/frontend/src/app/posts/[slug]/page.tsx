@@ -0,0 +1,63 @@
+import type { Metadata } from 'next'
+import Link from 'next/link'
+import { notFound } from 'next/navigation'
+import ReactMarkdown from 'react-markdown'
+import remarkGfm from 'remark-gfm'
+import { blogAPI } from '@/lib/api'
+
+// This is a Server Component: crawlers and feed readers following the
+// sitemap and feed links get the whole post, or a real 404
+interface PostPageProps {
+  params: Promise<{ slug: string }>
+}
+
+export async function generateMetadata({ params }: PostPageProps): Promise<Metadata> {
+  const { slug } = await params
+  const post = await blogAPI.getPostBySlug(slug)
+  if (!post) return {}
+  return {
+    title: post.seo_title || post.title,
+    description: post.seo_description || post.excerpt,
+  }
+}
+
+export default async function PostPage({ params }: PostPageProps) {
+  const { slug } = await params
+  const post = await blogAPI.getPostBySlug(slug)
+  if (!post) notFound()
+
+  return (
+    <div className="min-h-screen bg-gray-50 py-8">
+      <article className="container mx-auto px-4 max-w-3xl">
+        <Link href="/posts" className="text-blue-600 hover:text-blue-800 inline-flex items-center mb-6">
+          ← All Posts
+        </Link>
+
+        <header className="mb-8">
+          <h1 className="text-4xl font-bold text-gray-900 mb-3">{post.title}</h1>
+          <div className="flex flex-wrap items-center gap-3 text-sm text-gray-600">
+            <span>
+              By <strong>{post.author}</strong>
+            </span>
+            <time dateTime={post.created_at}>
+              {new Date(post.created_at).toLocaleDateString()}
+            </time>
+            {post.tags.map((tag: string) => (
+              <span key={tag} className="bg-blue-100 text-blue-800 text-xs px-2 py-1 rounded">
+                {tag}
+              </span>
+            ))}
+          </div>
+        </header>
+
+        <div className="bg-white rounded-lg shadow-md border border-gray-200 p-8">
+          <div className="prose max-w-none prose-headings:text-gray-900 prose-p:text-gray-800 prose-strong:text-gray-900 prose-li:text-gray-800 prose-code:text-gray-900 prose-a:text-blue-600">
+            <ReactMarkdown remarkPlugins={[remarkGfm]}>
+              {post.content}
+            </ReactMarkdown>
+          </div>
+        </div>
+      </article>
+    </div>
+  )
+}
@@ -6,7 +6,7 @@ import { blogAPI } from '@/lib/api'
 interface BlogPost {
   id: string
   title: string
-  content: string
+  excerpt: string
   author: string
   slug: string
   tags: string[]
@@ -18,6 +18,8 @@ export default function PostsPage() {
   const [posts, setPosts] = useState<BlogPost[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     loadPosts()
@@ -27,7 +29,8 @@ export default function PostsPage() {
     try {
       setLoading(true)
       const postsData = await blogAPI.getPosts()
-      setPosts(postsData)
+      setPosts(postsData.posts)
+      setNextCursor(postsData.next_cursor)
     } catch (err: any) {
       setError(err.message)
     } finally {
@@ -35,6 +38,20 @@ export default function PostsPage() {
     }
   }
 
+  const loadMorePosts = async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      const postsData = await blogAPI.getPosts(nextCursor)
+      setPosts(prev => [...prev, ...postsData.posts])
+      setNextCursor(postsData.next_cursor)
+    } catch (err: any) {
+      setError(err.message)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   return (
     <div className="min-h-screen bg-gray-50 py-8">
       <div className="container mx-auto px-4 max-w-4xl">
@@ -84,14 +101,18 @@ export default function PostsPage() {
           {posts.map((post) => (
             <div key={post.id} className="bg-white rounded-lg shadow-md border border-gray-200 p-6">
               <div className="flex justify-between items-start mb-3">
-                <h2 className="text-xl font-bold text-gray-900">{post.title}</h2>
+                <h2 className="text-xl font-bold text-gray-900">
+                  <Link href={`/posts/${post.slug}`} className="hover:text-blue-600">
+                    {post.title}
+                  </Link>
+                </h2>
                 <span className="text-sm text-gray-500 bg-gray-100 px-2 py-1 rounded">
                   {new Date(post.created_at).toLocaleDateString()}
                 </span>
               </div>
               
               <p className="text-gray-600 mb-3 line-clamp-3">
-                {post.content.substring(0, 200)}...
+                {post.excerpt}...
               </p>
               
               <div className="flex justify-between items-center">
@@ -119,7 +140,16 @@ export default function PostsPage() {
           ))}
         </div>
 
-        <div className="mt-8 text-center">
+        <div className="mt-8 text-center space-x-3">
+          {nextCursor && (
+            <button
+              onClick={loadMorePosts}
+              disabled={loadingMore}
+              className="bg-blue-600 text-white px-6 py-2 rounded-lg hover:bg-blue-700 disabled:opacity-50 transition"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          )}
           <button
             onClick={loadPosts}
             className="bg-gray-600 text-white px-6 py-2 rounded-lg hover:bg-gray-700 transition"
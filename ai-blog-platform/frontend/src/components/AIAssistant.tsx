@@ -1,6 +1,6 @@
 'use client'
 import { useState } from 'react'
-import { blogAPI } from '@/lib/api'
+import { blogAPI, NearDuplicate } from '@/lib/api'
 
 interface AIAssistantProps {
   onContentGenerated: (content: string) => void
@@ -19,7 +19,9 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
   const [prompt, setPrompt] = useState('')
   const [isGenerating, setIsGenerating] = useState(false)
   const [error, setError] = useState<string | null>(null)
-  const [progress, setProgress] = useState(0)
+  const [wordCount, setWordCount] = useState(0)
+  const [nearDuplicates, setNearDuplicates] = useState<NearDuplicate[]>([])
+  const [longForm, setLongForm] = useState(false)
 
   const generateContent = async (customPrompt?: string) => {
     const finalPrompt = customPrompt || prompt
@@ -31,36 +33,54 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
     
     setIsGenerating(true)
     setError(null)
-    setProgress(0)
-    
-    // Simulate progress for better UX
-    const progressInterval = setInterval(() => {
-      setProgress(prev => {
-        if (prev >= 90) return 90 // Cap at 90% until complete
-        return prev + 10
-      })
-    }, 1000)
+    setWordCount(0)
+    setNearDuplicates([])
     
     try {
       console.log('🔄 Generating content with prompt:', finalPrompt)
-      const response = await blogAPI.generateContent(finalPrompt)
-      
-      clearInterval(progressInterval)
-      setProgress(100)
+      let content: string
+      if (longForm) {
+        let title = ''
+        let headings: string[] = []
+        const sections: string[] = []
+        content = await blogAPI.generateLongFormStream(finalPrompt, {
+          onOutline: (outline) => {
+            title = outline.title
+            headings = outline.sections
+          },
+          onSection: (section) => {
+            // Sections finish in any order; show the finished ones in outline order
+            sections[section.index] = section.text
+            const preview = [`# ${title}`, ...headings
+              .map((heading, i) => sections[i] === undefined ? null : `## ${heading}\n\n${sections[i]}`)
+              .filter(Boolean)].join('\n\n')
+            onContentGenerated(preview)
+            setWordCount(preview.split(/\s+/).filter(Boolean).length)
+          },
+          onNearDuplicates: setNearDuplicates,
+        })
+      } else {
+        let streamed = ''
+        content = await blogAPI.generateContentStream(finalPrompt, (chunk) => {
+          // Show the post as it is being written
+          streamed += chunk
+          onContentGenerated(streamed)
+          setWordCount(streamed.split(/\s+/).filter(Boolean).length)
+        }, setNearDuplicates)
+      }
       
-      if (response.content) {
-        onContentGenerated(response.content)
+      if (content) {
+        onContentGenerated(content)
         setPrompt('')
         setError(null)
         
         // Reset progress after success
-        setTimeout(() => setProgress(0), 1000)
+        setTimeout(() => setWordCount(0), 1000)
       } else {
         throw new Error('No content received from AI service')
       }
     } catch (error: any) {
-      clearInterval(progressInterval)
-      setProgress(0)
+      setWordCount(0)
       console.error('AI Generation Error:', error)
       
       let errorMessage = error.message || 'Failed to generate content'
@@ -97,6 +117,21 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
       </div>
 
       {/* Error Message */}
+      {nearDuplicates.length > 0 && (
+        <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-4 mb-6">
+          <p className="text-yellow-800 font-medium">
+            ⚠️ This draft is very similar to existing posts:
+          </p>
+          <ul className="text-yellow-700 text-sm mt-1 list-disc list-inside">
+            {nearDuplicates.map((post) => (
+              <li key={post.id}>
+                {post.title} ({Math.round(post.similarity * 100)}% similar)
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       {error && (
         <div className="bg-red-50 border border-red-200 rounded-lg p-4 mb-6">
           <div className="flex items-start">
@@ -117,16 +152,13 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
           <div className="bg-blue-50 p-4 rounded-lg border border-blue-200">
             <div className="flex justify-between text-sm text-gray-700 mb-2">
               <span className="font-medium">Generating content...</span>
-              <span className="font-semibold">{progress}%</span>
+              <span className="font-semibold">{wordCount} words</span>
             </div>
-            <div className="w-full bg-blue-100 rounded-full h-2.5">
-              <div 
-                className="bg-blue-600 h-2.5 rounded-full transition-all duration-300"
-                style={{ width: `${progress}%` }}
-              ></div>
+            <div className="w-full bg-blue-100 rounded-full h-2.5 overflow-hidden">
+              <div className="bg-blue-600 h-2.5 rounded-full w-1/3 animate-pulse"></div>
             </div>
             <p className="text-xs text-gray-600 mt-2">
-              AI generation can take 10-30 seconds for complex topics...
+              Content appears in the editor as it is written...
             </p>
           </div>
         )}
@@ -191,6 +223,15 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
               )}
             </button>
           </div>
+          <label className="flex items-center gap-2 text-sm text-gray-700 mt-3">
+            <input
+              type="checkbox"
+              checked={longForm}
+              onChange={(e) => setLongForm(e.target.checked)}
+              disabled={isGenerating || disabled}
+            />
+            Long-form post (outline first, then sections written in parallel)
+          </label>
           <p className="text-sm text-gray-600 mt-2">
             <strong>Tip:</strong> Keep prompts clear and specific. Complex topics may take longer to generate.
           </p>
@@ -204,7 +245,7 @@ export default function AIAssistant({ onContentGenerated, disabled = false }: AI
               <h4 className="font-semibold text-blue-800 mb-2">Generation Tips</h4>
               <ul className="text-sm text-blue-700 space-y-1">
                 <li>• <strong>Simple, clear prompts</strong> work best and generate faster</li>
-                <li>• Generation typically takes <strong>10-30 seconds</strong></li>
+                <li>• Content <strong>streams into the editor</strong> as it is generated</li>
                 <li>• Complex topics may take longer to process</li>
                 <li>• If timeout occurs, try a simpler version of your prompt</li>
               </ul>
@@ -2,6 +2,141 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000';
 
+export interface BatchGenerationResult {
+  index: number;
+  prompt: string;
+  status: 'ok' | 'error';
+  content?: string;
+  cache?: string;
+  error?: string;
+}
+
+export interface BatchGenerationSummary {
+  done: true;
+  total: number;
+  succeeded: number;
+  failed: number;
+  elapsed_ms: number;
+}
+
+export interface NearDuplicate {
+  id: string;
+  slug: string;
+  title: string;
+  similarity: number;
+}
+
+export interface LongFormOutline {
+  title: string;
+  sections: string[];
+}
+
+export interface LongFormSection {
+  index: number;
+  heading: string;
+  text: string;
+}
+
+export interface CountEntry {
+  key: string;
+  count: number;
+}
+
+export interface DraftFields {
+  title: string;
+  content: string;
+  author: string;
+  slug: string;
+  tags: string[];
+  seo_title: string;
+  seo_description: string;
+}
+
+export interface Draft extends DraftFields {
+  id: string;
+  revision: number;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface DraftOperation {
+  op: 'splice' | 'set';
+  field: keyof DraftFields;
+  start?: number;
+  delete?: number;
+  insert?: string;
+  value?: string | string[];
+}
+
+// The draft changed on the server since baseRevision (another tab, a
+// retried request); re-read it and rebase the local edits
+export class DraftConflictError extends Error {
+  constructor(public revision: number) {
+    super(`Draft is at revision ${revision}`);
+  }
+}
+
+// Single splice turning `before` into `after`, found by trimming the common
+// prefix and suffix. Typing, pasting and deleting are all one contiguous
+// edit, so an autosave sends only the changed text. Offsets are JS string
+// indices (UTF-16 code units), which is what the backend expects.
+export function textSplice(
+  field: keyof DraftFields,
+  before: string,
+  after: string
+): DraftOperation | null {
+  if (before === after) return null;
+  let start = 0;
+  const maxPrefix = Math.min(before.length, after.length);
+  while (start < maxPrefix && before.charCodeAt(start) === after.charCodeAt(start)) start++;
+  let end = 0;
+  const maxSuffix = Math.min(before.length, after.length) - start;
+  while (
+    end < maxSuffix &&
+    before.charCodeAt(before.length - 1 - end) === after.charCodeAt(after.length - 1 - end)
+  ) end++;
+  // Never split a surrogate pair
+  if (start > 0 && /[\uD800-\uDBFF]/.test(before[start - 1])) start--;
+  if (end > 0 && /[\uDC00-\uDFFF]/.test(before[before.length - end])) end--;
+  return {
+    op: 'splice',
+    field,
+    start,
+    delete: before.length - start - end,
+    insert: after.slice(start, after.length - end),
+  };
+}
+
+// Parse a Server-Sent Events body into {event, data} frames; frames are
+// separated by a blank line and data is JSON
+async function* serverSentEvents(
+  body: ReadableStream<Uint8Array>
+): AsyncGenerator<{ event: string; data: any }> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      yield { event, data: data ? JSON.parse(data) : {} };
+    }
+  }
+}
+
 // Create axios instance with proper configuration
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -77,6 +212,157 @@ export const blogAPI = {
     }
   },
 
+  // Stream AI content as Server-Sent Events. onChunk receives each partial
+  // piece of text as it arrives; resolves with the full content when done.
+  // onNearDuplicates receives existing posts the content closely matches.
+  generateContentStream: async (
+    prompt: string,
+    onChunk: (text: string) => void,
+    onNearDuplicates?: (posts: NearDuplicate[]) => void
+  ) => {
+    console.log('🤖 Starting streamed AI content generation...');
+    let response: Response;
+    try {
+      response = await fetch(`${API_BASE_URL}/api/generate-content/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompt }),
+      });
+    } catch (error: any) {
+      throw new Error('Cannot connect to backend server. Make sure the Python backend is running on port 8000.');
+    }
+
+    if (response.status === 503) {
+      throw new Error('AI service not available. Please check your API key configuration.');
+    }
+    if (!response.ok || !response.body) {
+      throw new Error('Server error. Please try again later.');
+    }
+
+    let content = '';
+    for await (const { event, data } of serverSentEvents(response.body)) {
+      if (event === 'chunk') {
+        content += data.text;
+        onChunk(data.text);
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'Failed to generate content');
+      } else if (event === 'done') {
+        console.log('✅ AI content streamed successfully!');
+        if (data.near_duplicates?.length && onNearDuplicates) {
+          onNearDuplicates(data.near_duplicates);
+        }
+        return content;
+      }
+    }
+
+    return content;
+  },
+
+  // Generate a long post: an outline, then its sections written in
+  // parallel. onOutline receives the title and section headings first;
+  // onSection receives each section as it completes (in any order, with
+  // its index in the outline). Resolves with the stitched post.
+  generateLongFormStream: async (
+    prompt: string,
+    handlers: {
+      onOutline?: (outline: LongFormOutline) => void;
+      onSection?: (section: LongFormSection) => void;
+      onNearDuplicates?: (posts: NearDuplicate[]) => void;
+    } = {},
+    options: { sections?: number; section_words?: number } = {}
+  ): Promise<string> => {
+    console.log('🤖 Starting long-form AI content generation...');
+    let response: Response;
+    try {
+      response = await fetch(`${API_BASE_URL}/api/generate-content/longform`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompt, ...options }),
+      });
+    } catch (error: any) {
+      throw new Error('Cannot connect to backend server. Make sure the Python backend is running on port 8000.');
+    }
+
+    if (response.status === 503) {
+      throw new Error('AI service not available. Please check your API key configuration.');
+    }
+    if (!response.ok || !response.body) {
+      throw new Error('Server error. Please try again later.');
+    }
+
+    for await (const { event, data } of serverSentEvents(response.body)) {
+      if (event === 'outline') {
+        handlers.onOutline?.(data);
+      } else if (event === 'section') {
+        handlers.onSection?.(data);
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'Failed to generate content');
+      } else if (event === 'done') {
+        console.log(`✅ Long-form post generated (${data.words} words)`);
+        if (data.near_duplicates?.length && handlers.onNearDuplicates) {
+          handlers.onNearDuplicates(data.near_duplicates);
+        }
+        return data.content;
+      }
+    }
+
+    throw new Error('Generation ended unexpectedly');
+  },
+
+  // Generate drafts for many topics at once. The backend runs them
+  // concurrently and streams one NDJSON line per finished item; onResult is
+  // called for each as it arrives. Resolves with the batch summary.
+  generateContentBatch: async (
+    prompts: string[],
+    onResult: (result: BatchGenerationResult) => void
+  ): Promise<BatchGenerationSummary> => {
+    console.log(`🤖 Starting batch generation for ${prompts.length} topics...`);
+    let response: Response;
+    try {
+      response = await fetch(`${API_BASE_URL}/api/generate-content/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompts }),
+      });
+    } catch (error: any) {
+      throw new Error('Cannot connect to backend server. Make sure the Python backend is running on port 8000.');
+    }
+
+    if (response.status === 503) {
+      throw new Error('AI service not available. Please check your API key configuration.');
+    }
+    if (!response.ok || !response.body) {
+      throw new Error('Server error. Please try again later.');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let newline = buffer.indexOf('\n');
+      while (newline !== -1) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        newline = buffer.indexOf('\n');
+        if (!line) continue;
+
+        const payload = JSON.parse(line);
+        if (payload.done) {
+          console.log(`✅ Batch finished: ${payload.succeeded} ok, ${payload.failed} failed`);
+          return payload;
+        }
+        onResult(payload);
+      }
+    }
+
+    throw new Error('Batch generation ended unexpectedly');
+  },
+
   // Create new post
   createPost: async (postData: any) => {
     try {
@@ -108,12 +394,15 @@ export const blogAPI = {
     }
   },
 
-  // Get all posts
-  getPosts: async () => {
+  // Get a page of posts (newest first). Pass the previous page's
+  // next_cursor to continue; next_cursor is null on the last page.
+  getPosts: async (cursor?: string | null, limit: number = 20) => {
     try {
       console.log('📖 Fetching posts from API...');
-      const response = await api.get('/api/posts');
-      console.log('✅ Posts fetched successfully. Count:', response.data.length);
+      const response = await api.get('/api/posts', {
+        params: { limit, ...(cursor ? { cursor } : {}) },
+      });
+      console.log('✅ Posts fetched successfully. Count:', response.data.posts.length);
       return response.data;
     } catch (error: any) {
       console.error('❌ Get Posts Failed:', {
@@ -123,20 +412,23 @@ export const blogAPI = {
       });
       
       // Return demo data if API fails
-      return [
-        {
-          id: "demo_1",
-          title: "Welcome to AI Blog Platform",
-          content: "This is a demo post. The posts API is currently unavailable.",
-          author: "System",
-          slug: "welcome-demo",
-          tags: ["demo"],
-          seo_title: "Welcome Demo",
-          seo_description: "Demo post for AI Blog Platform",
-          created_at: new Date().toISOString(),
-          updated_at: new Date().toISOString()
-        }
-      ];
+      return {
+        posts: [
+          {
+            id: "demo_1",
+            title: "Welcome to AI Blog Platform",
+            excerpt: "This is a demo post. The posts API is currently unavailable.",
+            author: "System",
+            slug: "welcome-demo",
+            tags: ["demo"],
+            seo_title: "Welcome Demo",
+            seo_description: "Demo post for AI Blog Platform",
+            created_at: new Date().toISOString(),
+            updated_at: new Date().toISOString()
+          }
+        ],
+        next_cursor: null
+      };
     }
   },
 
@@ -151,6 +443,57 @@ export const blogAPI = {
     }
   },
 
+  // Get a single post by its slug, or null if there is none
+  getPostBySlug: async (slug: string) => {
+    try {
+      const response = await api.get(`/api/posts/by-slug/${encodeURIComponent(slug)}`);
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.status === 404) return null;
+      console.error('Get Post Failed:', error);
+      throw new Error(`Failed to fetch post: ${error.message}`);
+    }
+  },
+
+  // Post counts per tag, author or month ('YYYY-MM'), maintained by the
+  // backend so tag clouds and archive sidebars don't need every post
+  getCounts: async (kind: 'tags' | 'authors' | 'archive', limit?: number): Promise<CountEntry[]> => {
+    try {
+      const response = await api.get(`/api/${kind}`, { params: limit ? { limit } : {} });
+      return response.data.counts;
+    } catch (error: any) {
+      console.error(`Get ${kind} counts failed:`, error);
+      return [];
+    }
+  },
+
+  // Drafts: created once with the full body, then autosaved with deltas
+  createDraft: async (fields: DraftFields): Promise<Draft> => {
+    const response = await api.post('/api/drafts', fields);
+    return response.data;
+  },
+
+  getDraft: async (draftId: string): Promise<Draft> => {
+    const response = await api.get(`/api/drafts/${draftId}`);
+    return response.data;
+  },
+
+  patchDraft: async (draftId: string, baseRevision: number, ops: DraftOperation[]) => {
+    try {
+      const response = await api.patch(`/api/drafts/${draftId}`, { base_revision: baseRevision, ops });
+      return response.data as { id: string; revision: number; updated_at: string };
+    } catch (error: any) {
+      if (error.response?.status === 409) {
+        throw new DraftConflictError(error.response.data.detail.revision);
+      }
+      throw error;
+    }
+  },
+
+  deleteDraft: async (draftId: string) => {
+    await api.delete(`/api/drafts/${draftId}`);
+  },
+
   // Health check
   healthCheck: async () => {
     try {